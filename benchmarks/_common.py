@@ -0,0 +1,44 @@
+"""Общие вспомогательные функции для бенчмарков.
+
+Бенчмарки запускаются из корня репозитория, например:
+    python benchmarks/bench_http_client.py
+"""
+
+import os
+import statistics
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# config.py требует токены; для локальных замеров подойдут фиктивные
+os.environ.setdefault("BOT_TOKEN", "123456:bench")
+for _name in (
+    "OPEN_WEATHER_API_TOKEN",
+    "CALORIES_API_TOKEN",
+    "NUTRITIONIX_API_TOKEN",
+    "NUTRITIONIX_APP_ID",
+):
+    os.environ.setdefault(_name, "bench")
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Перцентиль q (0..100) по отсортированной копии values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def report(title: str, latencies: list[float], elapsed: float) -> None:
+    """Напечатать p50/p99 (мс) и пропускную способность."""
+    count = len(latencies)
+    print(
+        f"{title:<32} n={count:<6} "
+        f"p50={percentile(latencies, 50) * 1000:8.3f} ms  "
+        f"p99={percentile(latencies, 99) * 1000:8.3f} ms  "
+        f"mean={statistics.fmean(latencies) * 1000 if latencies else 0:8.3f} ms  "
+        f"rps={count / elapsed if elapsed else 0:10.1f}"
+    )
@@ -0,0 +1,96 @@
+"""Задержка цикла событий при 50 одновременных /check_progress.
+
+Режим "in-loop" рисует графики прямо в корутине (старое поведение),
+режим "process-pool" использует ChartService.
+"""
+
+import argparse
+import asyncio
+import time
+
+import _common  # noqa: F401
+from _common import percentile
+
+from chart_service import ChartService
+from utils import (
+    create_calories_progress_chart,
+    create_water_progress_chart,
+    get_last_7_days,
+    get_net_calories,
+    get_water_values,
+)
+
+DATES = get_last_7_days()
+DAILY_LOGS = {
+    day: {"water": 1500 + i * 100, "calories_in": 1800 + i * 50, "calories_burned": 300}
+    for i, day in enumerate(DATES)
+}
+
+
+async def monitor_lag(lags: list[float], stop: asyncio.Event, interval: float) -> None:
+    """Измерять, насколько позже запланированного просыпается цикл событий."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def check_progress_in_loop() -> None:
+    create_water_progress_chart(DAILY_LOGS, 2000)
+    create_calories_progress_chart(DAILY_LOGS, 2200)
+
+
+async def check_progress_pool(service: ChartService, request: int) -> None:
+    # Цели различаются, чтобы кэш графиков не влиял на замер
+    await service.render_progress(
+        DATES,
+        get_water_values(DAILY_LOGS, DATES),
+        2000 + request,
+        get_net_calories(DAILY_LOGS, DATES),
+        2200 + request,
+    )
+
+
+async def run(mode: str, requests: int, service: ChartService | None) -> None:
+    lags = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_lag(lags, stop, 0.005))
+    await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    if service is None:
+        await asyncio.gather(*(check_progress_in_loop() for _ in range(requests)))
+    else:
+        await asyncio.gather(
+            *(check_progress_pool(service, i) for i in range(requests))
+        )
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await monitor
+    print(
+        f"{mode:<14} requests={requests} total={elapsed:.2f} s  "
+        f"loop lag p50={percentile(lags, 50) * 1000:.1f} ms  "
+        f"p99={percentile(lags, 99) * 1000:.1f} ms  "
+        f"max={max(lags) * 1000:.1f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    await run("in-loop", args.requests, None)
+
+    service = ChartService(workers=args.workers)
+    await service.start()
+    try:
+        await run("process-pool", args.requests, service)
+    finally:
+        await service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""Микробенчмарк отрисовки графиков: графиков в секунду на одно ядро.
+
+Сравнивает прежнюю отрисовку через pyplot с шаблонами на Figure/Agg
+(с tight_layout и в режиме фиксированной разметки).
+"""
+
+import argparse
+import io
+import time
+
+import _common  # noqa: F401
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+
+import charts  # noqa: E402
+from utils import get_last_7_days  # noqa: E402
+
+DATES = get_last_7_days()
+VALUES = [1500, 2000, 0, 2600, 1800, 900, 2200]
+
+
+def legacy_render_water_chart(dates: list[str], values: list[float], goal: float):
+    """Прежняя реализация через глобальное состояние pyplot."""
+    fig, ax = plt.subplots(figsize=(10, 6))
+    bars = ax.bar(dates, values, color="#2ecc71", alpha=0.7)
+    ax.axhline(y=goal, color="#e74c3c", linestyle="--", label="Цель")
+    ax.set_title("Потребление воды за последние 7 дней")
+    ax.set_xlabel("Дата")
+    ax.set_ylabel("мл")
+    plt.xticks(rotation=45)
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(
+            bar.get_x() + bar.get_width() / 2.0,
+            height,
+            f"{int(height)}",
+            ha="center",
+            va="bottom",
+        )
+    ax.legend()
+    plt.tight_layout()
+    buf = io.BytesIO()
+    plt.savefig(buf, format="png")
+    plt.close()
+    return buf.getvalue()
+
+
+def measure(title: str, render, renders: int) -> None:
+    render(0)
+    started = time.perf_counter()
+    for i in range(renders):
+        render(i)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{title:<24} {renders / elapsed:8.1f} renders/s  "
+        f"{elapsed / renders * 1000:8.2f} ms/render"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--renders", type=int, default=50)
+    args = parser.parse_args()
+
+    measure(
+        "pyplot (before)",
+        lambda i: legacy_render_water_chart(DATES, VALUES, 2000 + i),
+        args.renders,
+    )
+    measure(
+        "template + tight_layout",
+        lambda i: charts.render_water_chart(DATES, VALUES, 2000 + i),
+        args.renders,
+    )
+    measure(
+        "template + fixed layout",
+        lambda i: charts.render_water_chart(DATES, VALUES, 2000 + i, True),
+        args.renders,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Время поиска и память локального справочника продуктов.
+
+Строит FoodIndex из data/foods.tsv, дополненного синтетическими продуктами
+("<продукт> <способ приготовления> <марка>") до --entries записей, и замеряет
+точный поиск, поиск с опечатками и промахи.
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+import _common  # noqa: F401
+
+from food_index import FoodIndex
+
+FOODS_PATH = f"{_common.ROOT}/data/foods.tsv"
+
+MODIFIERS = (
+    "вареный",
+    "жареный",
+    "тушеный",
+    "запеченный",
+    "на пару",
+    "гриль",
+    "копченый",
+    "сушеный",
+    "замороженный",
+    "консервированный",
+    "с сыром",
+    "с овощами",
+    "с грибами",
+    "с маслом",
+    "без соли",
+    "домашний",
+    "диетический",
+    "острый",
+    "сладкий",
+    "классический",
+)
+BRANDS = (
+    "простоквашино",
+    "домик в деревне",
+    "мираторг",
+    "петелинка",
+    "макфа",
+    "увелка",
+    "агуша",
+    "вкусвилл",
+    "черкизово",
+    "барилла",
+    "мистраль",
+    "националь",
+    "красная цена",
+    "магнит",
+    "пятерочка",
+    "globus",
+    "danone",
+    "nestle",
+    "heinz",
+    "president",
+    "село зеленое",
+    "эконива",
+    "вимм-билль-данн",
+    "ашан",
+    "лента",
+    "перекресток",
+    "дикси",
+    "фермерский",
+    "бабушкин",
+    "organic",
+)
+
+
+def read_foods(path: str) -> list[tuple[float, list[str]]]:
+    foods = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip() and not line.startswith("#"):
+                kcal, names = line.rstrip("\n").split("\t", 1)
+                foods.append((float(kcal), names.split("|")))
+    return foods
+
+
+def synthetic_foods(base, entries: int, rng: random.Random):
+    yield from base
+    combos = [
+        (kcal, names[0], modifier, brand)
+        for kcal, names in base
+        for modifier in MODIFIERS
+        for brand in BRANDS
+    ]
+    rng.shuffle(combos)
+    for kcal, name, modifier, brand in combos[: max(0, entries - len(base))]:
+        yield kcal, [f"{name} {modifier} {brand}", f"{name} {brand} {modifier}"]
+
+
+def typo(name: str, rng: random.Random) -> str:
+    """Одна случайная опечатка: замена, пропуск или перестановка букв."""
+    i = rng.randrange(1, len(name) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return name[:i] + rng.choice("аеиоуыя") + name[i + 1 :]
+    if kind == 1:
+        return name[:i] + name[i + 1 :]
+    return name[: i - 1] + name[i] + name[i - 1] + name[i + 1 :]
+
+
+def measure(index: FoodIndex, queries: list[str]) -> tuple[float, float, int]:
+    latencies = []
+    found = 0
+    for query in queries:
+        started = time.perf_counter()
+        result = index.lookup(query)
+        latencies.append(time.perf_counter() - started)
+        found += result is not None
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)], found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=5_000)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    base = read_foods(FOODS_PATH)
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = FoodIndex()
+    all_names = []
+    for kcal, names in synthetic_foods(base, args.entries, rng):
+        index.add(kcal, names)
+        all_names.extend(names)
+    build = time.perf_counter() - started
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"entries={len(index)} names={index.names_count} "
+        f"words={index.words_count} "
+        f"build={build:.2f} s memory={memory / 1024 / 1024:.1f} MB"
+    )
+
+    long_names = [name for name in all_names if len(name) >= 5]
+    base_names = [names[0] for _, names in base if len(names[0]) >= 5]
+    cases = {
+        "exact": [rng.choice(all_names) for _ in range(args.queries)],
+        "typo (base foods)": [
+            typo(rng.choice(base_names), rng) for _ in range(args.queries)
+        ],
+        "typo (long names)": [
+            typo(rng.choice(long_names), rng) for _ in range(args.queries)
+        ],
+        "miss": [
+            "".join(rng.choice("бвгджзклмнпрстфхцчшщ") for _ in range(8))
+            for _ in range(args.queries)
+        ],
+    }
+    for title, queries in cases.items():
+        p50, p99, found = measure(index, queries)
+        print(
+            f"{title:<20} p50={p50 * 1e6:8.1f} us  p99={p99 * 1e6:8.1f} us  "
+            f"found={found}/{len(queries)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Память и скорость истории дневных логов: словари против столбцов.
+
+Заполняет --users пользователей логами за --days дней в DailyHistory и
+сравнивает с прежним представлением {дата: {поле: значение}}. Память
+замеряется tracemalloc на --sample пользователях и пересчитывается на
+--users (словарям на 100k x 365 не хватит памяти); время заполнения
+DailyHistory и пиковый RSS — на всех --users.
+"""
+
+import argparse
+import gc
+import resource
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import _common  # noqa: F401
+
+from history import DailyHistory
+from utils import get_net_calories, get_water_values
+
+
+def build_dicts(users: int, dates: list[str]) -> list[dict]:
+    return [
+        {
+            day: {"water": 250.0, "calories_in": 1800.5, "calories_burned": 300.0}
+            for day in dates
+        }
+        for _ in range(users)
+    ]
+
+
+def build_histories(users: int, dates: list[str]) -> list[DailyHistory]:
+    histories = []
+    for _ in range(users):
+        history = DailyHistory()
+        for day in dates:
+            history.add(day, water=250.0, calories_in=1800.5, calories_burned=300.0)
+        histories.append(history)
+    return histories
+
+
+def traced_memory(build, users: int, dates: list[str]) -> float:
+    gc.collect()
+    tracemalloc.start()
+    result = build(users, dates)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return memory
+
+
+def per_call(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations
+
+
+def max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--sample", type=int, default=2_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    last = date(2025, 12, 31)
+    dates = [(last - timedelta(days=i)).isoformat() for i in range(args.days)][::-1]
+    scale = args.users / args.sample
+
+    for title, build in (
+        ("dict of dicts", build_dicts),
+        ("DailyHistory", build_histories),
+    ):
+        memory = traced_memory(build, args.sample, dates)
+        print(
+            f"{title:<14} {memory * scale / 1024 / 1024:9.1f} MB for {args.users} "
+            f"users ({memory / args.sample / 1024:.1f} KB/user)"
+        )
+
+    rss_before = max_rss_mb()
+    started = time.perf_counter()
+    histories = build_histories(args.users, dates)
+    print(
+        f"DailyHistory build for {args.users} users: "
+        f"{time.perf_counter() - started:.1f} s, "
+        f"peak RSS +{max_rss_mb() - rss_before:.0f} MB"
+    )
+
+    user_dict = build_dicts(1, dates)[0]
+    user_history = histories[0]
+    for days in (7, 30, 365):
+        window = dates[-days:]
+        for title, make in (
+            ("water", lambda h: lambda: get_water_values(h, window)),
+            ("net calories", lambda h: lambda: get_net_calories(h, window)),
+        ):
+            baseline = per_call(make(user_dict), args.iterations)
+            columnar = per_call(make(user_history), args.iterations)
+            print(
+                f"last {days:>3} days {title:<13} dict {baseline * 1e6:8.2f} us  "
+                f"DailyHistory {columnar * 1e6:8.2f} us"
+            )
+
+    today = dates[-1]
+    baseline = per_call(lambda: user_dict[today]["water"], args.iterations)
+    columnar = per_call(lambda: user_history[today]["water"], args.iterations)
+    print(
+        f"{'today lookup':<27} dict {baseline * 1e6:8.2f} us  "
+        f"DailyHistory {columnar * 1e6:8.2f} us"
+    )
+    tomorrow = (last + timedelta(days=1)).isoformat()
+    append = per_call(lambda: user_history.add(tomorrow, water=250), args.iterations)
+    print(f"{'append to today':<27} DailyHistory {append * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
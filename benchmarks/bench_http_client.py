@@ -0,0 +1,90 @@
+"""Сравнение "новая сессия на запрос" и общего пула HttpClient.
+
+Поднимает локальный aiohttp-сервер, имитирующий Nutritionix, и выполняет
+одинаковое число запросов get_food_calories в двух режимах.
+"""
+
+import argparse
+import asyncio
+import time
+
+import _common  # noqa: F401
+import aiohttp
+from _common import report
+from aiohttp import web
+
+import utils
+from http_client import HttpClient
+
+
+async def nutrients(request: web.Request) -> web.Response:
+    await request.json()
+    return web.json_response({"foods": [{"nf_calories": 89.0}]})
+
+
+async def start_stub() -> tuple[web.AppRunner, str]:
+    app = web.Application()
+    app.router.add_post("/v2/natural/nutrients", nutrients)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/v2/natural/nutrients"
+
+
+async def per_request_session(url: str) -> None:
+    """Старое поведение: отдельная сессия и коннектор на каждый вызов."""
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(ssl=False)
+    ) as session:
+        async with session.post(url, json={"query": "banana"}, timeout=10) as r:
+            await r.json()
+
+
+async def run(mode: str, url: str, total: int, concurrency: int) -> None:
+    client = HttpClient()
+    utils.http_client = client
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            if mode == "before":
+                await per_request_session(url)
+            else:
+                await utils.get_food_calories("banana")
+            latencies.append(time.perf_counter() - started)
+
+    await client.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    await client.close()
+    report(
+        f"{mode} ({'session per call' if mode == 'before' else 'shared pool'})",
+        latencies,
+        elapsed,
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    runner, url = await start_stub()
+    utils.NUTRITIONIX_API_URL = url
+    # Перевод не участвует в замере
+    utils.translate_text = lambda text: asyncio.sleep(0, text)
+    try:
+        for mode in ("before", "after"):
+            await run(mode, url, args.requests, args.concurrency)
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
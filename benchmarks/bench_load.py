@@ -0,0 +1,405 @@
+"""Нагрузочный тест обработчиков бота с заглушками всех внешних сервисов.
+
+Запускает настоящий Dispatcher из bot.py (через load_bot.py, в режиме
+webhook) в отдельном процессе. Вызовы Bot API уходят в локальную заглушку,
+OpenWeather, Nutritionix, api-ninjas и переводчик отвечают заготовленными
+ответами из второй заглушки с задержкой --upstream-latency.
+
+--users виртуальных пользователей сначала заполняют профиль (/set_profile),
+затем каждый выполняет --actions команд из смеси --mix, дожидаясь ответа на
+каждую (одновременно активны не более --concurrency пользователей).
+Продукты и тренировки берутся из офлайн-справочников или, с долей
+--unknown, неизвестные — тогда работают перевод и внешние API.
+
+Печатаются пропускная способность и перцентили задержки по командам
+(от POST обновления до последнего ответа бота), опоздание таймера цикла
+событий бота (по гистограмме /metrics) и пиковая RSS процесса бота и его
+дочерних процессов (пул графиков).
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import _common
+import aiohttp
+from _common import report
+from aiohttp import web
+from bench_startup import rss_mb
+from bench_webhook import SECRET, free_port, wait_healthy
+from fake_telegram import FakeBotAPI, make_update
+
+LOCAL_FOODS = ("банан", "яблоко", "гречка", "курица", "рис", "творог", "овсянка")
+LOCAL_WORKOUTS = ("бег", "плавание", "велосипед", "йога", "ходьба")
+# Названия, которых нет в справочниках: для них нужны перевод и внешние API
+SUFFIXES = tuple(f"{a}{b}" for a in "бвгдклмнпр" for b in "аеиоуыэюя")
+
+# Число ответов бота на команду
+REPLIES = {"water": 1, "food": 1, "food_amount": 1, "workout": 1, "progress": 3}
+
+
+class LoadFakeBotAPI(FakeBotAPI):
+    """Заглушка Bot API, ожидающая заданное число ответов в чат."""
+
+    def __init__(self):
+        super().__init__()
+        self._expected: dict[int, list] = {}
+
+    def expect_replies(self, chat_id: int, count: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._expected[chat_id] = [count, future]
+        return future
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if method not in ("sendMessage", "sendPhoto"):
+            return await super()._handle(request)
+        self.calls[method] += 1
+        data = await request.post()
+        chat_id = int(data["chat_id"])
+        expected = self._expected.get(chat_id)
+        if expected is not None:
+            expected[0] -= 1
+            if expected[0] == 0:
+                del self._expected[chat_id]
+                if not expected[1].done():
+                    expected[1].set_result(time.perf_counter())
+        return web.json_response({"ok": True, "result": self._message(chat_id)})
+
+
+class StubUpstreams:
+    """Заглушки OpenWeather, api-ninjas, Nutritionix и Google Translate."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls: dict[str, int] = defaultdict(int)
+        self._runner: web.AppRunner | None = None
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get("/data/2.5/weather", self.weather)
+        app.router.add_get("/v1/caloriesburned", self.calories)
+        app.router.add_post("/v2/natural/nutrients", self.nutrients)
+        app.router.add_get("/translate_a/single", self.translate)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _reply(self, name: str) -> None:
+        self.calls[name] += 1
+        await asyncio.sleep(self.latency)
+
+    async def weather(self, request: web.Request) -> web.Response:
+        await self._reply("weather")
+        return web.json_response({"main": {"temp": 27.5}})
+
+    async def calories(self, request: web.Request) -> web.Response:
+        await self._reply("calories")
+        return web.json_response([{"total_calories": 240}])
+
+    async def nutrients(self, request: web.Request) -> web.Response:
+        query = (await request.json())["query"]
+        await self._reply("nutritionix")
+        foods = [
+            {"nf_calories": 120 + len(line), "serving_weight_grams": 100}
+            for line in query.split("\n")
+        ]
+        return web.json_response({"foods": foods})
+
+    async def translate(self, request: web.Request) -> web.Response:
+        text = request.query.get("q", "")
+        await self._reply("translate")
+        translated = "\n".join(f"stub {line}" for line in text.split("\n"))
+        return web.json_response([[[translated, text, None, None, 10]], None, "ru"])
+
+
+def make_callback(update_id: int, user_id: int, data: str) -> dict:
+    """Обновление с нажатием inline-кнопки под сообщением бота."""
+    user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": user,
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "text": "Выберите ваш пол:",
+            },
+        },
+    }
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for item in spec.split(","):
+        name, weight = item.split("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - {"water", "food", "workout", "progress"}
+    if unknown:
+        raise SystemExit(f"Неизвестные команды в --mix: {', '.join(unknown)}")
+    return mix
+
+
+def lag_histogram(metrics: str) -> tuple[list[tuple[float, int]], float, int]:
+    """Корзины, сумма и число наблюдений bot_event_loop_lag_seconds."""
+    buckets, total, count = [], 0.0, 0
+    for line in metrics.splitlines():
+        if line.startswith("bot_event_loop_lag_seconds_bucket"):
+            bound = line.split('le="')[1].split('"')[0]
+            buckets.append((float(bound), int(float(line.rsplit(" ", 1)[1]))))
+        elif line.startswith("bot_event_loop_lag_seconds_sum"):
+            total = float(line.rsplit(" ", 1)[1])
+        elif line.startswith("bot_event_loop_lag_seconds_count"):
+            count = int(float(line.rsplit(" ", 1)[1]))
+    return buckets, total, count
+
+
+def lag_report(before: str, after: str) -> str:
+    """Перцентили опоздания таймера между двумя снимками /metrics."""
+    buckets_before, sum_before, count_before = lag_histogram(before)
+    buckets_after, sum_after, count_after = lag_histogram(after)
+    old = dict(buckets_before)
+    buckets = [(bound, value - old.get(bound, 0)) for bound, value in buckets_after]
+    count = count_after - count_before
+    if not count:
+        return "event loop lag: no samples"
+
+    def upper_bound(q: float) -> str:
+        for bound, cumulative in buckets:
+            if cumulative >= q * count:
+                return f"<={bound * 1000:g} ms"
+        return "n/a"
+
+    mean = (sum_after - sum_before) / count * 1000
+    return (
+        f"event loop lag: samples={count} mean={mean:.1f} ms "
+        f"p50{upper_bound(0.5)} p99{upper_bound(0.99)}"
+    )
+
+
+class Process:
+    """Процесс бота и пиковая RSS его и дочерних процессов."""
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.peak_rss = 0.0
+        self.peak_total_rss = 0.0
+
+    def children(self) -> list[int]:
+        pid = self.process.pid
+        try:
+            with open(f"/proc/{pid}/task/{pid}/children") as f:
+                return [int(child) for child in f.read().split()]
+        except OSError:
+            return []
+
+    async def sample_rss(self, interval: float = 0.25) -> None:
+        while True:
+            rss = rss_mb(self.process.pid)
+            total = rss + sum(rss_mb(child) for child in self.children())
+            self.peak_rss = max(self.peak_rss, rss)
+            self.peak_total_rss = max(self.peak_total_rss, total)
+            await asyncio.sleep(interval)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--actions", type=int, default=5, help="команд на пользователя")
+    parser.add_argument("--mix", default="water=40,food=30,workout=20,progress=10")
+    parser.add_argument("--unknown", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument(
+        "--think", type=float, default=0.0, help="пауза между командами, с"
+    )
+    parser.add_argument("--upstream-latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument(
+        "--storage", choices=("memory", "sqlite"), default="memory", help="хранилища"
+    )
+    parser.add_argument(
+        "--throttle",
+        action="store_true",
+        help="оставить ограничение частоты запросов (по умолчанию отключено)",
+    )
+    parser.add_argument("--timeout", type=float, default=60, help="ожидание ответа, с")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+
+    fake_api = LoadFakeBotAPI()
+    api_url = await fake_api.start()
+    upstreams = StubUpstreams(args.upstream_latency)
+    upstream_url = await upstreams.start()
+    workdir = tempfile.TemporaryDirectory(prefix="bench_load_")
+    port, metrics_port = free_port(), free_port()
+    env = {
+        **os.environ,
+        "BOT_RUN_MODE": "webhook",
+        "WEBHOOK_URL": f"http://127.0.0.1:{port}",
+        "WEBHOOK_SECRET": SECRET,
+        "WEBHOOK_HOST": "127.0.0.1",
+        "WEBHOOK_PORT": str(port),
+        "WEBHOOK_WORKERS": str(args.workers),
+        "TELEGRAM_API_URL": api_url,
+        "OPEN_WEATHER_API_URL": f"{upstream_url}/data/2.5/weather",
+        "CALORIES_API_URL": f"{upstream_url}/v1/caloriesburned",
+        "NUTRITIONIX_API_URL": f"{upstream_url}/v2/natural/nutrients",
+        "LOAD_TRANSLATOR_URL": upstream_url,
+        "TRANSLATIONS_PATH": os.path.join(workdir.name, "translations.json"),
+        "STORAGE_BACKEND": args.storage,
+        "STORAGE_PATH": os.path.join(workdir.name, "bot.sqlite3"),
+        "FSM_STORAGE_BACKEND": args.storage,
+        "FSM_STORAGE_PATH": os.path.join(workdir.name, "fsm.sqlite3"),
+        "SUMMARY_STORAGE_PATH": os.path.join(workdir.name, "summary.sqlite3"),
+        "METRICS_HOST": "127.0.0.1",
+        "METRICS_PORT": str(metrics_port),
+        "METRICS_LOOP_LAG_INTERVAL": "0.05",
+        "CHART_WORKERS": "1",
+        "LOG_LEVEL": "WARNING",
+    }
+    if not args.throttle:
+        env.update(
+            THROTTLE_USER_RATE="1000000",
+            THROTTLE_USER_BURST="1000000",
+            THROTTLE_COMMAND_LIMITS="",
+        )
+    process = Process(
+        await asyncio.create_subprocess_exec(
+            sys.executable,
+            os.path.join(_common.ROOT, "benchmarks", "load_bot.py"),
+            env=env,
+            cwd=_common.ROOT,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=None if args.verbose else asyncio.subprocess.DEVNULL,
+        )
+    )
+    rss_task = asyncio.create_task(process.sample_rss())
+
+    webhook_url = f"http://127.0.0.1:{port}/webhook"
+    metrics_url = f"http://127.0.0.1:{metrics_port}/metrics"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    update_ids = iter(range(1, sys.maxsize))
+    latencies: dict[str, list[float]] = defaultdict(list)
+    timeouts: dict[str, int] = defaultdict(int)
+
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=args.concurrency)
+    ) as session:
+
+        async def send(user_id: int, kind: str, update: dict, replies: int) -> None:
+            reply = fake_api.expect_replies(user_id, replies)
+            started = time.perf_counter()
+            async with session.post(webhook_url, json=update, headers=headers) as r:
+                r.raise_for_status()
+            try:
+                replied = await asyncio.wait_for(reply, args.timeout)
+            except asyncio.TimeoutError:
+                timeouts[kind] += 1
+                return
+            latencies[kind].append(replied - started)
+
+        async def text(user_id: int, kind: str, value: str, replies: int = 1):
+            update = make_update(next(update_ids), user_id, value)
+            await send(user_id, kind, update, replies)
+
+        async def set_profile(user_id: int) -> None:
+            async with semaphore:
+                for value in ("/set_profile", "70", "175", "30"):
+                    await text(user_id, "set_profile", value)
+                callback = make_callback(next(update_ids), user_id, "sex_male")
+                await send(user_id, "set_profile", callback, 1)
+                await text(user_id, "set_profile", f"Город {user_id % 100}")
+                await text(user_id, "set_profile", "60")
+                # Хотя бы одна запись, чтобы /check_progress рисовал графики
+                await text(user_id, "water", "/log_water 200")
+
+        def pick(local: tuple[str, ...], unknown: str) -> str:
+            if rng.random() < args.unknown:
+                # Без цифр: "блюдо 17" разобралось бы как 17 г продукта
+                return f"{unknown} {rng.choice(SUFFIXES)}"
+            return rng.choice(local)
+
+        async def act(user_id: int) -> None:
+            async with semaphore:
+                for kind in rng.choices(list(mix), list(mix.values()), k=args.actions):
+                    if kind == "water":
+                        await text(
+                            user_id, kind, f"/log_water {rng.randrange(100, 500)}"
+                        )
+                    elif kind == "food":
+                        food = pick(LOCAL_FOODS, "блюдо")
+                        await text(user_id, kind, f"/log_food {food}")
+                        await text(user_id, "food_amount", str(rng.randrange(50, 300)))
+                    elif kind == "workout":
+                        workout = pick(LOCAL_WORKOUTS, "упражнение")
+                        await text(user_id, kind, f"/log_workout {workout} 30")
+                    else:
+                        await text(user_id, kind, "/check_progress", REPLIES[kind])
+                    if args.think:
+                        await asyncio.sleep(rng.expovariate(1 / args.think))
+
+        users = [2_000_000 + i for i in range(args.users)]
+        try:
+            await wait_healthy(session, f"http://127.0.0.1:{port}/healthz")
+
+            started = time.perf_counter()
+            await asyncio.gather(*(set_profile(user) for user in users))
+            elapsed = time.perf_counter() - started
+            report("setup (set_profile)", latencies.pop("set_profile"), elapsed)
+            latencies.clear()
+
+            async with session.get(metrics_url) as response:
+                metrics_before = await response.text()
+            started = time.perf_counter()
+            await asyncio.gather(*(act(user) for user in users))
+            elapsed = time.perf_counter() - started
+            async with session.get(metrics_url) as response:
+                metrics_after = await response.text()
+
+            for kind, values in sorted(latencies.items()):
+                report(f"  {kind}", values, elapsed)
+            report(
+                "replay total",
+                [value for values in latencies.values() for value in values],
+                elapsed,
+            )
+            if timeouts:
+                print(f"no reply within {args.timeout:g} s: {dict(timeouts)}")
+            print(lag_report(metrics_before, metrics_after))
+            print(
+                f"bot RSS peak: {process.peak_rss:.1f} MB "
+                f"(with chart workers {process.peak_total_rss:.1f} MB)"
+            )
+            print(f"Bot API calls: {dict(fake_api.calls)}")
+            print(f"upstream calls: {dict(upstreams.calls)}")
+        finally:
+            rss_task.cancel()
+            process.process.terminate()
+            await process.process.wait()
+            await fake_api.close()
+            await upstreams.close()
+            workdir.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
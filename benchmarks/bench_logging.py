@@ -0,0 +1,107 @@
+"""Пропускная способность цикла событий с разными режимами логирования.
+
+Прогоняет команды через LoggingMiddleware и пишет журнал в файл:
+логирование выключено, синхронная запись (text/json), запись в фоновом
+потоке через QueueHandler (text/json) и прореживание частых событий.
+--write-latency имитирует медленный диск или переполненный pipe stderr.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+import _common  # noqa: F401
+
+import log_pipeline
+from middleware import LoggingMiddleware
+
+MODES = (
+    ("off", "sync", "text", 1.0, "WARNING"),
+    ("sync text", "sync", "text", 1.0, "INFO"),
+    ("sync json", "sync", "json", 1.0, "INFO"),
+    ("async text", "async", "text", 1.0, "INFO"),
+    ("async json", "async", "json", 1.0, "INFO"),
+    ("async json, sample 0.1", "async", "json", 0.1, "INFO"),
+)
+
+
+class SlowStream:
+    """Файл, каждая запись в который блокирует поток на latency секунд."""
+
+    def __init__(self, stream, latency: float):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, text: str) -> int:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.stream.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+async def log_water(event, data):
+    return None
+
+
+async def run(updates: int, concurrency: int) -> float:
+    middleware = LoggingMiddleware()
+    data = {"handler": SimpleNamespace(callback=log_water)}
+    events = [
+        SimpleNamespace(
+            text=f"/log_water {i % 500}",
+            from_user=SimpleNamespace(id=i % 1000, username=f"user{i % 1000}"),
+        )
+        for i in range(concurrency)
+    ]
+
+    async def worker(event) -> None:
+        for _ in range(updates // concurrency):
+            await middleware(log_water, event, data)
+            # Отдаем управление, как между обновлениями в реальном цикле
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(event) for event in events))
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--write-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for title, mode, fmt, rate, level in MODES:
+            path = os.path.join(tmp, f"{mode}-{fmt}-{rate}.log")
+            with open(path, "w", encoding="utf-8") as stream:
+                log_pipeline.configure_logging(
+                    mode,
+                    fmt,
+                    rate,
+                    level,
+                    stream=SlowStream(stream, args.write_latency),
+                    force=True,
+                )
+                elapsed = asyncio.run(run(args.updates, args.concurrency))
+                started = time.perf_counter()
+                log_pipeline.stop_listener()
+                drain = time.perf_counter() - started
+            with open(path, encoding="utf-8") as f:
+                lines = sum(1 for _ in f)
+            print(
+                f"{title:<24} {args.updates / elapsed:10.0f} updates/s  "
+                f"drain={drain * 1000:7.1f} ms  lines={lines}"
+            )
+    logging.shutdown()
+
+
+if __name__ == "__main__":
+    main()
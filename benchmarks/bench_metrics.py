@@ -0,0 +1,67 @@
+"""Накладные расходы сбора метрик на одно обновление.
+
+Сравнивает прямой вызов обработчика с вызовом через MetricsMiddleware,
+а также замеряет стоимость Histogram.observe и отдачи /metrics.
+"""
+
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+import _common  # noqa: F401
+
+from metrics import Histogram, registry
+from middleware import MetricsMiddleware
+
+
+async def handler(event, data):
+    return None
+
+
+async def check_progress_command(event, data):
+    return None
+
+
+async def per_call(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await func()
+    return (time.perf_counter() - started) / iterations
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    middleware = MetricsMiddleware()
+    data = {"handler": SimpleNamespace(callback=check_progress_command)}
+
+    baseline = await per_call(lambda: handler(None, data), args.iterations)
+    instrumented = await per_call(
+        lambda: middleware(handler, None, data), args.iterations
+    )
+    print(f"handler without middleware {baseline * 1e6:8.3f} us/update")
+    print(f"handler with metrics       {instrumented * 1e6:8.3f} us/update")
+    print(
+        f"overhead                   {(instrumented - baseline) * 1e6:8.3f} us/update"
+    )
+
+    histogram = Histogram("bench_seconds", "bench", ("handler",))
+    started = time.perf_counter()
+    for i in range(args.iterations):
+        histogram.observe(0.0001 * (i % 100), "bench")
+    observe = (time.perf_counter() - started) / args.iterations
+    print(f"Histogram.observe          {observe * 1e6:8.3f} us")
+
+    started = time.perf_counter()
+    text = registry.expose()
+    print(
+        f"/metrics exposition        {(time.perf_counter() - started) * 1e3:8.3f} ms "
+        f"({len(text)} bytes)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
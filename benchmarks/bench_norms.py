@@ -0,0 +1,195 @@
+"""Пересчет норм воды и калорий для большого числа пользователей.
+
+1. Нормы по столбцам: calculate_water_norm / calculate_calorie_norm в цикле
+   по пользователям против calculate_water_norms / calculate_calorie_norms
+   над массивами NumPy; результаты сравниваются поэлементно.
+2. Пересчет всех профилей: построчный пересчет (как /recalc раньше) против
+   recalc_norms по частям с сохранением в MemoryStorage. Во время пересчета
+   замеряется наибольшая задержка цикла событий.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import _common  # noqa: F401
+import numpy as np
+
+from norms import calculate_calorie_norms, calculate_water_norms, recalc_norms
+from storage import MemoryStorage
+from utils import calculate_calorie_norm, calculate_water_norm
+
+CITIES = [f"city{i}" for i in range(500)]
+
+
+def make_columns(users: int, rng: np.random.Generator) -> dict[str, np.ndarray]:
+    temperature = rng.uniform(-20, 40, users).round(1)
+    temperature[rng.random(users) < 0.05] = np.nan
+    return {
+        "weight": rng.uniform(40, 150, users).round(1),
+        "height": rng.uniform(140, 210, users).round(1),
+        "age": rng.integers(14, 90, users),
+        "activity": rng.integers(0, 240, users),
+        "sex": np.where(rng.random(users) < 0.5, "male", "female"),
+        "temperature": temperature,
+    }
+
+
+def bench_columns(columns: dict[str, np.ndarray]) -> None:
+    weight = columns["weight"].tolist()
+    height = columns["height"].tolist()
+    age = columns["age"].tolist()
+    activity = columns["activity"].tolist()
+    sex = columns["sex"].tolist()
+    temperature = [None if t != t else t for t in columns["temperature"].tolist()]
+
+    started = time.perf_counter()
+    water = [calculate_water_norm(*row) for row in zip(weight, activity, temperature)]
+    calories = [
+        calculate_calorie_norm(*row) for row in zip(weight, height, age, activity, sex)
+    ]
+    scalar = time.perf_counter() - started
+
+    started = time.perf_counter()
+    water_vector = calculate_water_norms(
+        columns["weight"], columns["activity"], columns["temperature"]
+    )
+    calories_vector = calculate_calorie_norms(
+        columns["weight"],
+        columns["height"],
+        columns["age"],
+        columns["activity"],
+        columns["sex"],
+    )
+    vector = time.perf_counter() - started
+
+    assert water_vector.tolist() == water, "нормы воды не совпадают"
+    assert calories_vector.tolist() == calories, "нормы калорий не совпадают"
+    print(
+        f"norms for {len(weight)} users: scalar={scalar * 1000:.0f} ms  "
+        f"numpy={vector * 1000:.1f} ms  ({scalar / vector:.0f}x), results identical"
+    )
+
+
+def make_profiles(
+    columns: dict[str, np.ndarray],
+) -> tuple[dict[int, dict], dict[str, float | None]]:
+    """Профили с нормами по вчерашней погоде и сегодняшние температуры.
+
+    Сегодня в трети городов жара, в части городов температура неизвестна.
+    """
+    yesterday = {city: round(random.uniform(-20, 24), 1) for city in CITIES}
+    today = {
+        city: None
+        if random.random() < 0.05
+        else temperature + (15 if random.random() < 0.3 else 0)
+        for city, temperature in yesterday.items()
+    }
+    profiles = {}
+    for user_id, (weight, height, age, activity, sex) in enumerate(
+        zip(
+            columns["weight"].tolist(),
+            columns["height"].tolist(),
+            columns["age"].tolist(),
+            columns["activity"].tolist(),
+            columns["sex"].tolist(),
+        ),
+        1,
+    ):
+        city = random.choice(CITIES)
+        profiles[user_id] = {
+            "weight": weight,
+            "height": height,
+            "age": age,
+            "activity": activity,
+            "sex": sex,
+            "city": city,
+            "water_goal": calculate_water_norm(weight, activity, yesterday[city]),
+            "calorie_goal": calculate_calorie_norm(weight, height, age, activity, sex),
+        }
+    return profiles, today
+
+
+async def recalc_rows(
+    profiles: dict[int, dict], temperatures: dict[str, float | None], save
+) -> None:
+    """Построчный пересчет: одна пара норм на пользователя за раз."""
+    changes = {}
+    for user_id, profile in profiles.items():
+        fields = {}
+        temperature = temperatures[profile["city"]]
+        if temperature is not None:
+            water = calculate_water_norm(
+                profile["weight"], profile["activity"], temperature
+            )
+            if water != profile["water_goal"]:
+                fields["water_goal"] = water
+        calories = calculate_calorie_norm(
+            profile["weight"],
+            profile["height"],
+            profile["age"],
+            profile["activity"],
+            profile["sex"],
+        )
+        if calories != profile["calorie_goal"]:
+            fields["calorie_goal"] = calories
+        if fields:
+            changes[user_id] = fields
+    await save(changes)
+
+
+async def max_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def bench_job(profiles, temperatures, job) -> tuple[float, float, dict]:
+    storage = MemoryStorage()
+    for user_id, profile in profiles.items():
+        await storage.save_user(user_id, dict(profile))
+    stored = await storage.get_profiles()
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(max_loop_lag(stop))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    await job(stored, temperatures, storage.update_profiles)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    return elapsed, await lag_task, await storage.get_profiles()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--chunk", type=int, default=50_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    random.seed(1)
+    columns = make_columns(args.users, rng)
+    bench_columns(columns)
+
+    profiles, temperatures = make_profiles(columns)
+
+    async def chunked(stored, temperatures, save):
+        return await recalc_norms(stored, temperatures, save, args.chunk)
+
+    before, before_lag, expected = await bench_job(profiles, temperatures, recalc_rows)
+    after, after_lag, result = await bench_job(profiles, temperatures, chunked)
+    assert result == expected, "пересчитанные профили не совпадают"
+    changed = sum(result[user_id] != profiles[user_id] for user_id in profiles)
+    print(
+        f"recalc {args.users} profiles ({changed} changed): rows={before:.2f} s "
+        f"(max loop lag {before_lag * 1000:.0f} ms)  "
+        f"chunked numpy={after:.2f} s (max loop lag {after_lag * 1000:.0f} ms), "
+        "same profiles"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,169 @@
+"""Поведение запросов к Nutritionix при задержках и сбоях сервиса.
+
+Поднимает локальную заглушку Nutritionix, которая по сценарию добавляет
+медленный "хвост", отвечает 503 или зависает, и выполняет одинаковую
+нагрузку fetch_food_calories без защиты (before: один запрос, без автомата)
+и через Upstream (after: автомат, бюджет повторов и дублирующие запросы).
+В конце проверяется, что автомат замыкается, когда сервис восстановился.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+
+import _common  # noqa: F401
+import aiohttp
+from _common import report
+from aiohttp import web
+
+import resilience
+import utils
+from http_client import HttpClient
+from resilience import CircuitOpenError, Upstream
+
+# Сценарии: (базовая задержка, доля медленных ответов, их задержка,
+# доля ответов 503, зависание)
+SCENARIOS = {
+    "healthy": (0.01, 0, 0, 0, False),
+    "slow_tail": (0.01, 0.05, 1.0, 0, False),
+    "flaky": (0.01, 0, 0, 0.2, False),
+    "outage": (0, 0, 0, 0, True),
+}
+
+
+class StubNutritionix:
+    """Заглушка Nutritionix с настраиваемыми задержками и ошибками."""
+
+    def __init__(self):
+        self.scenario = SCENARIOS["healthy"]
+        self.requests = 0
+
+    async def nutrients(self, request: web.Request) -> web.Response:
+        await request.json()
+        self.requests += 1
+        latency, slow_share, slow_latency, error_share, hang = self.scenario
+        if hang:
+            await asyncio.sleep(3600)
+        if random.random() < slow_share:
+            latency = slow_latency
+        await asyncio.sleep(latency)
+        if random.random() < error_share:
+            return web.Response(status=503, text="unavailable")
+        return web.json_response({"foods": [{"nf_calories": 89.0}]})
+
+    async def start(self) -> tuple[web.AppRunner, str]:
+        app = web.Application()
+        app.router.add_post("/v2/natural/nutrients", self.nutrients)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return runner, f"http://127.0.0.1:{port}/v2/natural/nutrients"
+
+
+def make_upstream(mode: str, args: argparse.Namespace) -> Upstream:
+    if mode == "before":
+        return Upstream(
+            "nutritionix", args.timeout, failure_threshold=10**9, max_retries=0
+        )
+    return Upstream(
+        "nutritionix",
+        args.timeout,
+        reset_timeout=args.reset,
+        hedge=True,
+        hedge_min_samples=20,
+    )
+
+
+async def run(
+    stub: StubNutritionix, scenario: str, mode: str, args: argparse.Namespace
+) -> Upstream:
+    upstream = make_upstream(mode, args)
+    resilience.upstreams["nutritionix"] = upstream
+    # p95 для дублей набирается на исправном сервисе
+    stub.scenario = SCENARIOS["healthy"]
+    for _ in range(upstream.hedge_min_samples):
+        await utils.fetch_food_calories("banana")
+
+    stub.scenario = SCENARIOS[scenario]
+    stub.requests = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    outcomes = Counter()
+
+    async def one() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await utils.fetch_food_calories("banana")
+                outcomes["ok"] += 1
+            except CircuitOpenError:
+                outcomes["rejected"] += 1
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                outcomes["error"] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    report(f"{scenario} {mode}", latencies, elapsed)
+    stats = upstream.stats()
+    print(
+        f"{'':<32} ok={outcomes['ok']} error={outcomes['error']} "
+        f"rejected={outcomes['rejected']} upstream_requests={stub.requests} "
+        f"retries={stats['retries']} hedges={stats['hedges']} "
+        f"hedge_wins={stats['hedge_wins']} open={stats['open']}"
+    )
+    return upstream
+
+
+async def check_recovery(stub: StubNutritionix, upstream: Upstream, reset: float):
+    """После восстановления сервиса пробный запрос замыкает автомат."""
+    stub.scenario = SCENARIOS["healthy"]
+    try:
+        await utils.fetch_food_calories("banana")
+        raise AssertionError("автомат должен быть разомкнут сразу после сбоя")
+    except CircuitOpenError as e:
+        print(f"while open: rejected, retry after {e.retry_after:.2f} s")
+    await asyncio.sleep(reset)
+    assert await utils.fetch_food_calories("banana") == 89.0
+    assert upstream.stats()["open"] == 0
+    print("after reset timeout: probe succeeded, breaker closed")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=2.0, help="таймаут запроса, с")
+    parser.add_argument(
+        "--reset", type=float, default=1.0, help="время до пробного запроса, с"
+    )
+    parser.add_argument(
+        "--scenarios", default=",".join(SCENARIOS), help="сценарии через запятую"
+    )
+    args = parser.parse_args()
+
+    stub = StubNutritionix()
+    runner, url = await stub.start()
+    utils.NUTRITIONIX_API_URL = url
+    utils.translate_text = lambda text: asyncio.sleep(0, text)
+    client = HttpClient(timeouts={"nutritionix": args.timeout})
+    utils.http_client = client
+    await client.start()
+    try:
+        for scenario in args.scenarios.split(","):
+            for mode in ("before", "after"):
+                upstream = await run(stub, scenario, mode, args)
+            if scenario == "outage":
+                await check_recovery(stub, upstream, args.reset)
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,175 @@
+"""Масштабирование шардированного webhook-режима с 1 до N процессов.
+
+Для каждого числа шардов из --shards запускает bot.py в режиме "sharded"
+(фронт и процессы-обработчики), направляет вызовы Bot API в локальную
+заглушку и отправляет синтетические обновления от --users пользователей.
+Пропускная способность считается по ответам бота. С --pipelined
+пользователи шлют обновления, не дожидаясь ответов, и для /start
+проверяется, что каждый получил ответы в порядке отправки (номер обновления
+передается в имени пользователя и возвращается в приветствии).
+
+Генератор нагрузки и заглушка работают в одном процессе и сами занимают
+ядро, поэтому на машине с N ядрами рост упирается в них раньше, чем в N.
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+
+import _common
+import aiohttp
+from _common import report
+from aiohttp import web
+from bench_webhook import SECRET, free_port, wait_healthy
+from fake_telegram import FakeBotAPI, make_update
+
+GREETING = re.compile(r"Привет, (\d+)!")
+
+
+class OrderedFakeBotAPI(FakeBotAPI):
+    """Заглушка, ожидающая несколько ответов в чат и запоминающая их порядок."""
+
+    def __init__(self):
+        super().__init__()
+        self.replies: dict[int, list[int]] = defaultdict(list)
+
+    def expect_reply(self, chat_id: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(chat_id, []).append(future)
+        return future
+
+    async def _handle(self, request):
+        method = request.match_info["method"]
+        if method in ("sendMessage", "sendPhoto"):
+            self.calls[method] += 1
+            data = await request.post()
+            chat_id = int(data["chat_id"])
+            waiters = self._waiters.get(chat_id)
+            if waiters:
+                waiters.pop(0).set_result(time.perf_counter())
+            greeting = GREETING.match(data.get("text", ""))
+            if greeting:
+                self.replies[chat_id].append(int(greeting[1]))
+            return web.json_response({"ok": True, "result": self._message(chat_id)})
+        return await super()._handle(request)
+
+
+async def run(shards: int, args: argparse.Namespace) -> float:
+    fake_api = OrderedFakeBotAPI()
+    api_url = await fake_api.start()
+    port = free_port()
+    env = {
+        **os.environ,
+        "BOT_RUN_MODE": "sharded",
+        "WEBHOOK_URL": f"http://127.0.0.1:{port}",
+        "WEBHOOK_SECRET": SECRET,
+        "WEBHOOK_HOST": "127.0.0.1",
+        "WEBHOOK_PORT": str(port),
+        "SHARD_WORKERS": str(shards),
+        "SHARD_BASE_PORT": str(free_port()),
+        "SHARD_HEALTH_INTERVAL": "0.2",
+        "TELEGRAM_API_URL": api_url,
+        "STORAGE_BACKEND": "memory",
+        "FSM_STORAGE_BACKEND": "memory",
+        "CHART_WORKERS": "1",
+        "LOG_LEVEL": "WARNING",
+    }
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        os.path.join(_common.ROOT, "bot.py"),
+        env=env,
+        cwd=_common.ROOT,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=None if args.verbose else asyncio.subprocess.DEVNULL,
+    )
+
+    webhook_url = f"http://127.0.0.1:{port}/webhook"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    # Обновления одного пользователя отправляются по очереди, как их шлет
+    # Telegram; пользователи — параллельно
+    per_user = args.updates // args.users
+
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=args.concurrency)
+    ) as session:
+        try:
+            await wait_healthy(session, f"http://127.0.0.1:{port}/healthz")
+
+            async def user_session(user: int) -> None:
+                user_id = 1_000_000 + user
+                pending = []
+                for i in range(per_user):
+                    update = make_update(user * per_user + i + 1, user_id, args.text)
+                    update["message"]["from"]["first_name"] = str(i)
+                    async with semaphore:
+                        reply = fake_api.expect_reply(user_id)
+                        started = time.perf_counter()
+                        async with session.post(
+                            webhook_url, json=update, headers=headers
+                        ) as response:
+                            response.raise_for_status()
+                    if args.pipelined:
+                        pending.append((reply, started))
+                    else:
+                        latencies.append(await reply - started)
+                for reply, started in pending:
+                    latencies.append(await reply - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(user_session(u) for u in range(args.users)))
+            elapsed = time.perf_counter() - started
+            report(f"shards={shards} {args.text!r}", latencies, elapsed)
+
+            out_of_order = sum(
+                replies != sorted(replies) for replies in fake_api.replies.values()
+            )
+            async with session.get(f"http://127.0.0.1:{port}/healthz") as response:
+                health = await response.json()
+            restarts = sum(shard["restarts"] for shard in health["shards"])
+            print(
+                f"{'':<32} users={len(fake_api.replies)} "
+                f"out_of_order={out_of_order} restarts={restarts}"
+            )
+            return len(latencies) / elapsed
+        finally:
+            process.terminate()
+            await process.wait()
+            await fake_api.close()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--shards",
+        type=lambda value: [int(n) for n in value.split(",")],
+        default=[1, 2, 4],
+        help="числа шардов через запятую",
+    )
+    parser.add_argument("--updates", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--text", default="/start")
+    parser.add_argument(
+        "--pipelined",
+        action="store_true",
+        help="не ждать ответа перед следующим обновлением пользователя",
+    )
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    print(f"CPU cores: {os.cpu_count()}")
+    baseline = None
+    for shards in args.shards:
+        rps = await run(shards, args)
+        baseline = baseline or rps
+        print(f"{'':<32} speedup x{rps / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,156 @@
+"""Время запуска бота: импорт модулей и время до ответа на первое обновление.
+
+1. Запускает `python -X importtime -c "import bot"` и печатает суммарное
+   время импорта отслеживаемых модулей (тяжелые зависимости — matplotlib,
+   googletrans, aiogram — и модули бота) и общее время импорта bot.
+2. Запускает bot.py в режиме polling с локальной заглушкой Bot API, которая
+   в первом getUpdates отдает /start, и измеряет время от запуска процесса
+   до ответа бота, а также RSS процесса в этот момент.
+
+Каждый замер повторяется --runs раз, печатается медиана.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import _common
+from aiohttp import web
+from fake_telegram import FakeBotAPI, make_update
+
+MODULES = (
+    "aiogram",
+    "matplotlib",
+    "googletrans",
+    "numpy",
+    "charts",
+    "chart_service",
+    "translation",
+    "utils",
+    "bot",
+)
+
+USER_ID = 1_000_001
+
+
+def bench_env(api_url: str = "") -> dict[str, str]:
+    env = {
+        **os.environ,
+        "STORAGE_BACKEND": "memory",
+        "FSM_STORAGE_BACKEND": "memory",
+        "LOG_LEVEL": "WARNING",
+    }
+    if api_url:
+        env["TELEGRAM_API_URL"] = api_url
+    return env
+
+
+def import_times() -> dict[str, float]:
+    """Накопленное время импорта модулей (в секундах) по -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import bot"],
+        env=bench_env(),
+        cwd=_common.ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if name in MODULES and cumulative.strip().isdigit():
+            times[name] = int(cumulative) / 1_000_000
+    return times
+
+
+class PollingFakeBotAPI(FakeBotAPI):
+    """Заглушка, отдающая одно обновление /start через getUpdates."""
+
+    def __init__(self):
+        super().__init__()
+        self.update = make_update(1, USER_ID, "/start")
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        if request.match_info["method"] != "getUpdates":
+            return await super()._handle(request)
+        self.calls["getUpdates"] += 1
+        data = await request.post()
+        if int(data.get("offset", 0)) <= self.update["update_id"]:
+            return web.json_response({"ok": True, "result": [self.update]})
+        await asyncio.sleep(0.5)
+        return web.json_response({"ok": True, "result": []})
+
+
+def rss_mb(pid: int) -> float:
+    """Резидентная память процесса (Linux), МБ."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+async def first_update(verbose: bool) -> tuple[float, float]:
+    """Время от запуска bot.py до ответа на /start (с) и RSS в этот момент."""
+    fake_api = PollingFakeBotAPI()
+    api_url = await fake_api.start()
+    reply = fake_api.expect_reply(USER_ID)
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        os.path.join(_common.ROOT, "bot.py"),
+        env=bench_env(api_url),
+        cwd=_common.ROOT,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=None if verbose else asyncio.subprocess.DEVNULL,
+    )
+    try:
+        replied = await asyncio.wait_for(reply, 120)
+        return replied - started, rss_mb(process.pid)
+    finally:
+        process.terminate()
+        await process.wait()
+        await fake_api.close()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    samples: dict[str, list[float]] = {}
+    for _ in range(args.runs):
+        for name, seconds in import_times().items():
+            samples.setdefault(name, []).append(seconds)
+    print("import time (cumulative, median):")
+    for name in MODULES:
+        values = samples.get(name)
+        if values is None:
+            print(f"  {name:<16} not imported")
+        else:
+            print(f"  {name:<16} {statistics.median(values) * 1000:8.1f} ms")
+
+    firsts, rss = [], []
+    for _ in range(args.runs):
+        elapsed, memory = await first_update(args.verbose)
+        firsts.append(elapsed)
+        rss.append(memory)
+    print(
+        f"time to first update: median={statistics.median(firsts) * 1000:.0f} ms "
+        f"min={min(firsts) * 1000:.0f} ms  rss={statistics.median(rss):.1f} MB"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
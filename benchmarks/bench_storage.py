@@ -0,0 +1,63 @@
+"""Нагрузочный тест хранилища: 10k пользователей одновременно пишут /log_water.
+
+Режим "write-through" дожидается коммита после каждой записи (как если бы
+каждое сообщение ждало fsync), режим "write-behind" использует отложенную
+пакетную запись SQLiteStorage.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import _common  # noqa: F401
+from _common import report
+
+from storage import SQLiteStorage
+
+
+async def run(mode: str, users: int, writes: int, concurrency: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        storage = SQLiteStorage(path=os.path.join(directory, "bench.sqlite3"))
+        await storage.start()
+        for user_id in range(users):
+            await storage.save_user(user_id, {"weight": 70, "water_goal": 2100})
+        await storage.flush()
+
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def log_water(user_id: int) -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                await storage.get_user(user_id)
+                await storage.add_daily_log(user_id, "2025-01-01", water=250)
+                if mode == "write-through":
+                    await storage.flush()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(log_water(user_id) for _ in range(writes) for user_id in range(users))
+        )
+        elapsed = time.perf_counter() - started
+        flush_started = time.perf_counter()
+        await storage.close()
+        report(mode, latencies, elapsed)
+        print(f"{'':<32} final flush {time.perf_counter() - flush_started:.3f} s")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--writes", type=int, default=1, help="записей на пользователя")
+    parser.add_argument("--concurrency", type=int, default=1000)
+    args = parser.parse_args()
+
+    for mode in ("write-through", "write-behind"):
+        await run(mode, args.users, args.writes, args.concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
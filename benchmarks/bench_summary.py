@@ -0,0 +1,211 @@
+"""Рассылка итогов дня: темп отправки, продолжение после перезапуска и
+отзывчивость интерактивных графиков во время рассылки.
+
+Заглушка Bot API запоминает время каждого сообщения, часть чатов отвечает
+403 (бот заблокирован), а иногда заглушка отвечает 429 с retry_after.
+Рассылка прерывается на середине (как при перезапуске бота) и запускается
+заново новым экземпляром; проверяется, что каждый подписчик получил все
+три сообщения итогов и ни одно не пришло дважды. Параллельно с рассылкой замеряется
+время отрисовки графиков /check_progress с уникальными данными.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+import _common  # noqa: F401
+from _common import report
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+from fake_telegram import FakeBotAPI
+
+from chart_service import chart_service
+from storage import MemoryStorage
+from summary import DailySummary, SummaryStore
+
+
+class SummaryFakeBotAPI(FakeBotAPI):
+    """Заглушка с журналом отправок, блокировками и flood control."""
+
+    def __init__(self, blocked: set[int], flood_share: float):
+        super().__init__()
+        self.blocked = blocked
+        self.flood_share = flood_share
+        self.sent: dict[int, list[tuple[float, str]]] = defaultdict(list)
+        self.floods = 0
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if method not in ("sendMessage", "sendPhoto"):
+            return await super()._handle(request)
+        data = await request.post()
+        chat_id = int(data["chat_id"])
+        if chat_id in self.blocked:
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 403,
+                    "description": "Forbidden: bot was blocked by the user",
+                },
+                status=403,
+            )
+        if random.random() < self.flood_share:
+            self.floods += 1
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": "Too Many Requests: retry after 1",
+                    "parameters": {"retry_after": 1},
+                },
+                status=429,
+            )
+        self.sent[chat_id].append((time.monotonic(), method))
+        message = self._message(chat_id)
+        if method == "sendPhoto":
+            message["photo"] = [
+                {
+                    "file_id": f"photo{message['message_id']}",
+                    "file_unique_id": f"u{message['message_id']}",
+                    "width": 640,
+                    "height": 480,
+                }
+            ]
+        return web.json_response({"ok": True, "result": message})
+
+
+async def fill_storage(users: int, day: date) -> MemoryStorage:
+    storage = MemoryStorage()
+    for user_id in range(1, users + 1):
+        await storage.save_user(
+            user_id, {"water_goal": 2500, "calorie_goal": 2200, "city": "Moscow"}
+        )
+        # У каждого десятого записей за сегодня нет: итоги не отправляются
+        for offset in range(0 if user_id % 10 else 1, 7):
+            await storage.add_daily_log(
+                user_id,
+                (day - timedelta(days=offset)).isoformat(),
+                water=random.choice((1500, 2000, 2500, 3000)),
+                calories_in=random.choice((1800, 2100, 2400)),
+                calories_burned=random.choice((0, 200, 400)),
+            )
+    return storage
+
+
+async def probe_charts(stop: asyncio.Event, interval: float) -> list[float]:
+    """Задержки отрисовки графиков с уникальными данными, как у /check_progress."""
+    dates = [f"2026-01-0{i}" for i in range(1, 8)]
+    latencies = []
+    while not stop.is_set():
+        values = [random.uniform(0, 3000) for _ in dates]
+        started = time.perf_counter()
+        await chart_service.render_progress(dates, values, 2500, values, 2200)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+def peak_rate(fake_api: SummaryFakeBotAPI) -> int:
+    """Наибольшее число сообщений за любую секунду."""
+    times = sorted(t for sent in fake_api.sent.values() for t, _ in sent)
+    peak, left = 0, 0
+    for right, moment in enumerate(times):
+        while moment - times[left] >= 1:
+            left += 1
+        peak = max(peak, right - left + 1)
+    return peak
+
+
+def min_chat_interval(fake_api: SummaryFakeBotAPI) -> float:
+    gaps = [
+        b[0] - a[0] for sent in fake_api.sent.values() for a, b in zip(sent, sent[1:])
+    ]
+    return min(gaps, default=0.0)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=20, help="сообщений в секунду")
+    parser.add_argument("--blocked", type=float, default=0.05, help="доля 403")
+    parser.add_argument("--flood", type=float, default=0.01, help="доля 429")
+    parser.add_argument(
+        "--interrupt", type=float, default=0.4, help="доля рассылки до перезапуска"
+    )
+    args = parser.parse_args()
+
+    day = date.today()
+    users = list(range(1, args.users + 1))
+    blocked = set(random.sample(users, int(args.users * args.blocked)))
+    fake_api = SummaryFakeBotAPI(blocked, args.flood)
+    api_url = await fake_api.start()
+    bot = Bot(
+        token=os.environ["BOT_TOKEN"],
+        session=AiohttpSession(api=TelegramAPIServer.from_base(api_url)),
+    )
+    storage = await fill_storage(args.users, day)
+    path = os.path.join(tempfile.mkdtemp(), "summary.sqlite3")
+    store = SummaryStore(path)
+    for user_id in users:
+        await store.subscribe(user_id)
+    await chart_service.start()
+
+    stop = asyncio.Event()
+    baseline_task = asyncio.create_task(probe_charts(stop, 0.1))
+    await asyncio.sleep(3)
+    stop.set()
+    baseline = await baseline_task
+
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe_charts(stop, 0.1))
+    started = time.perf_counter()
+    try:
+        first = DailySummary(bot, storage, store, rate=args.rate)
+        run = asyncio.create_task(first.run(day))
+        expected = args.users * 0.9 * 3
+        while sum(map(len, fake_api.sent.values())) < expected * args.interrupt:
+            await asyncio.sleep(0.05)
+        run.cancel()
+        await asyncio.gather(run, return_exceptions=True)
+        await store.close()
+        print(f"interrupted after {time.perf_counter() - started:.1f} s")
+
+        store = SummaryStore(path)
+        second = DailySummary(bot, storage, store, rate=args.rate)
+        assert await store.run_state(day.isoformat()) == "started"
+        stats = await second.run(day)
+        elapsed = time.perf_counter() - started
+    finally:
+        stop.set()
+        during = await probe_task
+        await store.close()
+        await chart_service.close()
+        await bot.session.close()
+        await fake_api.close()
+
+    received = {chat_id for chat_id, sent in fake_api.sent.items() if len(sent) >= 3}
+    expected_users = {u for u in users if u % 10 and u not in blocked}
+    duplicates = sum(len(sent) > 3 for sent in fake_api.sent.values())
+    messages = sum(map(len, fake_api.sent.values()))
+    print(f"second run: {stats}")
+    print(
+        f"delivered to {len(received)}/{len(expected_users)} users, "
+        f"missing={len(expected_users - received)} duplicates={duplicates}, "
+        f"{messages} messages in {elapsed:.1f} s "
+        f"({messages / elapsed:.1f}/s, peak {peak_rate(fake_api)}/s, "
+        f"limit {args.rate:g}/s), 429 answered={fake_api.floods}, "
+        f"min per-chat gap {min_chat_interval(fake_api):.2f} s"
+    )
+    report("interactive charts idle", baseline, 3)
+    report("interactive charts during push", during, elapsed)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
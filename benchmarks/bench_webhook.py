@@ -0,0 +1,107 @@
+"""Генератор нагрузки для webhook-режима без подключения к Telegram.
+
+Запускает bot.py в отдельном процессе в режиме webhook, направляет его
+вызовы Bot API в локальную заглушку и отправляет синтетические обновления.
+Задержка считается от POST обновления до ответа бота в соответствующий чат.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+import _common
+import aiohttp
+from _common import report
+from fake_telegram import FakeBotAPI, make_update
+
+SECRET = "bench-secret"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_healthy(session: aiohttp.ClientSession, url: str) -> None:
+    for _ in range(300):
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("Бот не запустился")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--text", default="/start")
+    args = parser.parse_args()
+
+    fake_api = FakeBotAPI()
+    api_url = await fake_api.start()
+    port = free_port()
+    env = {
+        **os.environ,
+        "BOT_RUN_MODE": "webhook",
+        "WEBHOOK_URL": f"http://127.0.0.1:{port}",
+        "WEBHOOK_SECRET": SECRET,
+        "WEBHOOK_HOST": "127.0.0.1",
+        "WEBHOOK_PORT": str(port),
+        "WEBHOOK_WORKERS": str(args.workers),
+        "TELEGRAM_API_URL": api_url,
+        "STORAGE_BACKEND": "memory",
+        "CHART_WORKERS": "1",
+    }
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        os.path.join(_common.ROOT, "bot.py"),
+        env=env,
+        cwd=_common.ROOT,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+
+    webhook_url = f"http://127.0.0.1:{port}/webhook"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async with aiohttp.ClientSession() as session:
+        try:
+            await wait_healthy(session, f"http://127.0.0.1:{port}/healthz")
+
+            async def send(update_id: int) -> None:
+                async with semaphore:
+                    user_id = 1_000_000 + update_id
+                    reply = fake_api.expect_reply(user_id)
+                    started = time.perf_counter()
+                    async with session.post(
+                        webhook_url,
+                        json=make_update(update_id, user_id, args.text),
+                        headers=headers,
+                    ) as response:
+                        response.raise_for_status()
+                    latencies.append(await reply - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(send(i) for i in range(1, args.updates + 1)))
+            elapsed = time.perf_counter() - started
+            report(f"webhook {args.text!r}", latencies, elapsed)
+            print(f"Bot API calls: {dict(fake_api.calls)}")
+        finally:
+            process.terminate()
+            await process.wait()
+            await fake_api.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""Локальная заглушка Telegram Bot API и генератор синтетических обновлений."""
+
+import asyncio
+import itertools
+import time
+from collections import defaultdict
+
+from aiohttp import web
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+class FakeBotAPI:
+    """Отвечает на вызовы Bot API и запоминает, когда бот ответил каждому чату."""
+
+    def __init__(self):
+        self.calls: dict[str, int] = defaultdict(int)
+        self._message_ids = itertools.count(1)
+        self._waiters: dict[int, asyncio.Future] = {}
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application(client_max_size=32 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def expect_reply(self, chat_id: int) -> asyncio.Future:
+        """Future, который завершится при первом ответе бота в чат."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[chat_id] = future
+        return future
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        data = await request.post()
+        if method in ("sendMessage", "sendPhoto"):
+            chat_id = int(data["chat_id"])
+            future = self._waiters.pop(chat_id, None)
+            if future is not None and not future.done():
+                future.set_result(time.perf_counter())
+            return web.json_response({"ok": True, "result": self._message(chat_id)})
+        if method == "getMe":
+            return web.json_response({"ok": True, "result": BOT_USER})
+        return web.json_response({"ok": True, "result": True})
+
+    def _message(self, chat_id: int) -> dict:
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": "ok",
+        }
+        return message
+
+
+def make_update(update_id: int, user_id: int, text: str) -> dict:
+    """Синтетическое обновление с текстовым сообщением от пользователя."""
+    entities = []
+    if text.startswith("/"):
+        command_length = len(text.split()[0])
+        entities.append({"type": "bot_command", "offset": 0, "length": command_length})
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "text": text,
+            "entities": entities,
+        },
+    }
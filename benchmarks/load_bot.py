@@ -0,0 +1,54 @@
+"""Запуск bot.py с переводчиком, направленным в локальную заглушку.
+
+Используется bench_load.py. Адреса OpenWeather, Nutritionix и api-ninjas
+задаются переменными окружения, а googletrans обращается к
+translate.googleapis.com только по HTTPS, поэтому его запросы
+перенаправляются транспортом httpx на адрес из LOAD_TRANSLATOR_URL. Разбор
+ответа остается настоящим.
+"""
+
+import asyncio
+import os
+
+import _common  # noqa: F401
+import httpx
+
+import translation
+
+
+class RedirectTransport(httpx.AsyncBaseTransport):
+    """Отправляет все запросы клиента на другой адрес, сохраняя путь."""
+
+    def __init__(self, base_url: str):
+        self.base_url = httpx.URL(base_url)
+        self._transport = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(
+            scheme=self.base_url.scheme,
+            host=self.base_url.host,
+            port=self.base_url.port,
+        )
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def stub_translator():
+    from googletrans import Translator
+
+    translator = Translator(service_urls=["translate.googleapis.com"], http2=False)
+    translator.client = httpx.AsyncClient(
+        transport=RedirectTransport(os.environ["LOAD_TRANSLATOR_URL"])
+    )
+    return translator
+
+
+translation._import_translator = lambda: stub_translator
+
+
+if __name__ == "__main__":
+    import bot
+
+    asyncio.run(bot.main())
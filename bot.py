@@ -2,32 +2,154 @@ import asyncio
 from datetime import date
 
 from aiogram import Bot, Dispatcher, F, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import BufferedInputFile, FSInputFile
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from config import BOT_TOKEN
-from middleware import LoggingMiddleware
+from chart_service import RenderedChart, chart_service
+from config import (
+    ADMIN_USER_IDS,
+    BOT_RUN_MODE,
+    BOT_TOKEN,
+    METRICS_HOST,
+    METRICS_LOOP_LAG_INTERVAL,
+    METRICS_PORT,
+    PROFILE_TEMPERATURE_TIMEOUT,
+    SHARD_INDEX,
+    SHARD_WORKERS,
+    SUMMARY_SEND_RATE,
+    TELEGRAM_API_URL,
+)
+from fsm_storage import create_fsm_storage
+from http_client import http_client
+from metrics import (
+    Gauge,
+    monitor_event_loop_lag,
+    registry,
+    start_metrics_server,
+)
+from middleware import LoggingMiddleware, MetricsMiddleware, ThrottlingMiddleware
+from resilience import upstreams
+from sharding import run_sharded, shard_of
+from storage import create_storage
+from summary import DailySummary, SummaryStore
+from translation import translation_service
 from utils import (
+    activity_calories_stats,
+    activity_rate_cache,
     calculate_calorie_norm,
     calculate_water_norm,
-    create_calories_progress_chart,
-    create_water_progress_chart,
+    fetch_city_temperatures,
+    food_calories_cache,
+    food_calories_stats,
     get_activity_calories,
     get_food_calories,
-    get_temperature,
+    get_last_7_days,
+    get_meal_calories,
+    get_net_calories,
+    get_water_values,
+    parse_meal,
+    prefetch_temperature,
     setup_logger,
+    temperature_cache,
+    wait_temperature,
 )
+from webhook import run_shard_worker, run_webhook
 
 logger = setup_logger(__name__)
 
-bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher()
+bot = Bot(
+    token=BOT_TOKEN,
+    session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+    if TELEGRAM_API_URL
+    else None,
+)
+fsm_storage = create_fsm_storage()
+dp = Dispatcher(storage=fsm_storage)
+throttling = ThrottlingMiddleware()
 dp.message.middleware(LoggingMiddleware())
+dp.message.middleware(throttling)
+dp.message.middleware(MetricsMiddleware())
+dp.callback_query.middleware(MetricsMiddleware())
+
+storage = create_storage()
 
-users = {}
+
+def owns_user(user_id: int) -> bool:
+    """Пользователь обслуживается этим процессом (в режиме "shard" — шардом)."""
+    return BOT_RUN_MODE != "shard" or shard_of(user_id, SHARD_WORKERS) == SHARD_INDEX
+
+
+if BOT_RUN_MODE == "shard":
+    # Каждый шард рассылает итоги своим пользователям: их данные в его кэше
+    daily_summary = DailySummary(
+        bot,
+        storage,
+        SummaryStore(shard=SHARD_INDEX),
+        owns=owns_user,
+        rate=SUMMARY_SEND_RATE / SHARD_WORKERS,
+    )
+else:
+    daily_summary = DailySummary(bot, storage)
+
+
+def collect_cache_stats() -> dict[tuple[str, str], float]:
+    """Счетчики кэшей для /metrics."""
+    caches = {
+        "food_calories": food_calories_cache,
+        "activity_rate": activity_rate_cache,
+        "temperature": temperature_cache,
+        "translation": translation_service.cache,
+        "charts": chart_service.cache,
+    }
+    if hasattr(fsm_storage, "stats"):
+        caches["fsm"] = fsm_storage
+    stats = {
+        (name, key): value
+        for name, cache in caches.items()
+        for key, value in cache.stats().items()
+    }
+    for key, value in activity_calories_stats.items():
+        stats[("activity_calories", key)] = value
+    for key, value in food_calories_stats.items():
+        stats[("food_calories_source", key)] = value
+    stats[("translation", "network_calls")] = translation_service.network_calls
+    for key, value in throttling.stats().items():
+        stats[("throttling", key)] = value
+    return stats
+
+
+registry.register(
+    Gauge(
+        "bot_cache_stat",
+        "Счетчики кэшей: размер, попадания, промахи, вытеснения",
+        collect_cache_stats,
+        ("cache", "stat"),
+    )
+)
+
+
+def collect_upstream_stats() -> dict[tuple[str, str], float]:
+    """Состояние автоматов и счетчики запросов к внешним API для /metrics."""
+    return {
+        (name, key): value
+        for name, upstream in upstreams.items()
+        for key, value in upstream.stats().items()
+    }
+
+
+registry.register(
+    Gauge(
+        "bot_upstream_stat",
+        "Внешние API: автомат, сбои, повторы, дублирующие запросы, p95",
+        collect_upstream_stats,
+        ("upstream", "stat"),
+    )
+)
 
 
 class SetProfile(StatesGroup):
@@ -48,10 +170,6 @@ class LogFood(StatesGroup):
     food_amount = State()
 
 
-# Словарь для временного хранения данных о продуктах
-food_cache = {}
-
-
 @dp.message(Command("start"))
 async def start_command(message: types.Message):
     await message.answer(
@@ -61,8 +179,11 @@ async def start_command(message: types.Message):
         "/set_profile - Настройка вашего профиля\n"
         "/log_water <мл> - Записать количество выпитой воды\n"
         "/log_food <продукт> - Записать съеденный продукт\n"
+        "/log_meal <продукт граммы, ...> - Записать несколько продуктов\n"
         "/log_workout <тип> <минуты> - Записать тренировку\n"
         "/check_progress - Просмотр прогресса\n"
+        "/stats [30|90|365] - Итоги за длинный период\n"
+        "/summary on|off - Итоги дня каждый вечер\n"
         "/help - Подробная справка"
     )
 
@@ -74,9 +195,15 @@ async def help_command(message: types.Message):
         "1. /set_profile - Настройка профиля (вес, рост, возраст, пол, город, активность)\n"
         "2. /log_water <мл> - Запись выпитой воды (пример: /log_water 250)\n"
         "3. /log_food <продукт> - Запись съеденного продукта (пример: /log_food банан)\n"
-        "4. /log_workout <тип> <минуты> - Запись тренировки "
+        "4. /log_meal <продукт граммы, ...> - Запись нескольких продуктов "
+        "(пример: /log_meal гречка 200г, курица 150г)\n"
+        "5. /log_workout <тип> <минуты> - Запись тренировки "
         "(пример: /log_workout бег 30)\n"
-        "5. /check_progress - Просмотр графиков потребления воды и калорий\n\n"
+        "6. /check_progress - Просмотр графиков потребления воды и калорий\n"
+        "7. /stats [30|90|365] - Средние значения, серии и дни сверх лимита "
+        "за 30, 90 или 365 дней\n"
+        "8. /summary on|off - Подписка на итоги дня с графиками, "
+        f"которые приходят в {daily_summary.at[0]:02}:{daily_summary.at[1]:02}\n\n"
         "Бот автоматически рассчитает вашу норму калорий и воды "
         "на основе данных профиля и температуры в вашем городе."
     )
@@ -135,6 +262,9 @@ async def set_user_sex(callback: types.CallbackQuery, state: FSMContext):
 async def set_user_city(message: types.Message, state: FSMContext):
     """Задать город."""
     await state.update_data(user_city=message.text)
+    # Температура нужна только на следующем шаге: загружаем ее, пока
+    # пользователь отвечает на вопрос об активности
+    prefetch_temperature(message.text)
     await state.set_state(SetProfile.activity_level)
     await message.answer("Сколько минут активности у вас в день?")
 
@@ -153,8 +283,8 @@ async def set_user_activity_level(message: types.Message, state: FSMContext):
     age = int(data["user_age"])
     activity = int(data["user_activity_level"])
 
-    # Get temperature for user's city
-    temperature = await get_temperature(data["user_city"])
+    # Get temperature for user's city, prefetched at the previous step
+    temperature = await wait_temperature(data["user_city"], PROFILE_TEMPERATURE_TIMEOUT)
 
     # Calculate norms
     water_norm = calculate_water_norm(weight, activity, temperature)
@@ -163,43 +293,89 @@ async def set_user_activity_level(message: types.Message, state: FSMContext):
     )
 
     # Save user data
-    users[message.from_user.id] = {
-        "weight": weight,
-        "height": height,
-        "age": age,
-        "activity": activity,
-        "city": data["user_city"],
-        "water_goal": water_norm,
-        "calorie_goal": calorie_norm,
-        "logged_water": 0,
-        "logged_calories": 0,
-        "burned_calories": 0,
-    }
+    await storage.save_user(
+        message.from_user.id,
+        {
+            "weight": weight,
+            "height": height,
+            "age": age,
+            "activity": activity,
+            "sex": data["user_sex"],
+            "city": data["user_city"],
+            "water_goal": water_norm,
+            "calorie_goal": calorie_norm,
+            "logged_water": 0,
+            "logged_calories": 0,
+            "burned_calories": 0,
+        },
+    )
+
+    if temperature is None:
+        temperature_text = "Не удалось узнать температуру в вашем городе\n"
+    else:
+        temperature_text = f"Температура в вашем городе {temperature} градусов\n"
 
     await message.answer(
         "Ваш профиль успешно заполнен!\n"
-        f"Температура в вашем городе {temperature} градусов\n"
+        f"{temperature_text}"
         f"Рекомендуемая норма воды - {water_norm} мл\n"
         f"Рекомендуемая норма калорий - {calorie_norm} ккал"
     )
 
 
-def get_today_date():
-    """Get current date as string in format YYYY-MM-DD"""
-    return date.today().isoformat()
+# Не даем запустить второй пересчет, пока идет первый
+recalc_lock = asyncio.Lock()
 
 
-def init_daily_logs(user_id: int, today: str) -> None:
-    """Initialize daily logs structure for user if not exists."""
-    if "daily_logs" not in users[user_id]:
-        users[user_id]["daily_logs"] = {}
+@dp.message(Command("recalc"))
+async def recalc_command(message: types.Message):
+    """Пересчитать нормы воды и калорий всех пользователей.
 
-    if today not in users[user_id]["daily_logs"]:
-        users[user_id]["daily_logs"][today] = {
-            "water": 0,
-            "calories_in": 0,
-            "calories_burned": 0,
+    Нормы воды считаются по текущей температуре в городе пользователя.
+    В режиме "shard" фронт пересылает команду всем шардам, и каждый
+    пересчитывает своих пользователей: профили чужих могут быть в памяти
+    другого процесса, который при записи вернул бы старые нормы.
+    """
+    if message.from_user.id not in ADMIN_USER_IDS:
+        await message.answer("Команда доступна только администраторам")
+        return
+    if recalc_lock.locked():
+        await message.answer("Пересчет норм уже выполняется")
+        return
+
+    # NumPy нужен только пересчету, поэтому не загружается при запуске бота
+    from norms import recalc_norms
+
+    scope = ""
+    if BOT_RUN_MODE == "shard":
+        scope = f" (шард {SHARD_INDEX + 1} из {SHARD_WORKERS})"
+
+    async with recalc_lock:
+        await message.answer(f"Пересчитываю нормы воды и калорий{scope}...")
+        profiles = {
+            user_id: profile
+            for user_id, profile in (await storage.get_profiles()).items()
+            if owns_user(user_id)
         }
+        temperatures = await fetch_city_temperatures(
+            profile["city"] for profile in profiles.values() if profile.get("city")
+        )
+        stats = await recalc_norms(profiles, temperatures, storage.update_profiles)
+
+    logger.info(f"Пересчет норм: {stats}")
+    await message.answer(
+        f"Пересчет норм завершен{scope}:\n"
+        f"- Пользователей: {stats['users']}\n"
+        f"- Городов: {stats['cities']} "
+        f"(без температуры: {stats['failed_cities']})\n"
+        f"- Изменено норм воды: {stats['water_changed']}\n"
+        f"- Изменено норм калорий: {stats['calories_changed']}"
+    )
+
+
+def get_today_date():
+    """Get current date as string in format YYYY-MM-DD"""
+    return date.today().isoformat()
 
 
 @dp.message(Command("log_water"))
@@ -209,7 +385,8 @@ async def log_water_command(message: types.Message, command: CommandObject):
         await message.answer("Ошибка: не переданы аргументы")
         return
 
-    if message.from_user.id not in users:
+    user = await storage.get_user(message.from_user.id)
+    if user is None:
         await message.answer("Ошибка: сначала заполните профиль с помощью /set_profile")
         return
 
@@ -217,10 +394,12 @@ async def log_water_command(message: types.Message, command: CommandObject):
         water_amount = int(command.args)
         today = get_today_date()
 
-        init_daily_logs(message.from_user.id, today)
-        users[message.from_user.id]["daily_logs"][today]["water"] += water_amount
-        current_water = users[message.from_user.id]["daily_logs"][today]["water"]
-        water_goal = users[message.from_user.id]["water_goal"]
+        today_data = await storage.add_daily_log(
+            message.from_user.id, today, water=water_amount
+        )
+        # Столбцы истории хранят double: мл выводим целыми
+        current_water = int(today_data["water"])
+        water_goal = user["water_goal"]
         remaining_water = max(0, water_goal - current_water)
 
         await message.answer(
@@ -242,10 +421,8 @@ async def log_workout_command(message: types.Message, command: CommandObject):
         await message.answer("Ошибка: не переданы аргументы")
         return
 
-    if (
-        message.from_user.id not in users
-        or users[message.from_user.id].get("weight") is None
-    ):
+    user = await storage.get_user(message.from_user.id)
+    if user is None or user.get("weight") is None:
         await message.answer("Ошибка: сначала укажите ваш вес в профиле.")
         return
 
@@ -254,7 +431,7 @@ async def log_workout_command(message: types.Message, command: CommandObject):
         workout_type, duration = command.args.rsplit(maxsplit=1)
         workout_duration = int(duration)
 
-        user_weight = users[message.from_user.id]["weight"]
+        user_weight = user["weight"]
         total_calories = await get_activity_calories(
             workout_type, user_weight, workout_duration
         )
@@ -265,6 +442,13 @@ async def log_workout_command(message: types.Message, command: CommandObject):
         )
         return
 
+    if total_calories is None:
+        await message.answer("Извините, не могу найти информацию об этой тренировке.")
+        return
+
+    await storage.add_daily_log(
+        message.from_user.id, get_today_date(), calories_burned=total_calories
+    )
     await message.answer(
         f"Записано!\nТренировка: {workout_type}\n"
         f"Длительность: {workout_duration} минут\n"
@@ -277,19 +461,30 @@ async def log_food_command(
     message: types.Message, command: CommandObject, state: FSMContext
 ):
     """Начало логирования приема пищи"""
-    if message.from_user.id not in users:
+    if await storage.get_user(message.from_user.id) is None:
         await message.answer("Ошибка: сначала заполните профиль с помощью /set_profile")
         return
 
     if command.args:
+        try:
+            # "/log_food гречка 200г" — количество указано сразу. Единица
+            # обязательна: "/log_food кофе 3в1" — это название продукта
+            items = parse_meal(command.args, require_unit=True)
+        except ValueError:
+            items = None
+        if items:
+            await state.clear()
+            await log_meal(message, items)
+            return
+
         # Если название продукта передано сразу в команде
         food_name = command.args.lower()
         try:
             calories_per_100g = await get_food_calories(food_name)
-            # Сохраняем информацию о калорийности во временный кэш
-            food_cache[message.from_user.id] = {"calories": calories_per_100g}
-
-            await state.update_data(food_name=food_name)
+            # Калорийность нужна на следующем шаге: храним ее в данных FSM
+            await state.update_data(
+                food_name=food_name, food_calories=calories_per_100g
+            )
             await state.set_state(LogFood.food_amount)
             await message.answer(
                 f"{food_name.capitalize()} — {calories_per_100g:.1f} "
@@ -305,27 +500,73 @@ async def log_food_command(
         )
 
 
+@dp.message(Command("log_meal"))
+async def log_meal_command(message: types.Message, command: CommandObject):
+    """Запись нескольких продуктов с количеством одним сообщением"""
+    if await storage.get_user(message.from_user.id) is None:
+        await message.answer("Ошибка: сначала заполните профиль с помощью /set_profile")
+        return
+
+    try:
+        items = parse_meal(command.args or "")
+    except ValueError:
+        await message.answer(
+            "Ошибка: укажите продукты и граммы через запятую. Пример:\n"
+            "/log_meal гречка 200г, курица 150г, салат 100г"
+        )
+        return
+    await log_meal(message, items)
+
+
+async def log_meal(message: types.Message, items: list[tuple[str, float]]):
+    """Посчитать калории продуктов и записать их одним обновлением"""
+    calories = await get_meal_calories(items)
+
+    lines = []
+    total_calories = None
+    for (food_name, grams), value in zip(items, calories):
+        if value is None:
+            lines.append(f"{food_name.capitalize()} {grams:g} г — не найдено")
+        else:
+            lines.append(f"{food_name.capitalize()} {grams:g} г — {value:.1f} ккал")
+            total_calories = (total_calories or 0) + value
+    # Вода или чай без сахара дают 0 ккал, но продукты найдены
+    if total_calories is None:
+        await message.answer("Извините, не могу найти информацию об этих продуктах.")
+        return
+
+    today_data = await storage.add_daily_log(
+        message.from_user.id, get_today_date(), calories_in=total_calories
+    )
+    current_calories = today_data["calories_in"]
+    user = await storage.get_user(message.from_user.id)
+    remaining_calories = max(0, user["calorie_goal"] - current_calories)
+
+    await message.answer(
+        "\n".join(lines) + f"\n\nЗаписано: {total_calories:.1f} ккал\n"
+        f"Всего за сегодня: {current_calories:.1f} ккал\n"
+        f"Осталось: {remaining_calories:.1f} ккал до нормы"
+    )
+
+
 @dp.message(LogFood.food_amount)
 async def process_food_amount(message: types.Message, state: FSMContext):
     """Обработка указанного количества продукта"""
     try:
         amount = float(message.text)
-        food_data = food_cache.get(message.from_user.id)
+        calories_per_100g = (await state.get_data()).get("food_calories")
 
-        if food_data:
-            calories_per_100g = food_data["calories"]
+        if calories_per_100g is not None:
             total_calories = (calories_per_100g * amount) / 100
 
             today = get_today_date()
-            init_daily_logs(message.from_user.id, today)
-            users[message.from_user.id]["daily_logs"][today]["calories_in"] += (
-                total_calories
+            today_data = await storage.add_daily_log(
+                message.from_user.id, today, calories_in=total_calories
             )
 
-            current_calories = users[message.from_user.id]["daily_logs"][today][
-                "calories_in"
-            ]
-            calorie_goal = users[message.from_user.id]["calorie_goal"]
+            current_calories = today_data["calories_in"]
+            user = await storage.get_user(message.from_user.id)
+            calorie_goal = user["calorie_goal"]
             remaining_calories = max(0, calorie_goal - current_calories)
 
             await message.answer(
@@ -333,9 +574,6 @@ async def process_food_amount(message: types.Message, state: FSMContext):
                 f"Всего за сегодня: {current_calories:.1f} ккал\n"
                 f"Осталось: {remaining_calories:.1f} ккал до нормы"
             )
-
-            # Очищаем временные данные
-            del food_cache[message.from_user.id]
         else:
             await message.answer("Произошла ошибка. Попробуйте снова.")
 
@@ -346,27 +584,105 @@ async def process_food_amount(message: types.Message, state: FSMContext):
         await state.clear()
 
 
+# Периоды для /stats: число дней -> название
+STATS_PERIODS = {30: "30 дней", 90: "90 дней", 365: "год"}
+
+
+@dp.message(Command("stats"))
+async def stats_command(message: types.Message, command: CommandObject):
+    """Итоги за 30, 90 или 365 дней по недельным и месячным корзинам"""
+    user_data = await storage.get_user(message.from_user.id)
+    if user_data is None:
+        await message.answer("Ошибка: сначала заполните профиль с помощью /set_profile")
+        return
+
+    try:
+        days = int(command.args) if command.args else 30
+    except ValueError:
+        days = None
+    if days not in STATS_PERIODS:
+        await message.answer(
+            "Ошибка: укажите период 30, 90 или 365 дней. Пример:\n/stats 90"
+        )
+        return
+
+    summary = await storage.get_summary(message.from_user.id, get_today_date(), days)
+    if not summary.logged_days:
+        await message.answer(f"За {STATS_PERIODS[days]} записей нет")
+        return
+
+    net_calories = summary.average("calories_in") - summary.average("calories_burned")
+    await message.answer(
+        f"Итоги за {STATS_PERIODS[days]} (дней с записями: {summary.logged_days}):\n\n"
+        "Вода:\n"
+        f"- В среднем: {summary.average('water'):.0f} мл в день\n"
+        f"- Норма выполнена: {summary.water_met} дн.\n"
+        f"- Серия дней с нормой: {summary.current_streak} "
+        f"(лучшая: {summary.best_streak})\n\n"
+        "Калории:\n"
+        f"- Потреблено в среднем: {summary.average('calories_in'):.0f} ккал в день\n"
+        f"- Сожжено в среднем: {summary.average('calories_burned'):.0f} ккал в день\n"
+        f"- Баланс в среднем: {net_calories:.0f} ккал в день\n"
+        f"- Дней с превышением лимита: {summary.calories_over}"
+    )
+
+
+@dp.message(Command("summary"))
+async def summary_command(message: types.Message, command: CommandObject):
+    """Подписка на ежедневные итоги дня"""
+    user_id = message.from_user.id
+    store = daily_summary.store
+    at = f"{daily_summary.at[0]:02}:{daily_summary.at[1]:02}"
+    args = (command.args or "").strip().lower()
+    if args == "on":
+        if await storage.get_user(user_id) is None:
+            await message.answer(
+                "Ошибка: сначала заполните профиль с помощью /set_profile"
+            )
+            return
+        await store.subscribe(user_id)
+        await message.answer(f"Итоги дня будут приходить каждый день в {at}")
+    elif args == "off":
+        await store.unsubscribe(user_id)
+        await message.answer("Подписка на итоги дня отменена")
+    elif not args:
+        if await store.is_subscribed(user_id):
+            await message.answer(f"Итоги дня приходят в {at}. Отключить: /summary off")
+        else:
+            await message.answer(
+                f"Итоги дня не приходят. Включить (в {at}): /summary on"
+            )
+    else:
+        await message.answer("Ошибка: укажите on или off. Пример:\n/summary on")
+
+
 @dp.message(Command("check_progress"))
 async def check_progress_command(message: types.Message):
     """Показывает прогресс пользователя по воде и калориям"""
-    if message.from_user.id not in users:
+    user_data = await storage.get_user(message.from_user.id)
+    if user_data is None:
         await message.answer("Ошибка: сначала заполните профиль с помощью /set_profile")
         return
 
-    user_data = users[message.from_user.id]
+    daily_logs = await storage.get_daily_logs(message.from_user.id)
 
-    if "daily_logs" not in user_data:
+    if not daily_logs:
         await message.answer("У вас пока нет записей о воде и калориях")
         return
 
     # Получаем данные за последние 7 дней
-    daily_logs = user_data["daily_logs"]
     water_goal = user_data["water_goal"]
     calorie_goal = user_data["calorie_goal"]
 
-    # Создаем графики
-    water_chart = create_water_progress_chart(daily_logs, water_goal)
-    calories_chart = create_calories_progress_chart(daily_logs, calorie_goal)
+    # Создаем графики в пуле процессов
+    dates = get_last_7_days()
+    water_chart, calories_chart = await chart_service.render_progress(
+        dates,
+        get_water_values(daily_logs, dates),
+        water_goal,
+        get_net_calories(daily_logs, dates),
+        calorie_goal,
+    )
 
     # Получаем данные за сегодня для текстового отчета
     today = get_today_date()
@@ -374,7 +690,7 @@ async def check_progress_command(message: types.Message):
         today, {"water": 0, "calories_in": 0, "calories_burned": 0}
     )
 
-    water_consumed = today_data["water"]
+    water_consumed = int(today_data["water"])
     water_remaining = max(0, water_goal - water_consumed)
 
     calories_consumed = today_data["calories_in"]
@@ -396,19 +712,97 @@ async def check_progress_command(message: types.Message):
     )
 
     # Отправляем графики
-    await message.answer_photo(
-        BufferedInputFile(water_chart.getvalue(), filename="water.png"),
-        caption="График потребления воды за последние 7 дней",
+    await send_chart(
+        message,
+        water_chart,
+        "water.png",
+        "График потребления воды за последние 7 дней",
     )
-    await message.answer_photo(
-        BufferedInputFile(calories_chart.getvalue(), filename="calories.png"),
-        caption="График баланса калорий за последние 7 дней",
+    await send_chart(
+        message,
+        calories_chart,
+        "calories.png",
+        "График баланса калорий за последние 7 дней",
     )
 
 
+async def send_chart(
+    message: types.Message, chart: RenderedChart, filename: str, caption: str
+) -> None:
+    """Отправить график; повторно отправляет уже загруженное фото по file_id."""
+    photo = chart.file_id or BufferedInputFile(chart.png, filename=filename)
+    sent = await message.answer_photo(photo, caption=caption)
+    if chart.file_id is None and sent.photo:
+        chart.file_id = sent.photo[-1].file_id
+
+
+async def prewarm() -> None:
+    """Прогреть пул графиков и переводчик в фоне, не задерживая запуск.
+
+    Если обновление придет раньше, нужный компонент инициализируется при
+    первом обращении, как и без прогрева.
+    """
+    results = await asyncio.gather(
+        chart_service.start(), translation_service.warmup(), return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Ошибка фонового прогрева: {result}")
+
+
 async def main():
-    await dp.start_polling(bot)
-    await bot.session.close()
+    if BOT_RUN_MODE == "sharded":
+        # Фронт только распределяет обновления, обрабатывают их шарды
+        try:
+            await run_sharded(dp, bot)
+        finally:
+            await bot.session.close()
+        return
+
+    await http_client.start()
+    await storage.start()
+    if hasattr(fsm_storage, "start"):
+        await fsm_storage.start()
+    temperature_cache.start()
+    metrics_runner = lag_task = None
+    if METRICS_PORT:
+        metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+        lag_task = asyncio.create_task(
+            monitor_event_loop_lag(METRICS_LOOP_LAG_INTERVAL)
+        )
+    prewarm_task = asyncio.create_task(prewarm())
+    summary_task = asyncio.create_task(daily_summary.run_forever())
+    try:
+        if BOT_RUN_MODE == "webhook":
+            await run_webhook(dp, bot)
+        elif BOT_RUN_MODE == "shard":
+            await run_shard_worker(dp, bot)
+        else:
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
+    finally:
+        prewarm_task.cancel()
+        summary_task.cancel()
+        logger.info(
+            f"Тренировки, посчитанные локально/через API: {activity_calories_stats}"
+        )
+        logger.info(f"Продукты, найденные локально/через API: {food_calories_stats}")
+        for name, upstream in upstreams.items():
+            logger.info(f"Внешний API {name}: {upstream.stats()}")
+        if lag_task is not None:
+            lag_task.cancel()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await temperature_cache.close()
+        # Ошибки фоновых задач уже записаны в лог и не должны мешать закрыть
+        # хранилище: иначе несохраненные записи пользователей будут потеряны
+        await asyncio.gather(prewarm_task, summary_task, return_exceptions=True)
+        await daily_summary.close()
+        await chart_service.close()
+        await storage.close()
+        await http_client.close()
+        await translation_service.close()
+        await bot.session.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,325 @@
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_name(name: str) -> str:
+    """Normalize user input for use as a cache key.
+
+    Args:
+        name (str): Food, activity or city name as typed by user
+
+    Returns:
+        str: Lowercased name with collapsed whitespace and "ё" replaced by "е"
+    """
+    return " ".join(name.lower().replace("ё", "е").split())
+
+
+class SingleFlight:
+    """Объединение одновременных вызовов загрузчика для одного ключа.
+
+    Загрузчик выполняется отдельной задачей: отмена вызвавшего его
+    обработчика не отменяет загрузку, и остальные ожидающие получают ее
+    результат.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Вызвать загрузчик или дождаться уже идущего вызова с тем же ключом."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Все ожидающие могли быть отменены; помечаем исключение полученным
+            task.exception()
+
+
+class TTLCache:
+    """LRU-кэш с ограниченным размером и временем жизни записей.
+
+    Размер ограничивается числом записей и, опционально, суммарным объемом
+    в байтах. Отрицательные результаты (None) хранятся меньшее время,
+    а одновременные запросы одного ключа объединяются в один вызов загрузчика.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        negative_ttl: float | None = None,
+        max_bytes: int | None = None,
+        sizeof: Callable[[Hashable, Any], int] | None = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or _default_sizeof
+        self._data: OrderedDict[Hashable, tuple[float, Any, int]] = OrderedDict()
+        self.bytes = 0
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key)[0]
+
+    def _lookup(self, key: Hashable) -> tuple[bool, Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Получить значение из кэша без обращения к загрузчику."""
+        found, value = self._lookup(key)
+        if found:
+            self.hits += 1
+            return value
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """Сохранить значение; None хранится negative_ttl секунд."""
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        self._remove(key)
+        size = self._sizeof(key, value)
+        self._data[key] = (time.monotonic() + ttl, value, size)
+        self.bytes += size
+        while len(self._data) > self.maxsize or (
+            self.max_bytes is not None
+            and self.bytes > self.max_bytes
+            and len(self._data) > 1
+        ):
+            _, (_, _, evicted_size) = self._data.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def _remove(self, key: Hashable) -> tuple[float, Any, int] | None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+        return entry
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._remove(key)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.bytes = 0
+
+    async def get_or_load(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Получить значение из кэша или загрузить его.
+
+        Args:
+            key (Hashable): Ключ кэша
+            loader (Callable): Корутина-фабрика, вызывается при промахе
+
+        Returns:
+            Any: Значение из кэша или результат загрузчика
+        """
+        found, value = self._lookup(key)
+        if found:
+            self.hits += 1
+            return value
+
+        if key in self._flight:
+            self.coalesced += 1
+            return await self._flight.do(key, loader)
+
+        self.misses += 1
+
+        async def load() -> Any:
+            loaded = await loader()
+            self.set(key, loaded)
+            return loaded
+
+        return await self._flight.do(key, load)
+
+    def stats(self) -> dict[str, int]:
+        """Счетчики попаданий, промахов, вытеснений и объединенных запросов."""
+        return {
+            "size": len(self._data),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "coalesced": self.coalesced,
+        }
+
+
+class RefreshAheadCache:
+    """Кэш с фоновым обновлением популярных ключей и запасным значением.
+
+    Ключи, запрошенные не менее min_hits раз с прошлого обновления,
+    перезагружаются в фоне за refresh_ahead секунд до истечения срока.
+    Если загрузчик вернул None, отдается последнее известное значение,
+    даже устаревшее.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[Hashable], Awaitable[Any]],
+        maxsize: int,
+        ttl: float,
+        refresh_ahead: float,
+        min_hits: int,
+        refresh_interval: float,
+        refresh_concurrency: int = 10,
+    ):
+        self.loader = loader
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.min_hits = min_hits
+        self.refresh_interval = refresh_interval
+        self.refresh_concurrency = refresh_concurrency
+        # ключ -> [значение, момент истечения, обращений с прошлого обновления]
+        self._data: OrderedDict[Hashable, list] = OrderedDict()
+        self._flight = SingleFlight()
+        self._refresh_task: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.refreshes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    async def get(self, key: Hashable) -> Any:
+        """Значение из кэша; при промахе или истечении срока — загрузить."""
+        entry = self._data.get(key)
+        if entry is not None:
+            entry[2] += 1
+            self._data.move_to_end(key)
+            if entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0]
+
+        self.misses += 1
+        value = await self._load(key)
+        if value is None and entry is not None:
+            self.stale += 1
+            return entry[0]
+        return value
+
+    async def prefetch(self, key: Hashable) -> Any:
+        """Загрузить ключ заранее, если свежего значения нет.
+
+        В отличие от get, не считается обращением к ключу и не влияет на
+        фоновое обновление. Возвращает значение так же, как get.
+        """
+        entry = self._data.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        value = await self._load(key)
+        if value is None and entry is not None:
+            return entry[0]
+        return value
+
+    async def _load(self, key: Hashable) -> Any:
+        async def load() -> Any:
+            value = await self.loader(key)
+            if value is not None:
+                self._store(key, value)
+            return value
+
+        return await self._flight.do(key, load)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        entry = self._data.get(key)
+        hits = entry[2] if entry is not None else 0
+        self._data[key] = [value, time.monotonic() + self.ttl, hits]
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def refresh_due(self) -> int:
+        """Перезагрузить популярные ключи, срок которых скоро истечет.
+
+        Returns:
+            int: Число обновленных ключей
+        """
+        deadline = time.monotonic() + self.refresh_ahead
+        due = [
+            key
+            for key, (_, expires_at, hits) in self._data.items()
+            if hits >= self.min_hits and expires_at <= deadline
+        ]
+        semaphore = asyncio.Semaphore(self.refresh_concurrency)
+
+        async def refresh(key: Hashable) -> None:
+            async with semaphore:
+                if await self._load(key) is not None and key in self._data:
+                    self._data[key][2] = 0
+                    self.refreshes += 1
+
+        await asyncio.gather(*(refresh(key) for key in due))
+        return len(due)
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh_due()
+            except Exception as e:
+                logger.error(f"Ошибка фонового обновления: {e}")
+
+    def start(self) -> None:
+        """Запустить фоновое обновление."""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_periodically())
+
+    async def close(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    def stats(self) -> dict[str, int]:
+        """Счетчики попаданий, промахов, запасных ответов и фоновых обновлений."""
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "refreshes": self.refreshes,
+        }
+
+
+def _default_sizeof(key: Hashable, value: Any) -> int:
+    return sys.getsizeof(key) + sys.getsizeof(value)
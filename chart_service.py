@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import logging
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import charts
+from cache import TTLCache
+from config import (
+    CHART_CACHE_MAX_BYTES,
+    CHART_FIXED_LAYOUT,
+    CHART_QUEUE_SIZE,
+    CHART_WORKERS,
+)
+from metrics import function_latency
+
+logger = logging.getLogger(__name__)
+
+
+class RenderedChart:
+    """Отрисованный график и file_id фото после первой отправки в Telegram."""
+
+    __slots__ = ("png", "file_id")
+
+    def __init__(self, png: bytes):
+        self.png = png
+        self.file_id: str | None = None
+
+
+def chart_fingerprint(kind: str, dates: list[str], values: list[float], goal: float):
+    """Хэш данных, от которых зависит изображение графика."""
+    payload = repr((kind, tuple(dates), tuple(values), goal)).encode()
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+def create_chart_cache(max_bytes: int = CHART_CACHE_MAX_BYTES) -> TTLCache:
+    """LRU-кэш отрисованных графиков с бюджетом по размеру PNG."""
+    return TTLCache(
+        maxsize=max(1, max_bytes // 1024),
+        ttl=math.inf,
+        max_bytes=max_bytes,
+        sizeof=lambda key, chart: len(key) + len(chart.png),
+    )
+
+
+class ChartService:
+    """Асинхронная отрисовка графиков в пуле процессов.
+
+    Отрисовка не блокирует цикл событий. Одновременно выполняется не более
+    workers задач и ожидает в очереди не более queue_size; остальные вызовы
+    ждут освобождения места, не нагружая пул. Готовые графики кэшируются по
+    хэшу исходных данных, так что повторный запрос не рисуется заново.
+    """
+
+    def __init__(
+        self,
+        workers: int = CHART_WORKERS,
+        queue_size: int = CHART_QUEUE_SIZE,
+        cache: TTLCache | None = None,
+        fixed_layout: bool = CHART_FIXED_LAYOUT,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.fixed_layout = fixed_layout
+        self.cache = create_chart_cache() if cache is None else cache
+        self._executor: ProcessPoolExecutor | None = None
+        self._slots = asyncio.Semaphore(workers + queue_size)
+        self._start_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        """Запустить рабочие процессы и прогреть в них matplotlib."""
+        async with self._start_lock:
+            if self._executor is not None:
+                return
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            loop = asyncio.get_running_loop()
+            try:
+                await asyncio.gather(
+                    *(
+                        loop.run_in_executor(executor, charts.warmup)
+                        for _ in range(self.workers)
+                    )
+                )
+            except BaseException:
+                # Запуск прерван (например, при остановке бота во время прогрева)
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            self._executor = executor
+
+    async def close(self) -> None:
+        if self._executor is not None:
+            await asyncio.to_thread(self._executor.shutdown, True)
+            self._executor = None
+
+    async def _render(self, func, *args) -> bytes:
+        async with self._slots:
+            await self.start()
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            try:
+                return await loop.run_in_executor(self._executor, func, *args)
+            finally:
+                function_latency.observe(time.perf_counter() - started, func.__name__)
+
+    async def _render_cached(
+        self, kind: str, func, dates: list[str], values: list[float], goal: float
+    ) -> RenderedChart:
+        async def render() -> RenderedChart:
+            return RenderedChart(
+                await self._render(func, dates, values, goal, self.fixed_layout)
+            )
+
+        key = chart_fingerprint(kind, dates, values, goal)
+        return await self.cache.get_or_load(key, render)
+
+    async def render_water(
+        self, dates: list[str], values: list[float], goal: float
+    ) -> RenderedChart:
+        """График потребления воды."""
+        return await self._render_cached(
+            "water", charts.render_water_chart, dates, values, goal
+        )
+
+    async def render_calories(
+        self, dates: list[str], net_calories: list[float], goal: float
+    ) -> RenderedChart:
+        """График баланса калорий."""
+        return await self._render_cached(
+            "calories", charts.render_calories_chart, dates, net_calories, goal
+        )
+
+    async def render_progress(
+        self,
+        dates: list[str],
+        water: list[float],
+        water_goal: float,
+        net_calories: list[float],
+        calorie_goal: float,
+    ) -> tuple[RenderedChart, RenderedChart]:
+        """Параллельно отрисовать графики воды и калорий.
+
+        Returns:
+            tuple[RenderedChart, RenderedChart]: Графики воды и калорий
+        """
+        return await asyncio.gather(
+            self.render_water(dates, water, water_goal),
+            self.render_calories(dates, net_calories, calorie_goal),
+        )
+
+
+chart_service = ChartService()
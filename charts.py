@@ -0,0 +1,195 @@
+import io
+import logging
+import threading
+
+GREEN = "#2ecc71"
+RED = "#e74c3c"
+BLUE = "#3498db"
+
+# Поля фигуры для режима без tight_layout (доли ширины и высоты)
+FIXED_LAYOUT = {"left": 0.08, "right": 0.98, "top": 0.93, "bottom": 0.22}
+
+# Даты на оси X — категории; не пишем об этом в лог на каждый график
+logging.getLogger("matplotlib.category").setLevel(logging.WARNING)
+
+
+def _load_matplotlib():
+    """Импортировать matplotlib при первом построении графика.
+
+    Импорт занимает сотни миллисекунд, поэтому процессы, которые графики не
+    рисуют (основной процесс бота, шарды), его не выполняют. Бэкенд Agg
+    задается явно: без него matplotlib ищет интерактивный бэкенд.
+
+    Returns:
+        tuple: Классы Figure и FigureCanvasAgg
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    return Figure, FigureCanvasAgg
+
+
+class ChartTemplate:
+    """Заранее построенная фигура столбчатого графика с линией цели.
+
+    Фигура, оси, подписи и легенда создаются один раз; при отрисовке
+    меняются только высоты и цвета столбцов, подписи значений и линия цели.
+    """
+
+    def __init__(
+        self,
+        bars: int,
+        title: str,
+        ylabel: str,
+        goal_color: str,
+        goal_label: str,
+        fixed_layout: bool = False,
+    ):
+        Figure, FigureCanvasAgg = _load_matplotlib()
+        self.fixed_layout = fixed_layout
+        self.figure = Figure(figsize=(10, 6))
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        self._lock = threading.Lock()
+
+        positions = range(bars)
+        self.bars = self.ax.bar(positions, [0] * bars, color=GREEN, alpha=0.7)
+        self.goal_line = self.ax.axhline(
+            y=0, color=goal_color, linestyle="--", label=goal_label
+        )
+        self.labels = [
+            self.ax.text(position, 0, "", ha="center", va="bottom")
+            for position in positions
+        ]
+
+        self.ax.set_title(title)
+        self.ax.set_xlabel("Дата")
+        self.ax.set_ylabel(ylabel)
+        self.ax.set_xticks(positions)
+        self.ax.tick_params(axis="x", labelrotation=45)
+        self.ax.legend()
+        if fixed_layout:
+            self.figure.subplots_adjust(**FIXED_LAYOUT)
+
+    def render(
+        self, dates: list[str], values: list[float], goal: float, colors: list[str]
+    ) -> bytes:
+        """Отрисовать график с новыми данными.
+
+        Args:
+            dates (list[str]): Подписи столбцов
+            values (list[float]): Высоты столбцов
+            goal (float): Значение линии цели
+            colors (list[str]): Цвета столбцов
+
+        Returns:
+            bytes: PNG image
+        """
+        with self._lock:
+            for bar, label, value, color in zip(self.bars, self.labels, values, colors):
+                bar.set_height(value)
+                bar.set_facecolor(color)
+                label.set_position((bar.get_x() + bar.get_width() / 2.0, value))
+                label.set_text(f"{int(value)}")
+            self.goal_line.set_ydata([goal, goal])
+            self.ax.set_xticklabels(dates)
+
+            # Как при автомасштабировании: поля 5%, но столбцы "прилипают" к 0
+            low = min(0, goal, *values)
+            high = max(0, goal, *values)
+            margin = (high - low) * 0.05 or 1
+            self.ax.set_ylim(
+                low - margin if low < 0 else 0, high + margin if high > 0 else 0
+            )
+
+            if not self.fixed_layout:
+                self.figure.tight_layout()
+
+            buf = io.BytesIO()
+            self.canvas.print_png(buf)
+            return buf.getvalue()
+
+
+_templates: dict[tuple, ChartTemplate] = {}
+_templates_lock = threading.Lock()
+
+
+def _get_template(kind: str, bars: int, fixed_layout: bool) -> ChartTemplate:
+    key = (kind, bars, fixed_layout)
+    template = _templates.get(key)
+    if template is not None:
+        return template
+    with _templates_lock:
+        template = _templates.get(key)
+        if template is not None:
+            return template
+        if kind == "water":
+            template = ChartTemplate(
+                bars,
+                "Потребление воды за последние 7 дней",
+                "мл",
+                RED,
+                "Цель",
+                fixed_layout,
+            )
+        else:
+            template = ChartTemplate(
+                bars,
+                "Баланс калорий за последние 7 дней",
+                "ккал",
+                BLUE,
+                "Лимит калорий",
+                fixed_layout,
+            )
+        _templates[key] = template
+        return template
+
+
+def warmup() -> None:
+    """Построить шаблоны и загрузить шрифты заранее (в рабочих процессах)."""
+    for fixed_layout in (False, True):
+        render_water_chart(["-"] * 7, [0] * 7, 0, fixed_layout)
+        render_calories_chart(["-"] * 7, [0] * 7, 0, fixed_layout)
+
+
+def render_water_chart(
+    dates: list[str], values: list[float], goal: float, fixed_layout: bool = False
+) -> bytes:
+    """Render water progress chart.
+
+    Args:
+        dates (list[str]): Dates in YYYY-MM-DD format
+        values (list[float]): Water intake for each date
+        goal (float): Daily water goal
+        fixed_layout (bool): Use fixed margins instead of tight_layout
+
+    Returns:
+        bytes: PNG image
+    """
+    template = _get_template("water", len(dates), fixed_layout)
+    return template.render(dates, values, goal, [GREEN] * len(values))
+
+
+def render_calories_chart(
+    dates: list[str],
+    net_calories: list[float],
+    goal: float,
+    fixed_layout: bool = False,
+) -> bytes:
+    """Render calories balance chart.
+
+    Args:
+        dates (list[str]): Dates in YYYY-MM-DD format
+        net_calories (list[float]): Calories consumed minus burned for each date
+        goal (float): Daily calorie goal
+        fixed_layout (bool): Use fixed margins instead of tight_layout
+
+    Returns:
+        bytes: PNG image
+    """
+    template = _get_template("calories", len(dates), fixed_layout)
+    colors = [RED if cal > goal else GREEN for cal in net_calories]
+    return template.render(dates, net_calories, goal, colors)
@@ -7,16 +7,196 @@ load_dotenv()
 
 # Токены и URL для API
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+# Адрес Bot API; пустое значение — официальный сервер Telegram
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
+# Режим работы бота: "polling", "webhook" или "sharded" (webhook с
+# распределением пользователей по процессам-обработчикам; режим "shard"
+# запускает такой обработчик и задается автоматически)
+BOT_RUN_MODE = os.getenv("BOT_RUN_MODE", "polling")
+
+# Webhook: публичный адрес, секрет и параметры локального сервера
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8080))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 64))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", 1000))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", 40))
+
+# Режим "sharded": число процессов-обработчиков (шардов), порты их локальных
+# серверов (SHARD_BASE_PORT + номер шарда), размер очереди и пакета пересылки
+# на шард, период проверки здоровья (шард перезапускается после
+# SHARD_HEALTH_FAILURES неудачных проверок подряд или, если он так и не
+# ответил, через SHARD_START_TIMEOUT секунд после запуска) и время на
+# дообработку при остановке
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", os.cpu_count() or 1))
+SHARD_INDEX = int(os.getenv("SHARD_INDEX", 0))
+SHARD_BASE_PORT = int(os.getenv("SHARD_BASE_PORT", 8100))
+SHARD_QUEUE_SIZE = int(os.getenv("SHARD_QUEUE_SIZE", 1000))
+SHARD_BATCH_SIZE = int(os.getenv("SHARD_BATCH_SIZE", 100))
+SHARD_HEALTH_INTERVAL = float(os.getenv("SHARD_HEALTH_INTERVAL", 2))
+SHARD_HEALTH_FAILURES = int(os.getenv("SHARD_HEALTH_FAILURES", 3))
+SHARD_START_TIMEOUT = float(os.getenv("SHARD_START_TIMEOUT", 60))
+SHARD_DRAIN_TIMEOUT = float(os.getenv("SHARD_DRAIN_TIMEOUT", 30))
 
 OPEN_WEATHER_API_TOKEN = os.getenv("OPEN_WEATHER_API_TOKEN")
-OPEN_WEATHER_API_URL = "https://api.openweathermap.org/data/2.5/weather"
+OPEN_WEATHER_API_URL = os.getenv(
+    "OPEN_WEATHER_API_URL", "https://api.openweathermap.org/data/2.5/weather"
+)
 
 CALORIES_API_TOKEN = os.getenv("CALORIES_API_TOKEN")
-CALORIES_API_URL = "https://api.api-ninjas.com/v1/caloriesburned"
+CALORIES_API_URL = os.getenv(
+    "CALORIES_API_URL", "https://api.api-ninjas.com/v1/caloriesburned"
+)
 
 NUTRITIONIX_API_TOKEN = os.getenv("NUTRITIONIX_API_TOKEN")
 NUTRITIONIX_APP_ID = os.getenv("NUTRITIONIX_APP_ID")
-NUTRITIONIX_API_URL = "https://trackapi.nutritionix.com/v2/natural/nutrients"
+NUTRITIONIX_API_URL = os.getenv(
+    "NUTRITIONIX_API_URL", "https://trackapi.nutritionix.com/v2/natural/nutrients"
+)
+
+# Эндпоинт /metrics в формате Prometheus; порт 0 отключает сервер. Задержка
+# цикла событий измеряется таймером с периодом METRICS_LOOP_LAG_INTERVAL секунд
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+METRICS_LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", 0.5))
+
+# Пул соединений общего HTTP-клиента
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", 20))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", 300))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", 30))
+
+# Таймауты запросов к внешним API (в секундах)
+OPEN_WEATHER_API_TIMEOUT = float(os.getenv("OPEN_WEATHER_API_TIMEOUT", 5))
+CALORIES_API_TIMEOUT = float(os.getenv("CALORIES_API_TIMEOUT", 10))
+NUTRITIONIX_API_TIMEOUT = float(os.getenv("NUTRITIONIX_API_TIMEOUT", 10))
+
+# Устойчивость к сбоям внешних API. Автомат сервиса размыкается после
+# UPSTREAM_BREAKER_FAILURES сбоев подряд, и UPSTREAM_BREAKER_RESET секунд
+# запросы к нему не отправляются. Повторы (не больше UPSTREAM_MAX_RETRIES на
+# вызов, задержка от UPSTREAM_RETRY_BACKOFF до UPSTREAM_RETRY_BACKOFF_MAX
+# секунд) расходуют общий бюджет: UPSTREAM_RETRY_RATIO повтора на запрос,
+# не больше UPSTREAM_RETRY_BURST в запасе. Сервисам из UPSTREAM_HEDGE
+# (через запятую) отправляется дублирующий запрос, если ответа нет дольше p95
+# последних запросов (но не раньше UPSTREAM_HEDGE_MIN_DELAY секунд)
+UPSTREAM_BREAKER_FAILURES = int(os.getenv("UPSTREAM_BREAKER_FAILURES", 5))
+UPSTREAM_BREAKER_RESET = float(os.getenv("UPSTREAM_BREAKER_RESET", 30))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", 2))
+UPSTREAM_RETRY_BACKOFF = float(os.getenv("UPSTREAM_RETRY_BACKOFF", 0.1))
+UPSTREAM_RETRY_BACKOFF_MAX = float(os.getenv("UPSTREAM_RETRY_BACKOFF_MAX", 1))
+UPSTREAM_RETRY_RATIO = float(os.getenv("UPSTREAM_RETRY_RATIO", 0.1))
+UPSTREAM_RETRY_BURST = float(os.getenv("UPSTREAM_RETRY_BURST", 10))
+UPSTREAM_HEDGE = os.getenv("UPSTREAM_HEDGE", "")
+UPSTREAM_HEDGE_MIN_DELAY = float(os.getenv("UPSTREAM_HEDGE_MIN_DELAY", 0.05))
+UPSTREAM_HEDGE_MIN_SAMPLES = int(os.getenv("UPSTREAM_HEDGE_MIN_SAMPLES", 20))
+
+# Кэш калорийности продуктов (время жизни в секундах)
+FOOD_CACHE_SIZE = int(os.getenv("FOOD_CACHE_SIZE", 5000))
+FOOD_CACHE_MAX_BYTES = int(os.getenv("FOOD_CACHE_MAX_BYTES", 2 * 1024 * 1024))
+FOOD_CACHE_TTL = float(os.getenv("FOOD_CACHE_TTL", 24 * 60 * 60))
+FOOD_CACHE_NEGATIVE_TTL = float(os.getenv("FOOD_CACHE_NEGATIVE_TTL", 10 * 60))
+
+# Кэш температуры по городам (время в секундах)
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", 1000))
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", 30 * 60))
+WEATHER_REFRESH_AHEAD = float(os.getenv("WEATHER_REFRESH_AHEAD", 5 * 60))
+WEATHER_REFRESH_INTERVAL = float(os.getenv("WEATHER_REFRESH_INTERVAL", 60))
+WEATHER_REFRESH_MIN_HITS = int(os.getenv("WEATHER_REFRESH_MIN_HITS", 2))
+
+# Ожидание температуры, загружаемой в фоне при заполнении профиля (в секундах)
+PROFILE_TEMPERATURE_TIMEOUT = float(os.getenv("PROFILE_TEMPERATURE_TIMEOUT", 3))
+
+# Пересчет норм воды и калорий командой /recalc: число городов, температура
+# которых запрашивается одновременно, число профилей, нормы которых считаются
+# и сохраняются за раз, и ID пользователей, которым доступна команда
+RECALC_BATCH_SIZE = int(os.getenv("RECALC_BATCH_SIZE", 20))
+RECALC_CHUNK_SIZE = int(os.getenv("RECALC_CHUNK_SIZE", 50000))
+ADMIN_USER_IDS = {
+    int(user_id) for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id
+}
+
+# Кэш расхода калорий на тренировках (время в секундах) и офлайн-таблица MET
+# (значения по Compendium of Physical Activities); пустой путь отключает таблицу
+ACTIVITY_CACHE_SIZE = int(os.getenv("ACTIVITY_CACHE_SIZE", 1000))
+ACTIVITY_CACHE_TTL = float(os.getenv("ACTIVITY_CACHE_TTL", 7 * 24 * 60 * 60))
+ACTIVITY_CACHE_NEGATIVE_TTL = float(os.getenv("ACTIVITY_CACHE_NEGATIVE_TTL", 10 * 60))
+ACTIVITY_MET_TABLE_PATH = os.getenv("ACTIVITY_MET_TABLE_PATH", "data/met_table.json")
+
+# Локальный справочник калорийности продуктов и порог нечеткого совпадения
+FOOD_INDEX_PATH = os.getenv("FOOD_INDEX_PATH", "data/foods.tsv")
+FOOD_INDEX_MIN_SIMILARITY = float(os.getenv("FOOD_INDEX_MIN_SIMILARITY", 0.55))
+
+# Словарь и пакетный перевод фраз (задержка пакета в секундах)
+TRANSLATIONS_PATH = os.getenv("TRANSLATIONS_PATH", "data/translations.json")
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", 10000))
+TRANSLATION_BATCH_DELAY = float(os.getenv("TRANSLATION_BATCH_DELAY", 0.005))
+TRANSLATION_BATCH_SIZE = int(os.getenv("TRANSLATION_BATCH_SIZE", 50))
+
+# Хранилище пользователей: "sqlite" или "memory"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite")
+STORAGE_PATH = os.getenv("STORAGE_PATH", "data/bot.sqlite3")
+STORAGE_FLUSH_INTERVAL = float(os.getenv("STORAGE_FLUSH_INTERVAL", 0.5))
+
+# Хранилище состояний FSM: "sqlite", "redis" (нужен пакет redis) или "memory".
+# Незавершенные диалоги забываются через FSM_STATE_TTL секунд без ответа
+FSM_STORAGE_BACKEND = os.getenv("FSM_STORAGE_BACKEND", "sqlite")
+FSM_STORAGE_PATH = os.getenv("FSM_STORAGE_PATH", "data/fsm.sqlite3")
+FSM_REDIS_URL = os.getenv("FSM_REDIS_URL", "redis://localhost:6379/0")
+FSM_STATE_TTL = float(os.getenv("FSM_STATE_TTL", 6 * 60 * 60))
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", 10000))
+FSM_CLEANUP_INTERVAL = float(os.getenv("FSM_CLEANUP_INTERVAL", 10 * 60))
+
+# Пул процессов для отрисовки графиков
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", min(4, os.cpu_count() or 1)))
+CHART_QUEUE_SIZE = int(os.getenv("CHART_QUEUE_SIZE", 16))
+CHART_FIXED_LAYOUT = os.getenv("CHART_FIXED_LAYOUT", "0") == "1"
+CHART_CACHE_MAX_BYTES = int(os.getenv("CHART_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# Рассылка итогов дня подписчикам (/summary on): время "ЧЧ:ММ" по часам
+# сервера и сколько секунд после него рассылка еще выполняется при запуске
+# бота, если была пропущена. Итоги готовятся пакетами по SUMMARY_BATCH_SIZE
+# пользователей, графики рисуются не более чем для SUMMARY_RENDER_CONCURRENCY
+# пользователей одновременно. Общий темп отправки (сообщений в секунду) ниже
+# лимита Telegram около 30, чтобы оставить запас интерактивным ответам;
+# в режиме "shard" он делится между шардами. Отправитель ждет между
+# сообщениями в один чат SUMMARY_CHAT_INTERVAL секунд, поэтому отправителей
+# нужно больше, чем сообщений в секунду
+SUMMARY_TIME = os.getenv("SUMMARY_TIME", "21:00")
+SUMMARY_CATCH_UP = float(os.getenv("SUMMARY_CATCH_UP", 2 * 60 * 60))
+SUMMARY_STORAGE_PATH = os.getenv("SUMMARY_STORAGE_PATH", "data/summary.sqlite3")
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", 100))
+SUMMARY_RENDER_CONCURRENCY = int(os.getenv("SUMMARY_RENDER_CONCURRENCY", 1))
+SUMMARY_SEND_RATE = float(os.getenv("SUMMARY_SEND_RATE", 20))
+SUMMARY_SEND_CONCURRENCY = int(os.getenv("SUMMARY_SEND_CONCURRENCY", 32))
+SUMMARY_SEND_RETRIES = int(os.getenv("SUMMARY_SEND_RETRIES", 3))
+SUMMARY_QUEUE_SIZE = int(os.getenv("SUMMARY_QUEUE_SIZE", 100))
+SUMMARY_CHAT_INTERVAL = float(os.getenv("SUMMARY_CHAT_INTERVAL", 1))
+
+# Ограничение частоты запросов: token bucket на пользователя (запросов в секунду
+# и запас), отдельные лимиты команд в виде "команда:скорость/запас,...",
+# общий лимит одновременных "дорогих" команд и команды, одинаковые
+# выполняющиеся запросы которых объединяются
+THROTTLE_USER_RATE = float(os.getenv("THROTTLE_USER_RATE", 2.0))
+THROTTLE_USER_BURST = int(os.getenv("THROTTLE_USER_BURST", 10))
+THROTTLE_COMMAND_LIMITS = os.getenv(
+    "THROTTLE_COMMAND_LIMITS",
+    "check_progress:0.2/3,log_food:0.5/5,log_meal:0.5/5,log_workout:0.5/5",
+)
+THROTTLE_EXPENSIVE_COMMANDS = os.getenv(
+    "THROTTLE_EXPENSIVE_COMMANDS", "check_progress,log_food,log_meal,log_workout"
+)
+THROTTLE_EXPENSIVE_CONCURRENCY = int(os.getenv("THROTTLE_EXPENSIVE_CONCURRENCY", 32))
+THROTTLE_COALESCE_COMMANDS = os.getenv("THROTTLE_COALESCE_COMMANDS", "check_progress")
+
+# Логирование: "sync" или "async" (запись в фоновом потоке), "text" или "json";
+# LOG_SAMPLE_RATE — доля сохраняемых записей о частых событиях (команды)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_MODE = os.getenv("LOG_MODE", "async")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 1.0))
 
 for token in [
     BOT_TOKEN,
@@ -26,3 +206,6 @@ for token in [
 ]:
     if not token:
         raise NameError
+
+if BOT_RUN_MODE in ("webhook", "sharded") and not (WEBHOOK_URL and WEBHOOK_SECRET):
+    raise NameError
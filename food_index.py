@@ -0,0 +1,240 @@
+import logging
+from array import array
+from collections import Counter
+
+from cache import normalize_name
+from config import FOOD_INDEX_MIN_SIMILARITY, FOOD_INDEX_PATH
+
+logger = logging.getLogger(__name__)
+
+# Сколько слов с наибольшим числом общих триграмм оценивать по Дайсу
+# и сколько лучших из них проверять расстоянием редактирования
+FUZZY_CANDIDATES = 64
+EDIT_DISTANCE_CANDIDATES = 8
+
+# Более короткие слова ищутся только точно: у них мало триграмм, и одна
+# опечатка часто дает другой продукт ("вода" — "водка", "соль" — "фасоль")
+FUZZY_MIN_LENGTH = 6
+# Слова до этой длины исправляются на расстоянии 1, более длинные — 2
+EDIT_DISTANCE_1_MAX_LENGTH = 8
+
+
+def trigrams(word: str) -> set[str]:
+    """Триграммы слова, дополненного пробелами по краям."""
+    padded = f" {word} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Расстояние Дамерау-Левенштейна (с перестановкой соседних букв).
+
+    Возвращает limit + 1, если расстояние заведомо больше limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: list[int] = []
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            cost = char_a != char_b
+            current[j] = min(
+                previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost
+            )
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class FoodIndex:
+    """Локальный справочник калорийности с нечетким поиском.
+
+    Каждая строка файла — калорийность на 100 г и названия продукта через "|"
+    (русские, английские, синонимы). Калорийность и номера продуктов хранятся
+    в компактных массивах. Опечатки исправляются по словам: триграммный индекс
+    построен по словарю слов, который намного меньше списка названий, а
+    исправленная фраза ищется точно или, если в ней несколько слов, по
+    пересечению списков названий, содержащих каждое слово. Одно слово не
+    дополняется до более длинного названия: "каша" — не "гречневая каша".
+    """
+
+    def __init__(self, min_similarity: float = FOOD_INDEX_MIN_SIMILARITY):
+        self.min_similarity = min_similarity
+        self._names: list[str] = []
+        self._exact: dict[str, int] = {}
+        self._entries = array("I")
+        self._name_lengths = array("B")
+        self._kcal = array("f")
+        # слово -> номер слова; номер слова -> номера названий с этим словом
+        self._words: dict[str, int] = {}
+        self._word_names: list[array] = []
+        self._word_list: list[str] = []
+        self._word_gram_counts = array("B")
+        self._grams: dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self._kcal)
+
+    @property
+    def names_count(self) -> int:
+        return len(self._names)
+
+    @property
+    def words_count(self) -> int:
+        return len(self._word_list)
+
+    def add(self, kcal: float, names: list[str]) -> None:
+        """Добавить продукт.
+
+        Args:
+            kcal (float): Калорийность на 100 г
+            names (list[str]): Названия и синонимы продукта
+        """
+        entry = len(self._kcal)
+        self._kcal.append(kcal)
+        for name in names:
+            name = normalize_name(name)
+            if not name or name in self._exact:
+                continue
+            index = len(self._names)
+            self._names.append(name)
+            self._exact[name] = index
+            self._entries.append(entry)
+            words = set(name.split())
+            self._name_lengths.append(min(len(words), 0xFF))
+            for word in words:
+                self._word_names[self._add_word(word)].append(index)
+
+    def _add_word(self, word: str) -> int:
+        word_id = self._words.get(word)
+        if word_id is not None:
+            return word_id
+        word_id = self._words[word] = len(self._word_list)
+        self._word_list.append(word)
+        self._word_names.append(array("I"))
+        grams = trigrams(word)
+        self._word_gram_counts.append(min(len(grams), 0xFF))
+        for gram in grams:
+            postings = self._grams.get(gram)
+            if postings is None:
+                postings = self._grams[gram] = array("I")
+            postings.append(word_id)
+        return word_id
+
+    def load(self, path: str = FOOD_INDEX_PATH) -> None:
+        """Загрузить продукты из файла "<ккал>\\t<название>|<синоним>|...".
+
+        Args:
+            path (str): Путь к файлу; пустая строка отключает справочник
+        """
+        if not path:
+            return
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line_number, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    try:
+                        kcal, names = line.split("\t", 1)
+                        self.add(float(kcal), names.split("|"))
+                    except ValueError:
+                        logger.warning(f"Пропущена строка {line_number} в {path}")
+        except OSError as e:
+            logger.error(f"Не удалось загрузить справочник продуктов {path}: {e}")
+            return
+        logger.info(
+            f"Справочник продуктов: {len(self)} продуктов, {self.names_count} названий"
+        )
+
+    def match(self, name: str) -> str | None:
+        """Найти название продукта в справочнике, допуская опечатки.
+
+        Args:
+            name (str): Название продукта, как его ввел пользователь
+
+        Returns:
+            str: Найденное название из справочника, или None
+        """
+        index = self._find(normalize_name(name))
+        return None if index is None else self._names[index]
+
+    def lookup(self, name: str) -> float | None:
+        """Калорийность продукта на 100 г.
+
+        Args:
+            name (str): Название продукта, как его ввел пользователь
+
+        Returns:
+            float: Калорийность на 100 г, или None, если продукта нет в справочнике
+        """
+        index = self._find(normalize_name(name))
+        if index is None:
+            return None
+        return round(self._kcal[self._entries[index]], 1)
+
+    def _find(self, key: str) -> int | None:
+        index = self._exact.get(key)
+        if index is not None or not key:
+            return index
+
+        word_ids = []
+        for word in key.split():
+            word_id = self._correct(word)
+            if word_id is None:
+                return None
+            word_ids.append(word_id)
+        index = self._exact.get(" ".join(self._word_list[i] for i in word_ids))
+        if index is not None or len(word_ids) == 1:
+            return index
+
+        # Названия, содержащие все слова; начинаем с самого редкого слова
+        postings = sorted((self._word_names[i] for i in word_ids), key=len)
+        candidates = set(postings[0])
+        for other in postings[1:]:
+            candidates.intersection_update(other)
+            if not candidates:
+                return None
+        # Самое короткое название, при равенстве — добавленное раньше
+        lengths = self._name_lengths
+        return min(candidates, key=lambda i: (lengths[i], i))
+
+    def _correct(self, word: str) -> int | None:
+        """Номер ближайшего к word слова из словаря.
+
+        Кандидаты — слова с наибольшим числом общих триграмм. Подходит слово
+        на расстоянии Дамерау-Левенштейна не больше 1 (2 для слов длиннее
+        EDIT_DISTANCE_1_MAX_LENGTH) или с коэффициентом Дайса не ниже
+        min_similarity.
+        """
+        word_id = self._words.get(word)
+        if word_id is not None or len(word) < FUZZY_MIN_LENGTH:
+            return word_id
+
+        grams = trigrams(word)
+        counts: Counter = Counter()
+        for gram in grams:
+            postings = self._grams.get(gram)
+            if postings is not None:
+                counts.update(postings)
+
+        query_count = len(grams)
+        gram_counts = self._word_gram_counts
+        scored = sorted(
+            (
+                (2 * common / (query_count + gram_counts[word_id]), word_id)
+                for word_id, common in counts.most_common(FUZZY_CANDIDATES)
+            ),
+            reverse=True,
+        )
+        max_distance = 1 if len(word) <= EDIT_DISTANCE_1_MAX_LENGTH else 2
+        for score, word_id in scored[:EDIT_DISTANCE_CANDIDATES]:
+            candidate = self._word_list[word_id]
+            if edit_distance(word, candidate, max_distance) <= max_distance:
+                return word_id
+        if scored and scored[0][0] >= self.min_similarity:
+            return scored[0][1]
+        return None
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from cache import TTLCache
+from config import (
+    FSM_CACHE_SIZE,
+    FSM_CLEANUP_INTERVAL,
+    FSM_REDIS_URL,
+    FSM_STATE_TTL,
+    FSM_STORAGE_BACKEND,
+    FSM_STORAGE_PATH,
+)
+
+logger = logging.getLogger(__name__)
+
+# Пустая запись: нет ни состояния, ни данных
+_EMPTY = (None, {})
+
+
+class SQLiteFSMStorage(BaseStorage):
+    """Хранилище состояний FSM в SQLite с кэшем в памяти процесса.
+
+    Каждая запись сразу пишется в базу (write-through) и в LRU-кэш, чтения
+    обслуживаются из кэша. Состояние и данные живут state_ttl секунд с
+    последнего изменения: брошенные диалоги (например, вопрос "сколько грамм"
+    без ответа) перестают читаться и периодически удаляются из базы.
+
+    Кэш не согласуется между процессами, поэтому все обновления одного
+    пользователя должны обрабатываться одним процессом.
+    """
+
+    def __init__(
+        self,
+        path: str = FSM_STORAGE_PATH,
+        state_ttl: float = FSM_STATE_TTL,
+        cache_size: int = FSM_CACHE_SIZE,
+        cleanup_interval: float = FSM_CLEANUP_INTERVAL,
+    ):
+        self.path = path
+        self.state_ttl = state_ttl
+        self.cleanup_interval = cleanup_interval
+        self.cache = TTLCache(maxsize=cache_size, ttl=state_ttl)
+        self._key_builder = DefaultKeyBuilder(
+            with_bot_id=True, with_business_connection_id=True, with_destiny=True
+        )
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm")
+        self._connection: sqlite3.Connection | None = None
+        self._cleanup_task: asyncio.Task | None = None
+        self.expired = 0
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connect(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS fsm (
+                key TEXT PRIMARY KEY,
+                state TEXT,
+                data TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS fsm_expires_at ON fsm (expires_at);
+            """
+        )
+        self._connection = connection
+
+    async def start(self) -> None:
+        if self._connection is None:
+            await self._run(self._connect)
+        if self._cleanup_task is None:
+            self._cleanup_task = asyncio.create_task(self._cleanup_periodically())
+
+    async def close(self) -> None:
+        if self._cleanup_task is not None:
+            self._cleanup_task.cancel()
+            try:
+                await self._cleanup_task
+            except asyncio.CancelledError:
+                pass
+            self._cleanup_task = None
+        if self._connection is not None:
+            await self._run(self._connection.close)
+            self._connection = None
+
+    def _read(self, key: str) -> tuple[str | None, dict, float] | None:
+        row = self._connection.execute(
+            "SELECT state, data, expires_at FROM fsm WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        state, data, expires_at = row
+        return state, json.loads(data), expires_at
+
+    def _write(self, key: str, state: str | None, data: str | None) -> None:
+        with self._connection:
+            if data is None:
+                self._connection.execute("DELETE FROM fsm WHERE key = ?", (key,))
+            else:
+                self._connection.execute(
+                    "INSERT INTO fsm (key, state, data, expires_at) "
+                    "VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET state = excluded.state, "
+                    "data = excluded.data, expires_at = excluded.expires_at",
+                    (key, state, data, time.time() + self.state_ttl),
+                )
+
+    def _delete_expired(self) -> int:
+        with self._connection:
+            return self._connection.execute(
+                "DELETE FROM fsm WHERE expires_at < ?", (time.time(),)
+            ).rowcount
+
+    async def _get_entry(self, key: str) -> tuple[str | None, dict]:
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry
+        if self._connection is None:
+            await self.start()
+        row = await self._run(self._read, key)
+        entry, ttl = _EMPTY, self.state_ttl
+        if row is not None:
+            state, data, expires_at = row
+            if expires_at > time.time():
+                entry, ttl = (state, data), expires_at - time.time()
+        self.cache.set(key, entry, ttl)
+        return entry
+
+    async def _set_entry(self, key: str, state: str | None, data: dict) -> None:
+        if self._connection is None:
+            await self.start()
+        entry = (state, data)
+        payload = None
+        if state is not None or data:
+            payload = json.dumps(data, ensure_ascii=False)
+        await self._run(self._write, key, state, payload)
+        self.cache.set(key, entry)
+
+    async def set_state(
+        self, key: StorageKey, state: str | State | None = None
+    ) -> None:
+        storage_key = self._key_builder.build(key)
+        _, data = await self._get_entry(storage_key)
+        if isinstance(state, State):
+            state = state.state
+        await self._set_entry(storage_key, state, data)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        state, _ = await self._get_entry(self._key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        storage_key = self._key_builder.build(key)
+        state, _ = await self._get_entry(storage_key)
+        await self._set_entry(storage_key, state, dict(data))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, data = await self._get_entry(self._key_builder.build(key))
+        return dict(data)
+
+    async def cleanup(self) -> int:
+        """Удалить из базы состояния с истекшим сроком.
+
+        Returns:
+            int: Число удаленных записей
+        """
+        deleted = await self._run(self._delete_expired)
+        self.expired += deleted
+        return deleted
+
+    async def _cleanup_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.cleanup_interval)
+            try:
+                await self.cleanup()
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка очистки состояний FSM: {e}")
+
+    def stats(self) -> dict[str, int]:
+        """Счетчики кэша состояний и число истекших записей."""
+        return {**self.cache.stats(), "expired": self.expired}
+
+
+def create_fsm_storage(backend: str = FSM_STORAGE_BACKEND) -> BaseStorage:
+    """Создать хранилище FSM по имени бэкенда ("sqlite", "redis" или "memory")."""
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "sqlite":
+        return SQLiteFSMStorage()
+    if backend == "redis":
+        # redis — необязательная зависимость, нужна только этому бэкенду
+        from aiogram.fsm.storage.redis import RedisStorage
+
+        ttl = int(FSM_STATE_TTL)
+        return RedisStorage.from_url(
+            FSM_REDIS_URL,
+            key_builder=DefaultKeyBuilder(with_bot_id=True, with_destiny=True),
+            state_ttl=ttl,
+            data_ttl=ttl,
+        )
+    raise ValueError(f"Неизвестный бэкенд хранилища FSM: {backend}")
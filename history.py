@@ -0,0 +1,171 @@
+from array import array
+from collections.abc import Iterator, Mapping, MutableMapping
+from datetime import date
+from functools import lru_cache
+
+LOG_FIELDS = ("water", "calories_in", "calories_burned")
+
+# Нулевое значение типа "d" в байтах: новые дни заполняются через frombytes
+_ZERO = bytes(array("d", [0.0]).itemsize)
+
+
+@lru_cache(maxsize=4096)
+def day_number(day: str) -> int:
+    """Порядковый номер дня для даты в формате YYYY-MM-DD."""
+    return date.fromisoformat(day).toordinal()
+
+
+class DayView(MutableMapping):
+    """Итоги одного дня: словарь {поле: значение} поверх столбцов истории."""
+
+    __slots__ = ("_history", "_day")
+
+    def __init__(self, history: "DailyHistory", day: int):
+        self._history = history
+        self._day = day
+
+    def __getitem__(self, field: str) -> float:
+        return self._history._columns[field][self._day - self._history._start]
+
+    def __setitem__(self, field: str, value: float) -> None:
+        self._history._columns[field][self._day - self._history._start] = value
+
+    def __delitem__(self, field: str) -> None:
+        raise TypeError("Поля дневного лога нельзя удалять")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(LOG_FIELDS)
+
+    def __len__(self) -> int:
+        return len(LOG_FIELDS)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class DailyHistory(MutableMapping):
+    """История дневных логов пользователя в столбцах по номеру дня.
+
+    Для каждого поля из LOG_FIELDS хранится массив double, индекс которого —
+    номер дня от первого записанного; отдельный массив флагов отмечает дни,
+    в которые что-то записывалось. Запись за сегодня — O(1) (амортизированно),
+    значения за последние k дней — срез O(k). Снаружи история выглядит как
+    словарь {дата: {water, calories_in, calories_burned}}.
+    """
+
+    __slots__ = ("_start", "_columns", "_present", "_count")
+
+    def __init__(self, logs: Mapping[str, Mapping[str, float]] | None = None):
+        self._start = 0
+        self._columns = {field: array("d") for field in LOG_FIELDS}
+        self._present = bytearray()
+        self._count = 0
+        if logs:
+            self.update(logs)
+
+    def _slot(self, day: int) -> int:
+        """Индекс дня в столбцах; при необходимости столбцы расширяются."""
+        if not self._present:
+            self._start = day
+        offset = day - self._start
+        if offset < 0:
+            # День раньше первого записанного: редкий случай, сдвигаем столбцы
+            for column in self._columns.values():
+                column[0:0] = array("d", _ZERO * -offset)
+            self._present[0:0] = bytes(-offset)
+            self._start = day
+            offset = 0
+        elif offset >= len(self._present):
+            grow = offset + 1 - len(self._present)
+            for column in self._columns.values():
+                column.frombytes(_ZERO * grow)
+            self._present.extend(bytes(grow))
+        return offset
+
+    @property
+    def last_day(self) -> int | None:
+        """Порядковый номер последнего дня в столбцах, None для пустой истории."""
+        if not self._present:
+            return None
+        return self._start + len(self._present) - 1
+
+    def _offset(self, day: str) -> int | None:
+        offset = day_number(day) - self._start
+        if 0 <= offset < len(self._present) and self._present[offset]:
+            return offset
+        return None
+
+    def add(self, day: str, **amounts: float) -> DayView:
+        """Прибавить значения к логу за день.
+
+        Args:
+            day (str): Дата в формате YYYY-MM-DD
+            **amounts (float): Значения water, calories_in, calories_burned
+
+        Returns:
+            DayView: Итоги за день после обновления
+        """
+        number = day_number(day)
+        offset = self._slot(number)
+        if not self._present[offset]:
+            self._present[offset] = 1
+            self._count += 1
+        for field, amount in amounts.items():
+            self._columns[field][offset] += amount
+        return DayView(self, number)
+
+    def window(self, field: str, first_day: str, days: int) -> list[float]:
+        """Значения поля за days дней начиная с first_day, 0 для дней без логов."""
+        if not self._present:
+            return [0.0] * days
+        offset = day_number(first_day) - self._start
+        column = self._columns[field]
+        low = max(0, offset)
+        high = min(len(column), offset + days)
+        if low >= high:
+            return [0.0] * days
+        if low == offset and high == offset + days:
+            return column[low:high].tolist()
+        return (
+            [0.0] * (low - offset)
+            + column[low:high].tolist()
+            + [0.0] * (offset + days - high)
+        )
+
+    def __getitem__(self, day: str) -> DayView:
+        offset = self._offset(day)
+        if offset is None:
+            raise KeyError(day)
+        return DayView(self, self._start + offset)
+
+    def __setitem__(self, day: str, totals: Mapping[str, float]) -> None:
+        offset = self._slot(day_number(day))
+        if not self._present[offset]:
+            self._present[offset] = 1
+            self._count += 1
+        for field, column in self._columns.items():
+            column[offset] = totals.get(field, 0)
+
+    def __delitem__(self, day: str) -> None:
+        offset = self._offset(day)
+        if offset is None:
+            raise KeyError(day)
+        for column in self._columns.values():
+            column[offset] = 0
+        self._present[offset] = 0
+        self._count -= 1
+
+    def __contains__(self, day: object) -> bool:
+        return isinstance(day, str) and self._offset(day) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        start = self._start
+        for offset, present in enumerate(self._present):
+            if present:
+                yield date.fromordinal(start + offset).isoformat()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __repr__(self) -> str:
+        return f"DailyHistory({dict(self.items())!r})"
@@ -0,0 +1,79 @@
+import aiohttp
+
+from config import (
+    CALORIES_API_TIMEOUT,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+    NUTRITIONIX_API_TIMEOUT,
+    OPEN_WEATHER_API_TIMEOUT,
+)
+
+# Таймауты по внешним сервисам
+UPSTREAM_TIMEOUTS = {
+    "weather": OPEN_WEATHER_API_TIMEOUT,
+    "calories": CALORIES_API_TIMEOUT,
+    "nutritionix": NUTRITIONIX_API_TIMEOUT,
+}
+
+
+class HttpClient:
+    """Общий HTTP-клиент с пулом keep-alive соединений для всех внешних API."""
+
+    def __init__(
+        self,
+        limit: int = HTTP_POOL_LIMIT,
+        limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+        dns_cache_ttl: int = HTTP_DNS_CACHE_TTL,
+        keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT,
+        timeouts: dict[str, float] | None = None,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeouts = dict(UPSTREAM_TIMEOUTS if timeouts is None else timeouts)
+        self._session: aiohttp.ClientSession | None = None
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            ssl=False,
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        return aiohttp.ClientSession(connector=connector)
+
+    async def start(self) -> None:
+        """Создать сессию, если она еще не создана."""
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+
+    async def close(self) -> None:
+        """Закрыть сессию и все соединения пула."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Текущая сессия; создается лениво, если start() еще не вызывался."""
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+        return self._session
+
+    def timeout(self, upstream: str) -> aiohttp.ClientTimeout:
+        """Таймаут запроса для указанного внешнего сервиса.
+
+        Args:
+            upstream (str): Имя сервиса ("weather", "calories", "nutritionix")
+
+        Returns:
+            aiohttp.ClientTimeout: Таймаут запроса
+        """
+        return aiohttp.ClientTimeout(total=self.timeouts.get(upstream, 10))
+
+
+http_client = HttpClient()
@@ -0,0 +1,122 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+from config import LOG_FORMAT, LOG_LEVEL, LOG_MODE, LOG_SAMPLE_RATE
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Дополнительные поля записи, которые попадают в JSON
+STRUCTURED_FIELDS = ("user_id", "command", "handler", "duration")
+
+_listener: logging.handlers.QueueListener | None = None
+_configured = False
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирование записи в одну строку JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class Sampler:
+    """Решение, сохранять ли запись о частом событии.
+
+    Проверка выполняется до создания LogRecord, поэтому отброшенные записи
+    не стоят ни форматирования, ни передачи в очередь.
+    """
+
+    def __init__(self, rate: float = LOG_SAMPLE_RATE):
+        self.rate = rate
+
+    def __call__(self) -> bool:
+        return self.rate >= 1 or random.random() < self.rate
+
+
+sample = Sampler()
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который не форматирует запись в вызывающем потоке.
+
+    Очередь живет в том же процессе, поэтому запись можно передать как есть,
+    а форматирование выполнит поток QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging(
+    mode: str = LOG_MODE,
+    fmt: str = LOG_FORMAT,
+    sample_rate: float = LOG_SAMPLE_RATE,
+    level: str = LOG_LEVEL,
+    stream=None,
+    force: bool = False,
+) -> None:
+    """Настроить корневой логгер.
+
+    Args:
+        mode (str): "sync" — запись в потоке вызова, "async" — в фоновом потоке
+        fmt (str): "text" или "json"
+        sample_rate (float): Доля сохраняемых записей о частых событиях
+        level (str): Уровень логирования
+        stream: Поток вывода, по умолчанию stderr
+        force (bool): Перенастроить, даже если логирование уже настроено
+    """
+    global _configured, _listener
+    if _configured and not force:
+        return
+    stop_listener()
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(
+        JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+    )
+    sample.rate = sample_rate
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.setLevel(level)
+
+    if mode == "async":
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        root.addHandler(DeferredQueueHandler(log_queue))
+        _listener = logging.handlers.QueueListener(
+            log_queue, handler, respect_handler_level=True
+        )
+        _listener.start()
+    else:
+        root.addHandler(handler)
+    _configured = True
+
+
+def stop_listener() -> None:
+    """Дописать оставшиеся в очереди записи и остановить фоновый поток."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_listener)
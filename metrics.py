@@ -0,0 +1,251 @@
+import asyncio
+import functools
+import inspect
+import time
+from bisect import bisect_left
+from typing import Callable
+
+from aiohttp import web
+
+# Границы корзин гистограмм задержки, в секундах
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """Счетчик с метками."""
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        for labels, value in self._values.items():
+            lines.append(
+                f"{self.name}{_format_labels(self.label_names, labels)} {value}"
+            )
+        return lines
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами и метками.
+
+    Наблюдение стоит одного bisect и двух сложений, поэтому его можно
+    вызывать на каждом обновлении.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self.buckets = buckets
+        # метки -> [счетчики по корзинам..., +Inf, сумма]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def expose(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        bucket_names = (*self.label_names, "le")
+        for labels, series in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{_format_labels(bucket_names, (*labels, bound))} {cumulative}"
+                )
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {series[-1]}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Значение, вычисляемое в момент чтения метрик."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        collect: Callable[[], dict[tuple[str, ...], float]],
+        labels: tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self.collect = collect
+
+    def expose(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+        ]
+        for labels, value in self.collect().items():
+            lines.append(
+                f"{self.name}{_format_labels(self.label_names, labels)} {value}"
+            )
+        return lines
+
+
+class Registry:
+    """Набор метрик, отдаваемых в текстовом формате Prometheus."""
+
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def expose(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+handler_latency = registry.register(
+    Histogram(
+        "bot_handler_duration_seconds",
+        "Время обработки обновления обработчиком",
+        ("handler",),
+    )
+)
+handler_errors = registry.register(
+    Counter(
+        "bot_handler_errors_total",
+        "Число исключений в обработчиках",
+        ("handler",),
+    )
+)
+throttled_updates = registry.register(
+    Counter(
+        "bot_throttled_updates_total",
+        "Число отклоненных или объединенных обновлений",
+        ("command", "reason"),
+    )
+)
+function_latency = registry.register(
+    Histogram(
+        "bot_function_duration_seconds",
+        "Время выполнения внешних вызовов и отрисовки графиков",
+        ("function",),
+    )
+)
+
+event_loop_lag = registry.register(
+    Histogram(
+        "bot_event_loop_lag_seconds",
+        "Опоздание срабатывания таймера цикла событий",
+    )
+)
+
+
+async def monitor_event_loop_lag(interval: float) -> None:
+    """Измерять, на сколько позже заданного просыпается таймер цикла событий.
+
+    Опоздание показывает, сколько времени обработчики занимают цикл без
+    переключения: на столько же задерживается и обработка других обновлений.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        event_loop_lag.observe(max(0.0, loop.time() - started - interval))
+
+
+def timed(name: str | None = None):
+    """Декоратор: записывать время выполнения функции в function_latency."""
+
+    def decorator(func):
+        label = name or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    function_latency.observe(time.perf_counter() - started, label)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                function_latency.observe(time.perf_counter() - started, label)
+
+        return wrapper
+
+    return decorator
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(
+        text=registry.expose(), content_type="text/plain", charset="utf-8"
+    )
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Запустить HTTP-сервер с эндпоинтом /metrics."""
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
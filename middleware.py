@@ -1,21 +1,257 @@
-from typing import Any, Awaitable, Callable
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
 
 from aiogram import types
 
+from cache import SingleFlight
+from config import (
+    THROTTLE_COALESCE_COMMANDS,
+    THROTTLE_COMMAND_LIMITS,
+    THROTTLE_EXPENSIVE_COMMANDS,
+    THROTTLE_EXPENSIVE_CONCURRENCY,
+    THROTTLE_USER_BURST,
+    THROTTLE_USER_RATE,
+)
+from log_pipeline import sample
+from metrics import handler_errors, handler_latency, throttled_updates
 from utils import setup_logger
 
 logger = setup_logger(__name__)
 
 
+def _handler_name(data: dict[str, Any]) -> str:
+    handler_object = data.get("handler")
+    return handler_object.callback.__name__ if handler_object else "unknown"
+
+
+def _command_name(text: str | None) -> str | None:
+    """Имя команды без "/" и упоминания бота, None для обычного текста."""
+    if not text or not text.startswith("/"):
+        return None
+    return text.split(maxsplit=1)[0][1:].split("@", 1)[0].lower()
+
+
+def _command_set(spec: str) -> set[str]:
+    return {
+        command.strip().lstrip("/") for command in spec.split(",") if command.strip()
+    }
+
+
+def parse_command_limits(spec: str) -> dict[str, tuple[float, int]]:
+    """Разобрать строку "команда:скорость/запас,..." из конфигурации.
+
+    Args:
+        spec (str): Например "check_progress:0.2/3,log_food:0.5/5"
+
+    Returns:
+        dict[str, tuple[float, int]]: Скорость (в секунду) и запас по командам
+    """
+    limits = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        command, limit = item.split(":")
+        rate, burst = limit.split("/")
+        limits[command.strip().lstrip("/")] = (float(rate), int(burst))
+    return limits
+
+
+class TokenBuckets:
+    """Token bucket для каждого ключа.
+
+    Корзина, не использованная burst / rate секунд, снова полна, поэтому ее
+    можно удалить без изменения поведения: хранятся только корзины активных
+    ключей. Корзины упорядочены по последнему обращению, так что устаревшие
+    удаляются с начала словаря за амортизированное O(1).
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.idle_ttl = burst / rate
+        # ключ -> [токены, время обновления, отказ уже был]
+        self._buckets: OrderedDict[Hashable, list] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def consume(self, key: Hashable, now: float | None = None) -> tuple[bool, bool]:
+        """Взять токен из корзины ключа.
+
+        Returns:
+            tuple[bool, bool]: Разрешен ли запрос и первый ли это отказ подряд
+        """
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            bucket = [self.burst, now, False]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        self._buckets[key] = bucket
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            bucket[2] = False
+            return True, False
+        first_refusal = not bucket[2]
+        bucket[2] = True
+        return False, first_refusal
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            key = next(iter(buckets))
+            if now - buckets[key][1] < self.idle_ttl:
+                break
+            del buckets[key]
+
+
 class LoggingMiddleware:
+    """Структурная запись о каждой команде после ее обработки.
+
+    Сохраняется доля LOG_SAMPLE_RATE записей; сообщение форматируется лениво,
+    поэтому отключенное или прореженное логирование почти ничего не стоит.
+    """
+
     async def __call__(
         self,
         handler: Callable[[types.Message, dict[str, Any]], Awaitable[Any]],
         event: types.Message,
         data: dict[str, Any],
     ) -> Any:
-        if event.text and event.text.startswith("/"):
-            user = event.from_user
-            logger.info(f"User {user.id} ({user.username}) sent command: {event.text}")
+        if not (event.text and event.text.startswith("/")):
+            return await handler(event, data)
+
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            if logger.isEnabledFor(logging.INFO) and sample():
+                user = event.from_user
+                logger.info(
+                    "User %s (%s) sent command: %s",
+                    user.id,
+                    user.username,
+                    event.text,
+                    extra={
+                        "user_id": user.id,
+                        "command": event.text.split(maxsplit=1)[0],
+                        "handler": _handler_name(data),
+                        "duration": round(time.perf_counter() - started, 6),
+                    },
+                )
+
+
+class MetricsMiddleware:
+    """Гистограмма задержки и счетчик ошибок по обработчикам."""
+
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: types.TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        name = _handler_name(data)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            handler_errors.inc(name)
+            raise
+        finally:
+            handler_latency.observe(time.perf_counter() - started, name)
+
+
+class ThrottlingMiddleware:
+    """Ограничение частоты запросов пользователей.
+
+    Для каждого пользователя действует общий token bucket и отдельные
+    корзины для команд из THROTTLE_COMMAND_LIMITS. Одновременно выполняется
+    не больше THROTTLE_EXPENSIVE_CONCURRENCY "дорогих" команд (API, графики),
+    а повторная команда из THROTTLE_COALESCE_COMMANDS, пока такая же команда
+    пользователя еще выполняется, не запускается заново и ждет ее результата.
+    """
+
+    def __init__(
+        self,
+        user_rate: float = THROTTLE_USER_RATE,
+        user_burst: int = THROTTLE_USER_BURST,
+        command_limits: str = THROTTLE_COMMAND_LIMITS,
+        expensive_commands: str = THROTTLE_EXPENSIVE_COMMANDS,
+        expensive_concurrency: int = THROTTLE_EXPENSIVE_CONCURRENCY,
+        coalesce_commands: str = THROTTLE_COALESCE_COMMANDS,
+    ):
+        self.user_buckets = TokenBuckets(user_rate, user_burst)
+        self.command_buckets = {
+            command: TokenBuckets(rate, burst)
+            for command, (rate, burst) in parse_command_limits(command_limits).items()
+        }
+        self.expensive = _command_set(expensive_commands)
+        self.coalesce = _command_set(coalesce_commands)
+        self._budget = asyncio.Semaphore(expensive_concurrency)
+        self._inflight = SingleFlight()
+
+    async def __call__(
+        self,
+        handler: Callable[[types.Message, dict[str, Any]], Awaitable[Any]],
+        event: types.Message,
+        data: dict[str, Any],
+    ) -> Any:
+        user = event.from_user
+        if user is None:
+            return await handler(event, data)
+        command = _command_name(event.text)
+
+        allowed, first_refusal = self.user_buckets.consume(user.id)
+        if not allowed:
+            return await self._refuse(event, command, "user", first_refusal)
+
+        if command in self.coalesce:
+            key = (user.id, command)
+            if key in self._inflight:
+                throttled_updates.inc(command, "coalesced")
+            return await self._inflight.do(
+                key, lambda: self._run(handler, event, data, command)
+            )
+        return await self._run(handler, event, data, command)
+
+    async def _run(
+        self,
+        handler: Callable[[types.Message, dict[str, Any]], Awaitable[Any]],
+        event: types.Message,
+        data: dict[str, Any],
+        command: str | None,
+    ) -> Any:
+        buckets = self.command_buckets.get(command)
+        if buckets is not None:
+            allowed, first_refusal = buckets.consume(event.from_user.id)
+            if not allowed:
+                return await self._refuse(event, command, "command", first_refusal)
+
+        if command not in self.expensive:
+            return await handler(event, data)
+        async with self._budget:
+            return await handler(event, data)
+
+    async def _refuse(
+        self,
+        event: types.Message,
+        command: str | None,
+        reason: str,
+        notify: bool,
+    ) -> None:
+        throttled_updates.inc(command or "text", reason)
+        # Предупреждаем один раз, а не на каждое сообщение в потоке
+        if notify:
+            await event.answer("Слишком много запросов. Пожалуйста, подождите немного.")
 
-        return await handler(event, data)
+    def stats(self) -> dict[str, int]:
+        return {
+            "user_buckets": len(self.user_buckets),
+            "command_buckets": sum(len(b) for b in self.command_buckets.values()),
+        }
@@ -0,0 +1,171 @@
+import asyncio
+import math
+from collections.abc import Awaitable, Callable, Mapping, Sequence
+
+import numpy as np
+
+from cache import normalize_name
+from config import RECALC_CHUNK_SIZE
+
+
+def calculate_water_norms(
+    weight: np.ndarray, activity_minutes: np.ndarray, temperature: np.ndarray
+) -> np.ndarray:
+    """Daily water intake norms of many users at once.
+
+    Gives the same results as calculate_water_norm applied element-wise.
+
+    Args:
+        weight (np.ndarray): User weights in kg
+        activity_minutes (np.ndarray): Activity times in minutes
+        temperature (np.ndarray): Temperatures in Celsius, NaN if unknown
+
+    Returns:
+        np.ndarray: Water norms (int64)
+    """
+    base_norm = np.asarray(weight, dtype=np.float64) * 30
+    activity_addition = (np.asarray(activity_minutes) // 30) * 300
+    # NaN > 25 is False: unknown temperature adds nothing, as None does
+    weather_addition = np.where(np.asarray(temperature) > 25, 300, 0)
+    return np.trunc(base_norm + activity_addition + weather_addition).astype(np.int64)
+
+
+def calculate_calorie_norms(
+    weight: np.ndarray,
+    height: np.ndarray,
+    age: np.ndarray,
+    activity: np.ndarray,
+    sex: np.ndarray,
+) -> np.ndarray:
+    """Daily calorie norms of many users at once.
+
+    Gives the same results as calculate_calorie_norm applied element-wise.
+
+    Args:
+        weight (np.ndarray): User weights in kg
+        height (np.ndarray): User heights in cm
+        age (np.ndarray): User ages
+        activity (np.ndarray): Activity times in minutes
+        sex (np.ndarray): User sexes ("male" or "female")
+
+    Returns:
+        np.ndarray: Calorie norms (int64)
+    """
+    calories = (
+        10 * np.asarray(weight, dtype=np.float64)
+        + 6.25 * np.asarray(height, dtype=np.float64)
+        - 5 * np.asarray(age)
+        + np.asarray(activity) * 10
+    )
+    calories += np.where(np.asarray(sex) == "male", 50, -161)
+    return np.trunc(calories).astype(np.int64)
+
+
+def _column(profiles: Sequence[dict], field: str, default: float) -> np.ndarray:
+    return np.fromiter(
+        (profile.get(field, default) for profile in profiles),
+        np.float64,
+        len(profiles),
+    )
+
+
+def chunk_changes(
+    profiles: Sequence[dict], temperatures: Mapping[str, float | None]
+) -> dict[int, dict]:
+    """Changed goals of a chunk of profiles.
+
+    Water goals are kept for users whose city temperature is unknown, and
+    calorie goals for profiles saved before the sex was stored.
+
+    Args:
+        profiles (Sequence[dict]): User profiles
+        temperatures (Mapping[str, float | None]): Temperature by normalized
+            city name
+
+    Returns:
+        dict[int, dict]: {field: new goal} by index of a changed profile
+    """
+    weight = _column(profiles, "weight", 0)
+    activity = _column(profiles, "activity", 0)
+    sex = np.array([profile.get("sex", "") for profile in profiles])
+
+    cities = [profile.get("city") or "" for profile in profiles]
+    by_city = {}
+    for city in set(cities):
+        temperature = temperatures.get(normalize_name(city)) if city else None
+        by_city[city] = math.nan if temperature is None else temperature
+    temperature = np.fromiter(map(by_city.__getitem__, cities), np.float64, len(cities))
+
+    water = calculate_water_norms(weight, activity, temperature)
+    water_changed = ~np.isnan(temperature) & (
+        water != _column(profiles, "water_goal", -1)
+    )
+    calories = calculate_calorie_norms(
+        weight,
+        _column(profiles, "height", 0),
+        _column(profiles, "age", 0),
+        activity,
+        sex,
+    )
+    calories_changed = (sex != "") & (calories != _column(profiles, "calorie_goal", -1))
+
+    changes = {
+        index: {"water_goal": value}
+        for index, value in zip(
+            np.flatnonzero(water_changed).tolist(), water[water_changed].tolist()
+        )
+    }
+    for index, value in zip(
+        np.flatnonzero(calories_changed).tolist(), calories[calories_changed].tolist()
+    ):
+        fields = changes.get(index)
+        if fields is None:
+            changes[index] = {"calorie_goal": value}
+        else:
+            fields["calorie_goal"] = value
+    return changes
+
+
+async def recalc_norms(
+    profiles: Mapping[int, dict],
+    temperatures: Mapping[str, float | None],
+    save: Callable[[dict[int, dict]], Awaitable[None]],
+    chunk_size: int = RECALC_CHUNK_SIZE,
+) -> dict[str, int]:
+    """Recalculate water and calorie norms of all users.
+
+    Profiles are processed in chunks of chunk_size: each chunk is turned
+    into column arrays and computed in a worker thread, and its changed goals
+    are saved before the next chunk starts.
+
+    Args:
+        profiles (Mapping[int, dict]): User profiles by user ID
+        temperatures (Mapping[str, float | None]): Temperature by normalized
+            city name, e.g. from fetch_city_temperatures
+        save (Callable): Coroutine saving {user_id: {field: new goal}}
+        chunk_size (int): Number of profiles computed and saved at a time
+
+    Returns:
+        dict[str, int]: Counts of users, cities, cities without temperature
+            and changed water and calorie norms
+    """
+    user_ids = list(profiles)
+    stats = {
+        "users": len(user_ids),
+        "cities": len(temperatures),
+        "failed_cities": sum(t is None for t in temperatures.values()),
+        "water_changed": 0,
+        "calories_changed": 0,
+    }
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start : start + chunk_size]
+        changes = await asyncio.to_thread(
+            chunk_changes, [profiles[user_id] for user_id in chunk], temperatures
+        )
+        changed = {chunk[index]: fields for index, fields in changes.items()}
+        for fields in changed.values():
+            stats["water_changed"] += "water_goal" in fields
+            stats["calories_changed"] += "calorie_goal" in fields
+        if changed:
+            await save(changed)
+    return stats
@@ -0,0 +1,335 @@
+import asyncio
+import functools
+import logging
+import random
+import time
+from collections import deque
+
+import aiohttp
+
+from config import (
+    UPSTREAM_BREAKER_FAILURES,
+    UPSTREAM_BREAKER_RESET,
+    UPSTREAM_HEDGE,
+    UPSTREAM_HEDGE_MIN_DELAY,
+    UPSTREAM_HEDGE_MIN_SAMPLES,
+    UPSTREAM_MAX_RETRIES,
+    UPSTREAM_RETRY_BACKOFF,
+    UPSTREAM_RETRY_BACKOFF_MAX,
+    UPSTREAM_RETRY_BURST,
+    UPSTREAM_RETRY_RATIO,
+)
+from http_client import UPSTREAM_TIMEOUTS
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Запрос не отправлен: автомат внешнего сервиса разомкнут."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(
+            f"Сервис {upstream} недоступен, повтор через {retry_after:.1f} с"
+        )
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+def is_failure(error: BaseException) -> bool:
+    """Признак сбоя сервиса: таймаут, ошибка соединения, 5xx или 429.
+
+    Остальные ответы (например, 404 "не найдено") означают, что сервис
+    работает, и не повторяются.
+    """
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500 or error.status == 429
+    return isinstance(
+        error,
+        (
+            asyncio.TimeoutError,
+            aiohttp.ClientConnectionError,
+            aiohttp.ClientPayloadError,
+        ),
+    )
+
+
+class CircuitBreaker:
+    """Автомат: после failure_threshold сбоев подряд запросы не отправляются.
+
+    Через reset_timeout секунд пропускается один пробный запрос (состояние
+    half_open): успех замыкает автомат, сбой снова размыкает его.
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened = 0
+        self._probing = False
+
+    def retry_after(self) -> float:
+        """Сколько секунд осталось до пробного запроса."""
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос; в half_open — только один пробный."""
+        if self.state == self.OPEN:
+            if self.retry_after() > 0:
+                return False
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def on_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def on_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self) -> None:
+        """Запрос отменен, не дав результата: освободить место пробного."""
+        self._probing = False
+
+
+class RetryBudget:
+    """Бюджет повторов: ratio повтора на каждый запрос, не больше burst.
+
+    Пока сервис отвечает, бюджет накапливается; при массовых сбоях повторы
+    быстро его исчерпывают и не умножают нагрузку на сервис.
+    """
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+
+    def deposit(self) -> None:
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class LatencyWindow:
+    """Задержки последних успешных запросов для оценки перцентилей."""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, value: float) -> None:
+        self._samples.append(value)
+
+    def percentile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+class Upstream:
+    """Обертка вызовов одного внешнего сервиса.
+
+    Объединяет автомат, бюджет повторов с экспоненциальной задержкой со
+    случайным разбросом и, если включено, дублирующий (hedged) запрос,
+    отправляемый, когда первый не ответил за p95 обычной задержки. Новый
+    повтор не начинается позже deadline секунд от начала вызова, но начатая
+    попытка идет до конца: худшее время ожидания — deadline плюс задержка
+    дубля и таймаут одного запроса (для upstreams, где deadline равен
+    таймауту, — два таймаута и задержка дубля).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        deadline: float,
+        failure_threshold: int = UPSTREAM_BREAKER_FAILURES,
+        reset_timeout: float = UPSTREAM_BREAKER_RESET,
+        max_retries: int = UPSTREAM_MAX_RETRIES,
+        backoff: float = UPSTREAM_RETRY_BACKOFF,
+        backoff_max: float = UPSTREAM_RETRY_BACKOFF_MAX,
+        retry_ratio: float = UPSTREAM_RETRY_RATIO,
+        retry_burst: float = UPSTREAM_RETRY_BURST,
+        hedge: bool = False,
+        hedge_min_delay: float = UPSTREAM_HEDGE_MIN_DELAY,
+        hedge_min_samples: int = UPSTREAM_HEDGE_MIN_SAMPLES,
+    ):
+        self.name = name
+        self.deadline = deadline
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.budget = RetryBudget(retry_ratio, retry_burst)
+        self.latency = LatencyWindow()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+
+    def hedge_delay(self) -> float | None:
+        """Через сколько секунд отправлять дубль; None — не отправлять."""
+        if not self.hedge or len(self.latency) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, self.latency.percentile(95))
+
+    def backoff_delay(self, retry: int) -> float:
+        """Задержка перед повтором retry (с 0) с полным случайным разбросом."""
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2**retry))
+
+    async def call(self, attempt):
+        """Выполнить запрос с автоматом, повторами и дублированием.
+
+        Args:
+            attempt (Callable): Корутина-фабрика, выполняющая один запрос
+
+        Returns:
+            Any: Результат первой успешной попытки
+
+        Raises:
+            CircuitOpenError: Если автомат разомкнут и запрос не отправлялся
+        """
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self.breaker.retry_after())
+        self.calls += 1
+        self.budget.deposit()
+        started = time.monotonic()
+        retry = 0
+        while True:
+            try:
+                return await self._hedged(attempt)
+            except Exception as e:
+                if not is_failure(e) or retry >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(retry)
+                if time.monotonic() + delay - started >= self.deadline:
+                    raise
+                # Проверяем автомат до бюджета, чтобы не тратить его зря
+                if not self.breaker.allow() or not self.budget.withdraw():
+                    raise
+                self.retries += 1
+                retry += 1
+                logger.warning(f"Повтор запроса к {self.name} после ошибки: {e!r}")
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, attempt):
+        started = time.monotonic()
+        try:
+            result = await attempt()
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception as e:
+            if is_failure(e):
+                self.failures += 1
+                was_open = self.breaker.state == CircuitBreaker.OPEN
+                self.breaker.on_failure()
+                if not was_open and self.breaker.state == CircuitBreaker.OPEN:
+                    logger.warning(
+                        f"Автомат {self.name} разомкнут на "
+                        f"{self.breaker.reset_timeout:g} с после ошибки: {e!r}"
+                    )
+            else:
+                self.breaker.on_success()
+            raise
+        if self.breaker.state != CircuitBreaker.CLOSED:
+            logger.info(f"Автомат {self.name} замкнут")
+        self.breaker.on_success()
+        self.latency.observe(time.monotonic() - started)
+        return result
+
+    async def _hedged(self, attempt):
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._attempt(attempt)
+
+        first = asyncio.create_task(self._attempt(attempt))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if (
+                not done
+                and self.breaker.state == CircuitBreaker.CLOSED
+                and self.budget.withdraw()
+            ):
+                self.hedges += 1
+                pending.add(asyncio.create_task(self._attempt(attempt)))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict[str, float]:
+        """Счетчики вызовов, сбоев, повторов, дублей и состояние автомата."""
+        p95 = self.latency.percentile(95)
+        return {
+            "open": int(self.breaker.state != CircuitBreaker.CLOSED),
+            "opened": self.breaker.opened,
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "rejected": self.rejected,
+            "p95": 0 if p95 is None else p95,
+        }
+
+
+def resilient(upstream: str):
+    """Декоратор: выполнять вызовы функции через upstreams[upstream]."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await upstreams[upstream].call(lambda: func(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+# Обертки внешних сервисов; дубли включаются перечислением в UPSTREAM_HEDGE
+_hedged = {name.strip() for name in UPSTREAM_HEDGE.split(",") if name.strip()}
+upstreams = {
+    name: Upstream(name, deadline=timeout, hedge=name in _hedged)
+    for name, timeout in UPSTREAM_TIMEOUTS.items()
+}
@@ -0,0 +1,224 @@
+from dataclasses import dataclass
+from datetime import date
+
+from history import LOG_FIELDS, DailyHistory, day_number
+
+# Периоды длиннее этого числа дней собираются из месячных корзин,
+# более короткие — из недельных
+MONTHLY_FROM_DAYS = 120
+
+
+class Bucket:
+    """Суммы за неделю или месяц.
+
+    Поле days — число дней с записями, water_met — дней с выполненной нормой
+    воды, calories_over — дней, когда баланс калорий превысил лимит.
+    """
+
+    __slots__ = ("sums", "days", "water_met", "calories_over")
+
+    def __init__(self):
+        self.sums = [0.0] * len(LOG_FIELDS)
+        self.days = 0
+        self.water_met = 0
+        self.calories_over = 0
+
+
+@dataclass
+class PeriodSummary:
+    """Итоги за период."""
+
+    days: int
+    logged_days: int
+    water: float
+    calories_in: float
+    calories_burned: float
+    water_met: int
+    calories_over: int
+    current_streak: int
+    best_streak: int
+
+    def average(self, field: str) -> float:
+        """Среднее значение поля за день среди дней с записями."""
+        return getattr(self, field) / self.logged_days if self.logged_days else 0.0
+
+
+def week_key(day: int) -> int:
+    """Номер недели (с понедельника) для порядкового номера дня."""
+    return (day - 1) // 7
+
+
+def week_start(key: int) -> int:
+    return key * 7 + 1
+
+
+def month_key(day: int) -> int:
+    current = date.fromordinal(day)
+    return current.year * 12 + current.month - 1
+
+
+def month_start(key: int) -> int:
+    return date(key // 12, key % 12 + 1, 1).toordinal()
+
+
+def _water_met(totals, water_goal: float | None) -> bool:
+    return bool(water_goal) and totals[0] >= water_goal
+
+
+def _calories_over(totals, calorie_goal: float | None) -> bool:
+    return bool(calorie_goal) and totals[1] - totals[2] > calorie_goal
+
+
+class UserRollups:
+    """Инкрементальные недельные и месячные итоги пользователя.
+
+    Каждая запись лога обновляет две корзины и серию дней с нормой воды за
+    O(1). Статус дня (норма воды выполнена, лимит калорий превышен)
+    определяется по целям пользователя на момент записи. Итоги за период
+    собираются из корзин, целиком попадающих в период, и из дневной истории
+    для дней на краях периода, не покрытых целой корзиной.
+    """
+
+    __slots__ = ("weeks", "months", "streak", "best_streak", "last_met_day")
+
+    def __init__(self):
+        self.weeks: dict[int, Bucket] = {}
+        self.months: dict[int, Bucket] = {}
+        self.streak = 0
+        self.best_streak = 0
+        self.last_met_day = 0
+
+    @classmethod
+    def from_history(
+        cls,
+        history: DailyHistory,
+        water_goal: float | None,
+        calorie_goal: float | None,
+    ) -> "UserRollups":
+        """Построить итоги по уже сохраненной истории (при загрузке)."""
+        rollups = cls()
+        empty = (0.0,) * len(LOG_FIELDS)
+        for day, totals in history.items():
+            after = tuple(totals[field] for field in LOG_FIELDS)
+            rollups.record(
+                day_number(day), empty, after, water_goal, calorie_goal, True
+            )
+        return rollups
+
+    def record(
+        self,
+        day: int,
+        before: tuple[float, ...],
+        after: tuple[float, ...],
+        water_goal: float | None,
+        calorie_goal: float | None,
+        new_day: bool,
+    ) -> None:
+        """Учесть изменение итогов дня.
+
+        Args:
+            day (int): Порядковый номер дня
+            before (tuple): Итоги дня (LOG_FIELDS) до записи
+            after (tuple): Итоги дня после записи
+            water_goal (float | None): Норма воды пользователя
+            calorie_goal (float | None): Лимит калорий пользователя
+            new_day (bool): Первая запись за этот день
+        """
+        water_met = _water_met(after, water_goal) - _water_met(before, water_goal)
+        calories_over = _calories_over(after, calorie_goal) - _calories_over(
+            before, calorie_goal
+        )
+        for buckets, key in (
+            (self.weeks, week_key(day)),
+            (self.months, month_key(day)),
+        ):
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = Bucket()
+            for i, (old, new) in enumerate(zip(before, after)):
+                bucket.sums[i] += new - old
+            bucket.days += new_day
+            bucket.water_met += water_met
+            bucket.calories_over += calories_over
+
+        if water_met > 0 and day != self.last_met_day:
+            self.streak = self.streak + 1 if self.last_met_day == day - 1 else 1
+            self.last_met_day = day
+            self.best_streak = max(self.best_streak, self.streak)
+
+    def summary(
+        self,
+        history: DailyHistory,
+        today: str,
+        days: int,
+        water_goal: float | None,
+        calorie_goal: float | None,
+    ) -> PeriodSummary:
+        """Итоги за days дней, заканчивая сегодняшним.
+
+        Args:
+            history (DailyHistory): Дневная история пользователя
+            today (str): Сегодняшняя дата в формате YYYY-MM-DD
+            days (int): Длина периода в днях
+            water_goal (float | None): Норма воды для дней вне целых корзин
+            calorie_goal (float | None): Лимит калорий для дней вне целых корзин
+
+        Returns:
+            PeriodSummary: Суммы, число дней и серии
+        """
+        last = day_number(today)
+        first = last - days + 1
+        if days > MONTHLY_FROM_DAYS:
+            buckets, key_of, start_of = self.months, month_key, month_start
+        else:
+            buckets, key_of, start_of = self.weeks, week_key, week_start
+
+        sums = [0.0] * len(LOG_FIELDS)
+        logged = water_met = calories_over = 0
+
+        # Первая корзина может начинаться раньше периода, а последняя — содержать
+        # дни после today: такие корзины считаем по дневной истории, остальные
+        # берем целиком
+        first_key, last_key = key_of(first), key_of(last)
+        edges = []
+        if start_of(first_key) < first:
+            edges.append((first, min(last, start_of(first_key + 1) - 1)))
+            first_key += 1
+        history_end = history.last_day
+        if first_key <= last_key and history_end is not None and history_end > last:
+            edges.append((max(first, start_of(last_key)), last))
+            last_key -= 1
+
+        for key in range(first_key, last_key + 1):
+            bucket = buckets.get(key)
+            if bucket is None:
+                continue
+            for i, value in enumerate(bucket.sums):
+                sums[i] += value
+            logged += bucket.days
+            water_met += bucket.water_met
+            calories_over += bucket.calories_over
+
+        for edge_first, edge_last in edges:
+            first_day = date.fromordinal(edge_first).isoformat()
+            count = edge_last - edge_first + 1
+            columns = [history.window(field, first_day, count) for field in LOG_FIELDS]
+            for offset, totals in enumerate(zip(*columns)):
+                if date.fromordinal(edge_first + offset).isoformat() not in history:
+                    continue
+                for i, value in enumerate(totals):
+                    sums[i] += value
+                logged += 1
+                water_met += _water_met(totals, water_goal)
+                calories_over += _calories_over(totals, calorie_goal)
+
+        current_streak = self.streak if self.last_met_day >= last - 1 else 0
+        return PeriodSummary(
+            days,
+            logged,
+            *sums,
+            water_met,
+            calories_over,
+            current_streak,
+            self.best_streak,
+        )
@@ -0,0 +1,419 @@
+import asyncio
+import hmac
+import json
+import logging
+import os
+import signal
+import sys
+import time
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiohttp import web
+
+from config import (
+    ADMIN_USER_IDS,
+    METRICS_PORT,
+    SHARD_BASE_PORT,
+    SHARD_BATCH_SIZE,
+    SHARD_DRAIN_TIMEOUT,
+    SHARD_HEALTH_FAILURES,
+    SHARD_HEALTH_INTERVAL,
+    SHARD_QUEUE_SIZE,
+    SHARD_START_TIMEOUT,
+    SHARD_WORKERS,
+    WEBHOOK_HOST,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Путь, по которому процесс-обработчик принимает пакет обновлений
+BATCH_PATH = "/batch"
+
+# Поля обновления, в которых лежит объект с отправителем "from"
+_EVENT_FIELDS = (
+    "message",
+    "edited_message",
+    "callback_query",
+    "inline_query",
+    "chosen_inline_result",
+    "shipping_query",
+    "pre_checkout_query",
+    "my_chat_member",
+    "chat_member",
+    "chat_join_request",
+    "business_message",
+    "edited_business_message",
+    "message_reaction",
+    "poll_answer",
+)
+
+
+def update_user_id(update: dict) -> int | None:
+    """ID пользователя, от которого пришло обновление (JSON Bot API).
+
+    Args:
+        update (dict): Обновление в виде словаря
+
+    Returns:
+        int | None: ID отправителя или None, если его нет (например, для
+            channel_post)
+    """
+    for field in _EVENT_FIELDS:
+        event = update.get(field)
+        if event is not None:
+            sender = event.get("from") or event.get("user")
+            return sender["id"] if sender else None
+    return None
+
+
+def shard_of(user_id: int, shards: int) -> int:
+    """Номер шарда для пользователя: одинаковый при каждом вызове.
+
+    ID пользователей перемешиваются мультипликативным хешем, чтобы шарды
+    заполнялись равномерно и при подряд идущих ID.
+    """
+    return (((user_id * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32) % shards
+
+
+# Команды администратора, которые фронт пересылает всем шардам: каждый
+# выполняет их над своими пользователями, профили которых держит в памяти
+BROADCAST_COMMANDS = {"/recalc"}
+
+
+def is_broadcast(update: dict) -> bool:
+    """Обновление — команда администратора из BROADCAST_COMMANDS."""
+    message = update.get("message")
+    if not message or update_user_id(update) not in ADMIN_USER_IDS:
+        return False
+    words = (message.get("text") or "").split(maxsplit=1)
+    # "/recalc@имя_бота" в группах — та же команда
+    return bool(words) and words[0].split("@", 1)[0] in BROADCAST_COMMANDS
+
+
+def update_shard(update: dict, shards: int) -> int:
+    """Номер шарда для обновления; обновления без отправителя — по update_id."""
+    user_id = update_user_id(update)
+    return shard_of(update.get("update_id", 0) if user_id is None else user_id, shards)
+
+
+class Shard:
+    """Процесс-обработчик шарда и очередь обновлений для него.
+
+    Обновления пересылаются пакетами одной задачей, поэтому приходят в
+    процесс в порядке получения. Если процесс недоступен или отвечает 5xx,
+    пакет повторяется, пока процесс не будет перезапущен; пакет, отвергнутый
+    с ответом 4xx, отбрасывается.
+    """
+
+    def __init__(
+        self, index: int, port: int, path: str, queue_size: int, batch_size: int
+    ):
+        self.index = index
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.batch_url = f"{self.url}{path}{BATCH_PATH}"
+        self.batch_size = batch_size
+        self.queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=queue_size)
+        self.process: asyncio.subprocess.Process | None = None
+        self.healthy = False
+        self.ready = False
+        self.spawned_at = 0.0
+        self.failures = 0
+        self.restarts = 0
+        self.forwarded = 0
+        self._sender: asyncio.Task | None = None
+
+    async def spawn(self) -> None:
+        """Запустить процесс-обработчик (bot.py в режиме "shard")."""
+        env = {
+            **os.environ,
+            "BOT_RUN_MODE": "shard",
+            "SHARD_INDEX": str(self.index),
+            # У каждого шарда свой порт /metrics
+            "METRICS_PORT": str(METRICS_PORT + 1 + self.index if METRICS_PORT else 0),
+        }
+        # Свой сеанс: Ctrl+C в терминале не должен останавливать обработчики
+        # раньше, чем фронт перешлет им очередь
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot.py"),
+            env=env,
+            start_new_session=True,
+        )
+        self.healthy = self.ready = False
+        self.spawned_at = time.monotonic()
+        self.failures = 0
+        logger.info(f"Шард {self.index}: запущен процесс {self.process.pid}")
+
+    def start_sender(self, session: aiohttp.ClientSession, headers: dict) -> None:
+        self._sender = asyncio.create_task(self._send_batches(session, headers))
+
+    async def _send_batches(
+        self, session: aiohttp.ClientSession, headers: dict
+    ) -> None:
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            body = b"[" + b",".join(batch) + b"]"
+            delay = 0.05
+            while True:
+                try:
+                    async with session.post(
+                        self.batch_url, data=body, headers=headers
+                    ) as response:
+                        if response.status == 200:
+                            break
+                        if response.status < 500:
+                            logger.error(
+                                f"Шард {self.index} отверг пакет из {len(batch)} "
+                                f"обновлений: {response.status}"
+                            )
+                            break
+                        logger.warning(
+                            f"Шард {self.index}: ответ {response.status} на пакет"
+                        )
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.warning(f"Шард {self.index} недоступен: {e!r}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 1.0)
+            self.forwarded += len(batch)
+            for _ in batch:
+                self.queue.task_done()
+
+    async def check(self, session: aiohttp.ClientSession) -> bool:
+        """Проверить процесс и его /healthz; обновляет healthy и failures."""
+        if self.process is None or self.process.returncode is not None:
+            self.healthy = False
+            return False
+        try:
+            async with session.get(
+                self.url + "/healthz", timeout=aiohttp.ClientTimeout(total=1)
+            ) as response:
+                self.healthy = response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.healthy = False
+        self.ready = self.ready or self.healthy
+        self.failures = 0 if self.healthy else self.failures + 1
+        return self.healthy
+
+    def hung(self, failures: int, start_timeout: float) -> bool:
+        """Процесс жив, но не отвечает: после запуска дается start_timeout."""
+        if self.ready:
+            return self.failures >= failures
+        return time.monotonic() - self.spawned_at > start_timeout
+
+    async def drain(self, timeout: float) -> None:
+        """Дождаться пересылки очереди в процесс и остановить пересылку."""
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error(
+                f"Шард {self.index}: не переслано {self.queue.qsize()} обновлений"
+            )
+        if self._sender is not None:
+            self._sender.cancel()
+            await asyncio.gather(self._sender, return_exceptions=True)
+
+    async def terminate(self, timeout: float) -> None:
+        """Остановить процесс: SIGTERM (он дообработает очередь), затем kill."""
+        if self.process is None or self.process.returncode is not None:
+            return
+        self.process.terminate()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Шард {self.index} не остановился за {timeout} с")
+            self.process.kill()
+            await self.process.wait()
+
+    def stats(self) -> dict:
+        return {
+            "shard": self.index,
+            "pid": self.process.pid if self.process else None,
+            "healthy": self.healthy,
+            "queued": self.queue.qsize(),
+            "forwarded": self.forwarded,
+            "restarts": self.restarts,
+        }
+
+
+class ShardRouter:
+    """Фронт webhook: распределяет обновления по процессам-обработчикам.
+
+    Шард выбирается по хешу ID отправителя, поэтому все обновления одного
+    пользователя (его FSM, кэши и данные в памяти) обрабатывает один процесс
+    в порядке получения; команды из BROADCAST_COMMANDS получают все шарды.
+    Фронт следит за здоровьем шардов, перезапускает упавшие или зависшие
+    процессы, а при остановке перестает принимать обновления, пересылает
+    очередь и дает шардам дообработать свою.
+    """
+
+    def __init__(
+        self,
+        shards: int = SHARD_WORKERS,
+        base_port: int = SHARD_BASE_PORT,
+        path: str = WEBHOOK_PATH,
+        secret_token: str | None = WEBHOOK_SECRET,
+        queue_size: int = SHARD_QUEUE_SIZE,
+        batch_size: int = SHARD_BATCH_SIZE,
+        health_interval: float = SHARD_HEALTH_INTERVAL,
+        health_failures: int = SHARD_HEALTH_FAILURES,
+        start_timeout: float = SHARD_START_TIMEOUT,
+        drain_timeout: float = SHARD_DRAIN_TIMEOUT,
+    ):
+        self.path = path
+        self.secret_token = secret_token
+        self.health_interval = health_interval
+        self.health_failures = health_failures
+        self.start_timeout = start_timeout
+        self.drain_timeout = drain_timeout
+        self.shards = [
+            Shard(index, base_port + index, path, queue_size, batch_size)
+            for index in range(shards)
+        ]
+        self._session: aiohttp.ClientSession | None = None
+        self._health_task: asyncio.Task | None = None
+        self._runner: web.AppRunner | None = None
+        self._accepting = False
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self._handle)
+        app.router.add_get("/healthz", self._health)
+        return app
+
+    def _verify_secret(self, request: web.Request) -> bool:
+        if not self.secret_token:
+            return True
+        received = request.headers.get(SECRET_HEADER, "")
+        return hmac.compare_digest(received, self.secret_token)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        if not self._verify_secret(request):
+            return web.Response(status=401)
+        if not self._accepting:
+            return web.Response(status=503)
+        body = await request.read()
+        try:
+            update = json.loads(body)
+            if is_broadcast(update):
+                shards = self.shards
+            else:
+                shards = [self.shards[update_shard(update, len(self.shards))]]
+        except (ValueError, TypeError, AttributeError, KeyError) as e:
+            logger.error(f"Некорректное обновление: {e!r}")
+            return web.Response(status=400)
+        for shard in shards:
+            await shard.queue.put(body)
+        return web.Response()
+
+    async def _health(self, request: web.Request) -> web.Response:
+        shards = [shard.stats() for shard in self.shards]
+        healthy = self._accepting and all(shard["healthy"] for shard in shards)
+        return web.json_response(
+            {"accepting": self._accepting, "shards": shards},
+            status=200 if healthy else 503,
+        )
+
+    async def _check_shards(self) -> None:
+        for shard in self.shards:
+            alive = shard.process is not None and shard.process.returncode is None
+            if await shard.check(self._session):
+                continue
+            if not alive:
+                logger.error(
+                    f"Шард {shard.index} завершился с кодом "
+                    f"{shard.process.returncode}, перезапуск"
+                )
+            elif shard.hung(self.health_failures, self.start_timeout):
+                logger.error(f"Шард {shard.index} не отвечает, перезапуск")
+                shard.process.kill()
+                await shard.process.wait()
+            else:
+                continue
+            shard.restarts += 1
+            await shard.spawn()
+
+    async def _watch_health(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self._check_shards()
+            except Exception as e:
+                logger.exception(f"Ошибка проверки шардов: {e}")
+
+    async def start(self, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT) -> None:
+        """Запустить шарды, пересылку, проверку здоровья и HTTP-сервер."""
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=0),
+            timeout=aiohttp.ClientTimeout(total=self.drain_timeout),
+        )
+        headers = {"Content-Type": "application/json"}
+        if self.secret_token:
+            headers[SECRET_HEADER] = self.secret_token
+        for shard in self.shards:
+            await shard.spawn()
+            shard.start_sender(self._session, headers)
+        self._health_task = asyncio.create_task(self._watch_health())
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self._accepting = True
+        logger.info(
+            f"Фронт webhook слушает {host}:{port}{self.path}, "
+            f"шардов: {len(self.shards)}"
+        )
+
+    async def stop(self) -> None:
+        """Перестать принимать обновления, переслать очереди и остановить шарды."""
+        self._accepting = False
+        # Пока очереди пересылаются, упавшие шарды по-прежнему перезапускаются
+        await asyncio.gather(
+            *(shard.drain(self.drain_timeout) for shard in self.shards)
+        )
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+        await asyncio.gather(
+            *(shard.terminate(self.drain_timeout) for shard in self.shards)
+        )
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def run_sharded(dispatcher: Dispatcher, bot: Bot) -> None:
+    """Работать фронтом шардированного webhook до SIGINT или SIGTERM."""
+    router = ShardRouter()
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    await router.start()
+    try:
+        await bot.set_webhook(
+            url=f"{WEBHOOK_URL.rstrip('/')}{router.path}",
+            secret_token=router.secret_token,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+        )
+        await stop_event.wait()
+    finally:
+        logger.info("Остановка фронта и шардов")
+        await router.stop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
@@ -0,0 +1,344 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+from config import STORAGE_BACKEND, STORAGE_FLUSH_INTERVAL, STORAGE_PATH
+from history import LOG_FIELDS, DailyHistory, DayView, day_number
+from rollups import PeriodSummary, UserRollups
+
+logger = logging.getLogger(__name__)
+
+
+class UserStorage:
+    """Хранилище профилей пользователей и их дневных логов."""
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def get_user(self, user_id: int) -> dict | None:
+        """Профиль пользователя или None, если профиль не заполнен."""
+        raise NotImplementedError
+
+    async def save_user(self, user_id: int, profile: dict) -> None:
+        """Сохранить профиль пользователя."""
+        raise NotImplementedError
+
+    async def get_profiles(self) -> dict[int, dict]:
+        """Профили всех пользователей: {user_id: профиль}."""
+        raise NotImplementedError
+
+    async def update_profiles(self, changes: Mapping[int, dict]) -> None:
+        """Обновить поля в профилях нескольких пользователей.
+
+        Args:
+            changes (Mapping[int, dict]): {user_id: {поле: новое значение}}
+        """
+        raise NotImplementedError
+
+    async def get_daily_logs(self, user_id: int) -> DailyHistory:
+        """Дневные логи пользователя: {дата: {water, calories_in, calories_burned}}."""
+        raise NotImplementedError
+
+    async def add_daily_log(self, user_id: int, day: str, **amounts: float) -> DayView:
+        """Прибавить значения к логу за день.
+
+        Args:
+            user_id (int): ID пользователя
+            day (str): Дата в формате YYYY-MM-DD
+            **amounts (float): Значения water, calories_in, calories_burned
+
+        Returns:
+            DayView: Итоги за день после обновления
+        """
+        raise NotImplementedError
+
+    async def get_summary(self, user_id: int, today: str, days: int) -> PeriodSummary:
+        """Итоги пользователя за days дней, заканчивая днем today."""
+        raise NotImplementedError
+
+
+class MemoryStorage(UserStorage):
+    """Хранилище в памяти процесса; данные теряются при перезапуске."""
+
+    def __init__(self):
+        self._profiles: dict[int, dict] = {}
+        self._logs: dict[int, DailyHistory] = {}
+        self._rollups: dict[int, UserRollups] = {}
+
+    def _goals(self, user_id: int) -> tuple[float | None, float | None]:
+        profile = self._profiles.get(user_id) or {}
+        return profile.get("water_goal"), profile.get("calorie_goal")
+
+    async def get_user(self, user_id: int) -> dict | None:
+        return self._profiles.get(user_id)
+
+    async def save_user(self, user_id: int, profile: dict) -> None:
+        self._profiles[user_id] = profile
+
+    async def get_profiles(self) -> dict[int, dict]:
+        return dict(self._profiles)
+
+    async def update_profiles(self, changes: Mapping[int, dict]) -> None:
+        for user_id, fields in changes.items():
+            profile = self._profiles.get(user_id)
+            if profile is not None:
+                self._profiles[user_id] = {**profile, **fields}
+
+    async def get_daily_logs(self, user_id: int) -> DailyHistory:
+        logs = self._logs.get(user_id)
+        return DailyHistory() if logs is None else logs
+
+    async def add_daily_log(self, user_id: int, day: str, **amounts: float) -> DayView:
+        logs = self._logs.get(user_id)
+        if logs is None:
+            logs = self._logs[user_id] = DailyHistory()
+        rollups = self._rollups.get(user_id)
+        if rollups is None:
+            rollups = self._rollups[user_id] = UserRollups()
+
+        new_day = day not in logs
+        totals = logs.add(day, **amounts)
+        after = tuple(totals[field] for field in LOG_FIELDS)
+        before = tuple(
+            value - amounts.get(field, 0) for field, value in zip(LOG_FIELDS, after)
+        )
+        rollups.record(day_number(day), before, after, *self._goals(user_id), new_day)
+        return totals
+
+    async def get_summary(self, user_id: int, today: str, days: int) -> PeriodSummary:
+        rollups = self._rollups.get(user_id) or UserRollups()
+        return rollups.summary(
+            await self.get_daily_logs(user_id), today, days, *self._goals(user_id)
+        )
+
+
+class SQLiteStorage(MemoryStorage):
+    """Хранилище в SQLite (WAL) с отложенной пакетной записью.
+
+    Изменения сначала применяются к данным в памяти, а затем раз в
+    flush_interval секунд и при остановке записываются одной транзакцией.
+    Все обращения к базе выполняются в отдельном потоке.
+    """
+
+    def __init__(
+        self, path: str = STORAGE_PATH, flush_interval: float = STORAGE_FLUSH_INTERVAL
+    ):
+        super().__init__()
+        self.path = path
+        self.flush_interval = flush_interval
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._connection: sqlite3.Connection | None = None
+        self._loaded: set[int] = set()
+        self._dirty_profiles: set[int] = set()
+        self._dirty_logs: set[tuple[int, str]] = set()
+        self._flush_task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connect(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                profile TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS daily_logs (
+                user_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                water REAL NOT NULL DEFAULT 0,
+                calories_in REAL NOT NULL DEFAULT 0,
+                calories_burned REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, day)
+            );
+            """
+        )
+        self._connection = connection
+
+    async def start(self) -> None:
+        if self._connection is None:
+            await self._run(self._connect)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self._connection is not None:
+            await self.flush()
+            await self._run(self._connection.close)
+            self._connection = None
+        self._executor.shutdown(wait=True)
+
+    def _load_user(self, user_id: int) -> tuple[dict | None, DailyHistory]:
+        row = self._connection.execute(
+            "SELECT profile FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        logs = DailyHistory()
+        for day, water, cal_in, burned in self._connection.execute(
+            "SELECT day, water, calories_in, calories_burned "
+            "FROM daily_logs WHERE user_id = ? ORDER BY day",
+            (user_id,),
+        ):
+            logs.add(day, water=water, calories_in=cal_in, calories_burned=burned)
+        return (json.loads(row[0]) if row else None), logs
+
+    async def _ensure_loaded(self, user_id: int) -> None:
+        if user_id in self._loaded:
+            return
+        if self._connection is None:
+            await self.start()
+        profile, logs = await self._run(self._load_user, user_id)
+        if user_id in self._loaded:
+            # Пока шло чтение, пользователя уже загрузил другой обработчик
+            return
+        self._loaded.add(user_id)
+        if profile is not None:
+            self._profiles.setdefault(user_id, profile)
+        if logs:
+            existing = self._logs.setdefault(user_id, logs)
+            if existing is not logs:
+                existing.update(logs)
+            self._rollups[user_id] = UserRollups.from_history(
+                existing, *self._goals(user_id)
+            )
+
+    async def get_user(self, user_id: int) -> dict | None:
+        await self._ensure_loaded(user_id)
+        return await super().get_user(user_id)
+
+    async def save_user(self, user_id: int, profile: dict) -> None:
+        await self._ensure_loaded(user_id)
+        await super().save_user(user_id, profile)
+        self._dirty_profiles.add(user_id)
+
+    def _read_profiles(self) -> dict[int, dict]:
+        return {
+            user_id: json.loads(profile)
+            for user_id, profile in self._connection.execute(
+                "SELECT user_id, profile FROM users"
+            )
+        }
+
+    async def get_profiles(self) -> dict[int, dict]:
+        if self._connection is None:
+            await self.start()
+        profiles = await self._run(self._read_profiles)
+        # Профили в памяти новее записанных в базу
+        profiles.update(self._profiles)
+        return profiles
+
+    def _update_stored(self, changes: list[tuple[int, str]]) -> None:
+        with self._connection:
+            self._connection.executemany(
+                "UPDATE users SET profile = json_patch(profile, ?) WHERE user_id = ?",
+                [(fields, user_id) for user_id, fields in changes],
+            )
+
+    async def update_profiles(self, changes: Mapping[int, dict]) -> None:
+        # Загруженные профили меняем в памяти; остальные — сразу в базе, не
+        # загружая дневные логи пользователей
+        stored = []
+        for user_id, fields in changes.items():
+            if user_id in self._profiles:
+                await super().update_profiles({user_id: fields})
+                self._dirty_profiles.add(user_id)
+            elif user_id not in self._loaded:
+                stored.append((user_id, json.dumps(fields, ensure_ascii=False)))
+        if stored:
+            if self._connection is None:
+                await self.start()
+            await self._run(self._update_stored, stored)
+
+    async def get_daily_logs(self, user_id: int) -> DailyHistory:
+        await self._ensure_loaded(user_id)
+        return await super().get_daily_logs(user_id)
+
+    async def add_daily_log(self, user_id: int, day: str, **amounts: float) -> DayView:
+        await self._ensure_loaded(user_id)
+        totals = await super().add_daily_log(user_id, day, **amounts)
+        self._dirty_logs.add((user_id, day))
+        return totals
+
+    async def get_summary(self, user_id: int, today: str, days: int) -> PeriodSummary:
+        await self._ensure_loaded(user_id)
+        return await super().get_summary(user_id, today, days)
+
+    def _write(self, profiles: list[tuple], logs: list[tuple]) -> None:
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO users (user_id, profile) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET profile = excluded.profile",
+                profiles,
+            )
+            self._connection.executemany(
+                "INSERT INTO daily_logs "
+                "(user_id, day, water, calories_in, calories_burned) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(user_id, day) DO UPDATE SET "
+                "water = excluded.water, "
+                "calories_in = excluded.calories_in, "
+                "calories_burned = excluded.calories_burned",
+                logs,
+            )
+
+    async def flush(self) -> None:
+        """Записать накопленные изменения в базу одной транзакцией."""
+        async with self._flush_lock:
+            if not self._dirty_profiles and not self._dirty_logs:
+                return
+            dirty_profiles, self._dirty_profiles = self._dirty_profiles, set()
+            dirty_logs, self._dirty_logs = self._dirty_logs, set()
+            profiles = [
+                (user_id, json.dumps(self._profiles[user_id], ensure_ascii=False))
+                for user_id in dirty_profiles
+            ]
+            logs = []
+            for user_id, day in dirty_logs:
+                totals = self._logs[user_id][day]
+                logs.append((user_id, day, *(totals[field] for field in LOG_FIELDS)))
+            try:
+                await self._run(self._write, profiles, logs)
+            except BaseException as e:
+                # Вернем изменения в очередь, чтобы записать их при следующей
+                # попытке. Это нужно и при отмене: close() отменяет фоновую
+                # запись, и без этого изменения не попали бы в последнюю
+                self._dirty_profiles |= dirty_profiles
+                self._dirty_logs |= dirty_logs
+                if not isinstance(e, sqlite3.Error):
+                    raise
+                logger.error(f"Ошибка записи в базу: {e}")
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+def create_storage(backend: str = STORAGE_BACKEND) -> UserStorage:
+    """Создать хранилище по имени бэкенда ("sqlite" или "memory")."""
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "sqlite":
+        return SQLiteStorage()
+    raise ValueError(f"Неизвестный бэкенд хранилища: {backend}")
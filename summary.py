@@ -0,0 +1,546 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from aiogram.types import BufferedInputFile
+
+from chart_service import RenderedChart, chart_service
+from config import (
+    SUMMARY_BATCH_SIZE,
+    SUMMARY_CATCH_UP,
+    SUMMARY_CHAT_INTERVAL,
+    SUMMARY_QUEUE_SIZE,
+    SUMMARY_RENDER_CONCURRENCY,
+    SUMMARY_SEND_CONCURRENCY,
+    SUMMARY_SEND_RATE,
+    SUMMARY_SEND_RETRIES,
+    SUMMARY_STORAGE_PATH,
+    SUMMARY_TIME,
+)
+from storage import UserStorage
+from utils import get_net_calories, get_water_values
+
+logger = logging.getLogger(__name__)
+
+# Итоги дня: текст и графики воды и калорий, отправляются в этом порядке
+Summary = tuple[str, RenderedChart, RenderedChart]
+
+
+class SummaryStore:
+    """Подписки на итоги дня и ход рассылок в SQLite.
+
+    Для каждого дня хранится, сколько сообщений итогов получил каждый
+    подписчик и завершена ли рассылка, поэтому прерванная рассылка после
+    перезапуска продолжается с того же сообщения. Отметка пишется сразу после
+    каждой отправки, так что повторно может уйти только сообщение, отправленное
+    в момент остановки процесса.
+
+    Файл общий для всех шардов (режим "shard"): подписки общие, а ход
+    рассылки хранится отдельно для каждого шарда, поэтому шард, закончивший
+    рассылку, не трогает отметки тех, кто еще отправляет.
+    """
+
+    def __init__(self, path: str = SUMMARY_STORAGE_PATH, shard: int = 0):
+        self.path = path
+        self.shard = shard
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+        self._connection: sqlite3.Connection | None = None
+
+    async def _run(self, func, *args):
+        if self._connection is None:
+            await self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connect(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        columns = [
+            row[1] for row in connection.execute("PRAGMA table_info(summary_runs)")
+        ]
+        if columns and "shard" not in columns:
+            # Ход рассылок без номера шарда: в нем только отметки для
+            # продолжения, их можно удалить
+            connection.executescript(
+                "DROP TABLE summary_runs; DROP TABLE IF EXISTS summary_sent;"
+            )
+        connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS subscribers (
+                user_id INTEGER PRIMARY KEY
+            );
+            CREATE TABLE IF NOT EXISTS summary_runs (
+                shard INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                finished_at REAL,
+                PRIMARY KEY (shard, day)
+            );
+            CREATE TABLE IF NOT EXISTS summary_sent (
+                shard INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                messages INTEGER NOT NULL,
+                done INTEGER NOT NULL,
+                PRIMARY KEY (shard, day, user_id)
+            );
+            """
+        )
+        self._connection = connection
+
+    async def start(self) -> None:
+        if self._connection is None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._connect)
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._run(self._connection.close)
+            self._connection = None
+
+    def _execute(self, query: str, params: tuple = ()) -> None:
+        with self._connection:
+            self._connection.execute(query, params)
+
+    def _column(self, query: str, params: tuple = ()) -> list:
+        return [row[0] for row in self._connection.execute(query, params)]
+
+    async def subscribe(self, user_id: int) -> None:
+        await self._run(
+            self._execute,
+            "INSERT OR IGNORE INTO subscribers (user_id) VALUES (?)",
+            (user_id,),
+        )
+
+    async def unsubscribe(self, user_id: int) -> None:
+        await self._run(
+            self._execute, "DELETE FROM subscribers WHERE user_id = ?", (user_id,)
+        )
+
+    async def is_subscribed(self, user_id: int) -> bool:
+        rows = await self._run(
+            self._column, "SELECT 1 FROM subscribers WHERE user_id = ?", (user_id,)
+        )
+        return bool(rows)
+
+    async def subscribers(self) -> list[int]:
+        return await self._run(
+            self._column, "SELECT user_id FROM subscribers ORDER BY user_id"
+        )
+
+    async def run_state(self, day: str) -> str | None:
+        """Состояние рассылки за день: None, "started" или "finished"."""
+        rows = await self._run(
+            self._column,
+            "SELECT finished_at FROM summary_runs WHERE shard = ? AND day = ?",
+            (self.shard, day),
+        )
+        if not rows:
+            return None
+        return "started" if rows[0] is None else "finished"
+
+    async def start_run(self, day: str) -> None:
+        await self._run(
+            self._execute,
+            "INSERT OR IGNORE INTO summary_runs (shard, day, started_at) "
+            "VALUES (?, ?, ?)",
+            (self.shard, day, time.time()),
+        )
+
+    async def finish_run(self, day: str) -> None:
+        # Отметки об отправке нужны только незавершенной рассылке
+        def finish() -> None:
+            with self._connection:
+                self._connection.execute(
+                    "UPDATE summary_runs SET finished_at = ? "
+                    "WHERE shard = ? AND day = ?",
+                    (time.time(), self.shard, day),
+                )
+                self._connection.execute(
+                    "DELETE FROM summary_sent WHERE shard = ? AND day <= ?",
+                    (self.shard, day),
+                )
+
+        await self._run(finish)
+
+    async def progress(self, day: str) -> dict[int, int | None]:
+        """Отправлено ли за день: число сообщений или None, если все."""
+        rows = await self._run(
+            lambda: self._connection.execute(
+                "SELECT user_id, messages, done FROM summary_sent "
+                "WHERE shard = ? AND day = ?",
+                (self.shard, day),
+            ).fetchall()
+        )
+        return {user_id: None if done else messages for user_id, messages, done in rows}
+
+    async def mark_sent(
+        self, day: str, user_id: int, messages: int = 0, done: bool = True
+    ) -> None:
+        await self._run(
+            self._execute,
+            "INSERT INTO summary_sent (shard, day, user_id, messages, done) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(shard, day, user_id) DO UPDATE SET "
+            "messages = excluded.messages, done = excluded.done",
+            (self.shard, day, user_id, messages, int(done)),
+        )
+
+
+class RateLimiter:
+    """Равномерный темп отправки: не чаще rate сообщений в секунду.
+
+    Ответ 429 от Telegram (flood control) приостанавливает все отправки через
+    ограничитель на указанное время.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self._next = 0.0
+        self.paused = 0
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        self._next = max(self._next, now)
+        wait = self._next - now
+        self._next += self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        self._next = max(self._next, time.monotonic() + seconds)
+        self.paused += 1
+
+
+class SummarySender:
+    """Очередь отправки итогов с ограниченным числом отправителей.
+
+    Сообщения уходят с общим темпом не выше rate в секунду и не чаще одного
+    в chat_interval секунд в один чат. Очередь ограничена, поэтому подготовка
+    итогов ждет, пока отправка не догонит. Пользователи, заблокировавшие
+    бота, отписываются.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        store: SummaryStore,
+        day: str,
+        rate: float = SUMMARY_SEND_RATE,
+        chat_interval: float = SUMMARY_CHAT_INTERVAL,
+        concurrency: int = SUMMARY_SEND_CONCURRENCY,
+        queue_size: int = SUMMARY_QUEUE_SIZE,
+        retries: int = SUMMARY_SEND_RETRIES,
+    ):
+        self.bot = bot
+        self.store = store
+        self.day = day
+        self.limiter = RateLimiter(rate)
+        self.chat_interval = chat_interval
+        self.concurrency = concurrency
+        self.retries = retries
+        self.queue: asyncio.Queue[tuple[int, Summary, int]] = asyncio.Queue(
+            maxsize=queue_size
+        )
+        self.stats = {"sent": 0, "failed": 0, "blocked": 0, "messages": 0}
+        self._workers: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._workers = [
+            asyncio.create_task(self._work()) for _ in range(self.concurrency)
+        ]
+
+    async def put(self, user_id: int, summary: Summary, skip: int = 0) -> None:
+        """Поставить итоги в очередь; первые skip сообщений уже отправлены."""
+        await self.queue.put((user_id, summary, skip))
+
+    async def join(self) -> None:
+        """Дождаться отправки всей очереди и остановить отправителей."""
+        await self.queue.join()
+        await self.close()
+
+    async def close(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _work(self) -> None:
+        while True:
+            user_id, summary, skip = await self.queue.get()
+            try:
+                await self._deliver(user_id, summary, skip)
+            except Exception as e:
+                logger.error(f"Итоги дня для {user_id} не отправлены: {e}")
+                self.stats["failed"] += 1
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, user_id: int, summary: Summary, skip: int) -> None:
+        text, water_chart, calories_chart = summary
+        messages = [
+            self._send_text(user_id, text),
+            self._send_photo(
+                user_id, water_chart, "water.png", "Вода за последние 7 дней"
+            ),
+            self._send_photo(
+                user_id,
+                calories_chart,
+                "calories.png",
+                "Баланс калорий за последние 7 дней",
+            ),
+        ]
+        try:
+            for index in range(skip, len(messages)):
+                if index > skip:
+                    await asyncio.sleep(self.chat_interval)
+                await self._send(messages[index])
+                if index + 1 < len(messages):
+                    await self.store.mark_sent(self.day, user_id, index + 1, False)
+        except TelegramForbiddenError:
+            logger.info(f"Пользователь {user_id} заблокировал бота, подписка снята")
+            self.stats["blocked"] += 1
+            await self.store.unsubscribe(user_id)
+        else:
+            self.stats["sent"] += 1
+        await self.store.mark_sent(self.day, user_id, len(messages))
+
+    async def _send(self, send: Callable[[], Awaitable]) -> None:
+        for attempt in range(self.retries + 1):
+            await self.limiter.acquire()
+            try:
+                await send()
+                self.stats["messages"] += 1
+                return
+            except TelegramRetryAfter as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning(f"Flood control Telegram: пауза {e.retry_after} с")
+                self.limiter.pause(e.retry_after)
+            except (TelegramNetworkError, TelegramServerError):
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(2**attempt)
+
+    def _send_text(self, user_id: int, text: str) -> Callable[[], Awaitable]:
+        return lambda: self.bot.send_message(user_id, text)
+
+    def _send_photo(
+        self, user_id: int, chart: RenderedChart, filename: str, caption: str
+    ) -> Callable[[], Awaitable]:
+        async def send() -> None:
+            photo = chart.file_id or BufferedInputFile(chart.png, filename=filename)
+            sent = await self.bot.send_photo(user_id, photo, caption=caption)
+            if chart.file_id is None and sent.photo:
+                chart.file_id = sent.photo[-1].file_id
+
+        return send
+
+
+def format_summary(user_data: dict, today_data: dict) -> str:
+    """Текст итогов дня по записям за сегодня."""
+    water_goal = user_data["water_goal"]
+    calorie_goal = user_data["calorie_goal"]
+    water = int(today_data["water"])
+    balance = today_data["calories_in"] - today_data["calories_burned"]
+    water_line = (
+        "норма выполнена"
+        if water >= water_goal
+        else f"до нормы не хватило {water_goal - water} мл"
+    )
+    calorie_line = (
+        f"лимит превышен на {balance - calorie_goal:.0f} ккал"
+        if balance > calorie_goal
+        else "лимит соблюден"
+    )
+    return (
+        "Итоги дня:\n\n"
+        f"Вода: {water} мл из {water_goal} мл — {water_line}\n"
+        f"Калории: потреблено {today_data['calories_in']:.0f} ккал, "
+        f"сожжено {today_data['calories_burned']:.0f} ккал, "
+        f"баланс {balance:.0f} ккал из {calorie_goal} ккал — {calorie_line}"
+    )
+
+
+class DailySummary:
+    """Ежедневная рассылка итогов дня подписчикам.
+
+    В SUMMARY_TIME (локальное время сервера) итоги готовятся пакетами по
+    batch_size пользователей: записи читаются из хранилища, графики рисуются
+    в общем пуле не более чем render_concurrency пользователей одновременно,
+    чтобы интерактивные /check_progress не ждали всю рассылку. Готовые итоги
+    передаются SummarySender. Если бот запущен позже времени рассылки не
+    больше чем на catch_up секунд или предыдущая рассылка за сегодня не
+    завершилась, она выполняется сразу.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        storage: UserStorage,
+        store: SummaryStore | None = None,
+        at: str = SUMMARY_TIME,
+        catch_up: float = SUMMARY_CATCH_UP,
+        batch_size: int = SUMMARY_BATCH_SIZE,
+        render_concurrency: int = SUMMARY_RENDER_CONCURRENCY,
+        owns: Callable[[int], bool] = lambda user_id: True,
+        **sender_options,
+    ):
+        self.bot = bot
+        self.storage = storage
+        self.store = store or SummaryStore()
+        hours, minutes = at.split(":")
+        self.at = (int(hours), int(minutes))
+        self.catch_up = catch_up
+        self.batch_size = batch_size
+        self.render_concurrency = render_concurrency
+        self.owns = owns
+        self.sender_options = sender_options
+        self.last_run: dict[str, int] = {}
+
+    def next_run(self, now: datetime) -> datetime:
+        """Ближайшее время рассылки после now."""
+        run_at = now.replace(
+            hour=self.at[0], minute=self.at[1], second=0, microsecond=0
+        )
+        return run_at if run_at > now else run_at + timedelta(days=1)
+
+    async def _due_now(self, now: datetime) -> bool:
+        state = await self.store.run_state(now.date().isoformat())
+        if state == "started":
+            return True
+        run_at = now.replace(
+            hour=self.at[0], minute=self.at[1], second=0, microsecond=0
+        )
+        return state is None and 0 <= (now - run_at).total_seconds() <= self.catch_up
+
+    async def run_forever(self) -> None:
+        try:
+            due = await self._due_now(datetime.now())
+        except sqlite3.Error as e:
+            logger.error(f"Не удалось проверить рассылку итогов дня: {e}")
+            due = False
+        if due:
+            await self._run_logged(date.today())
+        while True:
+            now = datetime.now()
+            run_at = self.next_run(now)
+            await asyncio.sleep((run_at - now).total_seconds())
+            await self._run_logged(run_at.date())
+
+    async def _run_logged(self, day: date) -> None:
+        try:
+            stats = await self.run(day)
+            logger.info(f"Итоги дня за {day} разосланы: {stats}")
+        except Exception as e:
+            # Сбой одной рассылки не должен останавливать расписание
+            logger.exception(f"Ошибка рассылки итогов дня за {day}: {e}")
+
+    async def _prepare(
+        self, user_id: int, dates: list[str], renders: asyncio.Semaphore
+    ) -> Summary | None:
+        """Итоги пользователя или None, если за день нет записей."""
+        user_data = await self.storage.get_user(user_id)
+        if user_data is None:
+            return None
+        daily_logs = await self.storage.get_daily_logs(user_id)
+        today_data = daily_logs.get(dates[-1])
+        if today_data is None:
+            return None
+        async with renders:
+            water_chart, calories_chart = await chart_service.render_progress(
+                dates,
+                get_water_values(daily_logs, dates),
+                user_data["water_goal"],
+                get_net_calories(daily_logs, dates),
+                user_data["calorie_goal"],
+            )
+        return format_summary(user_data, today_data), water_chart, calories_chart
+
+    async def run(self, day: date) -> dict[str, int]:
+        """Разослать итоги за day подписчикам, которым они еще не отправлены.
+
+        Returns:
+            dict[str, int]: Счетчики отправленных, пропущенных (нет записей за
+                день), заблокировавших бота и неудачных отправок; пустой
+                словарь, если рассылка за day уже завершена
+        """
+        key = day.isoformat()
+        if await self.store.run_state(key) == "finished":
+            # Отметки завершенной рассылки удалены: без этой проверки итоги
+            # ушли бы всем подписчикам еще раз
+            logger.info(f"Рассылка итогов дня за {key} уже завершена")
+            return {}
+        dates = [(day - timedelta(days=i)).isoformat() for i in range(6, -1, -1)]
+        await self.store.start_run(key)
+        progress = await self.store.progress(key)
+        pending = [
+            user_id
+            for user_id in await self.store.subscribers()
+            if progress.get(user_id, 0) is not None and self.owns(user_id)
+        ]
+        done = sum(messages is None for messages in progress.values())
+        if progress:
+            logger.info(
+                f"Продолжение рассылки за {key}: отправлено {done}, "
+                f"осталось {len(pending)}"
+            )
+
+        sender = SummarySender(self.bot, self.store, key, **self.sender_options)
+        sender.start()
+        renders = asyncio.Semaphore(self.render_concurrency)
+        skipped = 0
+
+        async def prepare(user_id: int) -> None:
+            # Итоги ставятся в очередь сразу, не дожидаясь остальных в пакете
+            nonlocal skipped
+            try:
+                summary = await self._prepare(user_id, dates, renders)
+            except Exception as e:
+                logger.exception(f"Итоги дня для {user_id} не подготовлены: {e}")
+                sender.stats["failed"] += 1
+                return
+            if summary is None:
+                skipped += 1
+                await self.store.mark_sent(key, user_id)
+            else:
+                await sender.put(user_id, summary, progress.get(user_id, 0))
+
+        try:
+            for batch in chunks(pending, self.batch_size):
+                await asyncio.gather(*(prepare(user_id) for user_id in batch))
+            await sender.join()
+        finally:
+            await sender.close()
+        await self.store.finish_run(key)
+        self.last_run = {
+            **sender.stats,
+            "resumed": done,
+            "skipped": skipped,
+            "paused": sender.limiter.paused,
+        }
+        return self.last_run
+
+    async def close(self) -> None:
+        await self.store.close()
+
+
+def chunks(items: list, size: int) -> Iterable[list]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import logging
+import math
+import os
+from typing import TYPE_CHECKING
+
+from cache import TTLCache, normalize_name
+from config import (
+    TRANSLATION_BATCH_DELAY,
+    TRANSLATION_BATCH_SIZE,
+    TRANSLATION_CACHE_SIZE,
+    TRANSLATIONS_PATH,
+)
+
+if TYPE_CHECKING:
+    from googletrans import Translator
+
+logger = logging.getLogger(__name__)
+
+SEED_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "translations_seed.json"
+)
+
+
+class PhraseDictionary:
+    """Персистентный словарь переводов ru→en.
+
+    Базовые переводы загружаются из файла-заготовки, новые фразы дописываются
+    в отдельный JSON-файл, который переживает перезапуск бота.
+    """
+
+    def __init__(self, path: str = TRANSLATIONS_PATH, seed_path: str = SEED_PATH):
+        self.path = path
+        self.seed_path = seed_path
+        self._phrases: dict[str, str] = {}
+        self._learned: dict[str, str] = {}
+        self._dirty = False
+
+    def load(self) -> None:
+        """Загрузить заготовку и выученные ранее переводы."""
+        self._phrases = self._read(self.seed_path)
+        self._learned = self._read(self.path)
+        self._phrases.update(self._learned)
+
+    @staticmethod
+    def _read(path: str) -> dict[str, str]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return {normalize_name(k): v for k, v in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось прочитать словарь переводов {path}: {e}")
+            return {}
+
+    def __len__(self) -> int:
+        return len(self._phrases)
+
+    def get(self, phrase: str) -> str | None:
+        return self._phrases.get(phrase)
+
+    def add(self, phrase: str, translation: str) -> None:
+        if self._phrases.get(phrase) != translation:
+            self._phrases[phrase] = translation
+            self._learned[phrase] = translation
+            self._dirty = True
+
+    def save(self) -> None:
+        """Атомарно записать выученные переводы на диск."""
+        if not self._dirty:
+            return
+        self._dirty = False
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._learned, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+class TranslationService:
+    """Перевод фраз с кэшированием и объединением запросов в пакеты.
+
+    Порядок поиска: LRU в памяти, затем словарь на диске, затем переводчик.
+    Фразы, пришедшие в течение batch_delay секунд, переводятся одним вызовом.
+    """
+
+    def __init__(
+        self,
+        dictionary: PhraseDictionary | None = None,
+        cache_size: int = TRANSLATION_CACHE_SIZE,
+        batch_delay: float = TRANSLATION_BATCH_DELAY,
+        batch_size: int = TRANSLATION_BATCH_SIZE,
+    ):
+        self.dictionary = PhraseDictionary() if dictionary is None else dictionary
+        self.cache = TTLCache(maxsize=cache_size, ttl=math.inf)
+        self.batch_delay = batch_delay
+        self.batch_size = batch_size
+        self.network_calls = 0
+        self._translator: Translator | None = None
+        self._pending: dict[str, asyncio.Future] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._loaded = False
+        self._save_lock = asyncio.Lock()
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.dictionary.load()
+            self._loaded = True
+
+    async def translate(self, text: str) -> str:
+        """Перевести фразу на английский.
+
+        Args:
+            text (str): Фраза на русском
+
+        Returns:
+            str: Перевод на английский
+        """
+        self._ensure_loaded()
+        phrase = normalize_name(text)
+        return await self.cache.get_or_load(phrase, lambda: self._lookup(phrase))
+
+    async def _lookup(self, phrase: str) -> str:
+        translation = self.dictionary.get(phrase)
+        if translation is not None:
+            return translation
+        return await self._submit(phrase)
+
+    def _submit(self, phrase: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[phrase] = future
+        if len(self._pending) >= self.batch_size:
+            self._schedule_flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_delay, self._schedule_flush)
+        return future
+
+    def _schedule_flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            asyncio.get_running_loop().create_task(self._flush(batch))
+
+    async def _flush(self, batch: dict[str, asyncio.Future]) -> None:
+        phrases = list(batch)
+        try:
+            translations = await self._translate_batch(phrases)
+        except Exception as e:
+            logger.error(f"Ошибка перевода: {e}")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for phrase, translation in zip(phrases, translations):
+            self.dictionary.add(phrase, translation)
+            if not batch[phrase].done():
+                batch[phrase].set_result(translation)
+        await self._save()
+
+    async def _save(self) -> None:
+        async with self._save_lock:
+            await asyncio.to_thread(self.dictionary.save)
+
+    async def warmup(self) -> None:
+        """Загрузить словарь и модуль переводчика заранее, в фоне.
+
+        Без прогрева это происходит при первом переводе; импорт googletrans
+        (вместе с httpx) выполняется в потоке, не блокируя цикл событий.
+        """
+        self._ensure_loaded()
+        await asyncio.to_thread(_import_translator)
+
+    async def _translate_batch(self, phrases: list[str]) -> list[str]:
+        if self._translator is None:
+            self._translator = _import_translator()()
+        self.network_calls += 1
+        # Фразы объединяются в один текст, по строке на фразу
+        result = await self._translator.translate("\n".join(phrases), dest="en")
+        translations = [line.strip() for line in result.text.split("\n")]
+        if len(translations) == len(phrases):
+            return translations
+
+        results = await self._translator.translate(phrases, dest="en")
+        return [item.text for item in results]
+
+    async def close(self) -> None:
+        """Сохранить словарь и закрыть соединение переводчика."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            await self._flush(batch)
+        if self._translator is not None:
+            await self._translator.client.aclose()
+            self._translator = None
+        if self._loaded:
+            await self._save()
+
+    def stats(self) -> dict[str, int]:
+        """Размер словаря, счетчики LRU и число обращений к переводчику."""
+        return {
+            "dictionary_size": len(self.dictionary),
+            "network_calls": self.network_calls,
+            **self.cache.stats(),
+        }
+
+
+def _import_translator() -> type["Translator"]:
+    # googletrans импортируется лениво: он нужен только для фраз не из словаря
+    from googletrans import Translator
+
+    return Translator
+
+
+translation_service = TranslationService()
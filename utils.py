@@ -1,22 +1,46 @@
 import asyncio
 import io
+import json
 import logging
+import re
+from collections.abc import Iterable, Mapping
 from datetime import date, timedelta
 
 import aiohttp
-import matplotlib.dates as mdates
-import matplotlib.pyplot as plt
-from googletrans import Translator
 
+from cache import RefreshAheadCache, TTLCache, normalize_name
+from charts import render_calories_chart, render_water_chart
 from config import (
+    ACTIVITY_CACHE_NEGATIVE_TTL,
+    ACTIVITY_CACHE_SIZE,
+    ACTIVITY_CACHE_TTL,
+    ACTIVITY_MET_TABLE_PATH,
     CALORIES_API_TOKEN,
     CALORIES_API_URL,
+    FOOD_CACHE_MAX_BYTES,
+    FOOD_CACHE_NEGATIVE_TTL,
+    FOOD_CACHE_SIZE,
+    FOOD_CACHE_TTL,
+    FOOD_INDEX_PATH,
     NUTRITIONIX_API_TOKEN,
     NUTRITIONIX_API_URL,
     NUTRITIONIX_APP_ID,
     OPEN_WEATHER_API_TOKEN,
     OPEN_WEATHER_API_URL,
+    RECALC_BATCH_SIZE,
+    WEATHER_CACHE_SIZE,
+    WEATHER_CACHE_TTL,
+    WEATHER_REFRESH_AHEAD,
+    WEATHER_REFRESH_INTERVAL,
+    WEATHER_REFRESH_MIN_HITS,
 )
+from food_index import FoodIndex
+from history import DailyHistory
+from http_client import http_client
+from log_pipeline import configure_logging
+from metrics import timed
+from resilience import CircuitOpenError, resilient
+from translation import translation_service
 
 
 def setup_logger(name: str) -> logging.Logger:
@@ -29,25 +53,37 @@ def setup_logger(name: str) -> logging.Logger:
     Returns:
         logging.Logger: Настроенный логгер
     """
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    )
+    configure_logging()
     return logging.getLogger(name)
 
 
 logger = setup_logger(__name__)
 
+# Кэш калорийности продуктов по нормализованному названию
+food_calories_cache = TTLCache(
+    maxsize=FOOD_CACHE_SIZE,
+    ttl=FOOD_CACHE_TTL,
+    negative_ttl=FOOD_CACHE_NEGATIVE_TTL,
+    max_bytes=FOOD_CACHE_MAX_BYTES,
+)
+
+# Локальный справочник калорийности продуктов на 100 г
+food_index = FoodIndex()
+food_index.load(FOOD_INDEX_PATH)
+
+# Сколько продуктов найдено в справочнике и сколько запрошено через API
+food_calories_stats = {"local": 0, "network": 0}
+
 
 def calculate_water_norm(
-    weight: float, activity_minutes: int, temperature: float
+    weight: float, activity_minutes: int, temperature: float | None
 ) -> int:
     """Daily water intake norm.
 
     Args:
         weight (float): User weight in kg
         activity_minutes (int): Activity time in minutes
-        temperature (float): Temperature in Celsius
+        temperature (float | None): Temperature in Celsius, None if unknown
 
     Returns:
         int: Water norm
@@ -58,7 +94,7 @@ def calculate_water_norm(
     activity_addition = (activity_minutes // 30) * 300
 
     # Добавляем воду из-за жаркой погоды
-    weather_addition = 300 if temperature > 25 else 0
+    weather_addition = 300 if temperature is not None and temperature > 25 else 0
 
     return int(base_norm + activity_addition + weather_addition)
 
@@ -87,14 +123,53 @@ def calculate_calorie_norm(
     return int(calories)
 
 
-async def get_temperature(city: str) -> float:
+@timed()
+async def get_temperature(city: str) -> float | None:
+    """Get current temperature for city, cached per normalized city name.
+
+    Args:
+        city (str): City name
+
+    Returns:
+        float | None: Temperature in Celsius; the last known value if the API
+            is unavailable, or None if the city was never fetched successfully
+    """
+    return await temperature_cache.get(normalize_name(city))
+
+
+@timed()
+async def fetch_temperature(city: str) -> float | None:
     """Get current temperature for city using weather API.
 
+    While the weather API circuit breaker is open, returns None at once, so
+    the cache answers with the last known value.
+
     Args:
         city (str): City name
 
     Returns:
-        float: Temperature in Celsius
+        float | None: Temperature in Celsius, or None on error
+    """
+    try:
+        return await request_temperature(city)
+    except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError):
+        return None
+
+
+@resilient("weather")
+async def request_temperature(city: str) -> float | None:
+    """Request current temperature for city from weather API.
+
+    Args:
+        city (str): City name
+
+    Returns:
+        float | None: Temperature in Celsius, or None if not in the response
+
+    Raises:
+        aiohttp.ClientError: On network errors and unexpected API statuses
+        asyncio.TimeoutError: On request timeout
+        CircuitOpenError: If the weather API circuit breaker is open
     """
     params = {
         "q": city,
@@ -103,36 +178,163 @@ async def get_temperature(city: str) -> float:
         "lang": "ru",
     }
 
-    async with aiohttp.ClientSession(
-        connector=aiohttp.TCPConnector(ssl=False)
-    ) as session:
-        try:
-            async with session.get(
-                OPEN_WEATHER_API_URL, params=params, timeout=10
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    main = data.get("main", {})
-                    return main.get("temp", "Нет данных")
-                else:
-                    logger.error(
-                        f"Ошибка API: {response.status}, {await response.text()}"
-                    )
-        except aiohttp.ClientError as e:
-            logger.error(f"Ошибка клиента API: {e}")
-        except asyncio.TimeoutError:
-            logger.error("Ошибка: Таймаут при запросе к API")
+    try:
+        async with http_client.session.get(
+            OPEN_WEATHER_API_URL, params=params, timeout=http_client.timeout("weather")
+        ) as response:
+            if response.status == 200:
+                data = await response.json()
+                main = data.get("main", {})
+                return main.get("temp")
+            else:
+                logger.error(f"Ошибка API: {response.status}, {await response.text()}")
+                response.raise_for_status()
+    except aiohttp.ClientError as e:
+        logger.error(f"Ошибка клиента API: {e}")
+        raise
+    except asyncio.TimeoutError:
+        logger.error("Ошибка: Таймаут при запросе к API")
+        raise
     return None
 
 
-async def translate_text(some_text: str):
-    async with Translator() as translator:
-        result = await translator.translate(some_text)
-        return result.text
+# Кэш температуры по городам с фоновым обновлением популярных городов
+temperature_cache = RefreshAheadCache(
+    fetch_temperature,
+    maxsize=WEATHER_CACHE_SIZE,
+    ttl=WEATHER_CACHE_TTL,
+    refresh_ahead=WEATHER_REFRESH_AHEAD,
+    min_hits=WEATHER_REFRESH_MIN_HITS,
+    refresh_interval=WEATHER_REFRESH_INTERVAL,
+)
+
+# Фоновые загрузки температуры по городам; ссылки на задачи держим до их
+# завершения, иначе их может удалить сборщик мусора
+_temperature_prefetches: dict[str, asyncio.Task] = {}
+
+
+def prefetch_temperature(city: str) -> asyncio.Task:
+    """Start loading temperature for city in the background.
+
+    Repeated calls for the same city while loading return the same task.
 
+    Args:
+        city (str): City name
+
+    Returns:
+        asyncio.Task: Task resolving to the temperature, as get_temperature
+    """
+    key = normalize_name(city)
+    task = _temperature_prefetches.get(key)
+    if task is None:
+        task = asyncio.create_task(temperature_cache.prefetch(key))
+        _temperature_prefetches[key] = task
+        task.add_done_callback(lambda _: _temperature_prefetches.pop(key, None))
+    return task
 
+
+async def wait_temperature(city: str, timeout: float) -> float | None:
+    """Wait for temperature prefetched by prefetch_temperature.
+
+    Unlike the prefetch, this counts as a lookup of the city, so popular
+    cities are refreshed in the background. A load already running for the
+    city is joined, otherwise it is started now. On timeout the load keeps
+    running in the background and fills the cache.
+
+    Args:
+        city (str): City name
+        timeout (float): Maximum wait in seconds
+
+    Returns:
+        float | None: Temperature in Celsius, or None if unknown or not
+            loaded in time
+    """
+    try:
+        return await asyncio.wait_for(get_temperature(city), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Температура для города {city} не получена за {timeout} с")
+        return None
+
+
+async def fetch_city_temperatures(
+    cities: Iterable[str], batch_size: int = RECALC_BATCH_SIZE
+) -> dict[str, float | None]:
+    """Fetch current temperatures of cities for recalculating norms.
+
+    Cities are normalized, so each one is fetched once, and fetched in
+    batches of batch_size at the same time.
+
+    Args:
+        cities (Iterable[str]): City names as entered by users
+        batch_size (int): Number of cities fetched at the same time
+
+    Returns:
+        dict[str, float | None]: Temperature by normalized city name, None if
+            unknown
+    """
+    unique = list(dict.fromkeys(normalize_name(city) for city in cities))
+    temperatures = {}
+    for start in range(0, len(unique), batch_size):
+        batch = unique[start : start + batch_size]
+        results = await asyncio.gather(
+            *(temperature_cache.prefetch(city) for city in batch)
+        )
+        temperatures.update(zip(batch, results))
+    return temperatures
+
+
+@timed()
+async def translate_text(some_text: str) -> str:
+    """Translate text to English using the cached, batching translation service.
+
+    Args:
+        some_text (str): Text in Russian
+
+    Returns:
+        str: Text in English
+    """
+    return await translation_service.translate(some_text)
+
+
+def load_met_table(path: str) -> dict[str, float]:
+    """Load offline MET table {activity in English: MET}.
+
+    Args:
+        path (str): Path to JSON file; empty string disables the table
+
+    Returns:
+        dict[str, float]: MET values by normalized activity name
+    """
+    if not path:
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return {normalize_name(k): float(v) for k, v in json.load(f).items()}
+    except (OSError, ValueError) as e:
+        logger.error(f"Не удалось загрузить таблицу MET {path}: {e}")
+        return {}
+
+
+met_table = load_met_table(ACTIVITY_MET_TABLE_PATH)
+
+# Расход калорий на кг веса в минуту по переведенному названию активности
+activity_rate_cache = TTLCache(
+    maxsize=ACTIVITY_CACHE_SIZE,
+    ttl=ACTIVITY_CACHE_TTL,
+    negative_ttl=ACTIVITY_CACHE_NEGATIVE_TTL,
+)
+
+# Сколько тренировок посчитано локально и сколько потребовало запроса к API
+activity_calories_stats = {"local": 0, "network": 0}
+
+
+@timed()
 async def get_activity_calories(activity: str, weight: float, duration: int) -> float:
-    """Get calories burned for activity using calories API.
+    """Get calories burned for activity.
+
+    The calories-per-kg-per-minute rate for an activity is taken from the
+    rate cache, then from the offline MET table, and only then requested
+    from the calories API; the total is computed locally from the rate.
 
     Args:
         activity (str): Activity name
@@ -140,40 +342,91 @@ async def get_activity_calories(activity: str, weight: float, duration: int) ->
         duration (int): Activity duration in minutes
 
     Returns:
-        float: Calories burned
+        float: Calories burned, or None if the activity is unknown
+    """
+    key = normalize_name(await translate_text(activity))
+
+    if key in activity_rate_cache:
+        rate = activity_rate_cache.get(key)
+        activity_calories_stats["local"] += 1
+        return None if rate is None else round(rate * weight * duration)
+    if key in met_table:
+        # Формула MET: ккал/мин = MET * 3.5 * вес / 200
+        activity_calories_stats["local"] += 1
+        return round(met_table[key] * 3.5 / 200 * weight * duration)
+
+    activity_calories_stats["network"] += 1
+    try:
+        rate = await activity_rate_cache.get_or_load(
+            key, lambda: fetch_activity_rate(key, weight, duration)
+        )
+    except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError):
+        # Временные ошибки не кэшируются; при разомкнутом автомате ответ
+        # приходит сразу, без ожидания таймаута
+        return None
+    if rate is None:
+        return None
+    return round(rate * weight * duration)
+
+
+@timed()
+@resilient("calories")
+async def fetch_activity_rate(
+    activity: str, weight: float, duration: int
+) -> float | None:
+    """Get calories burned per kg per minute using calories API.
+
+    Args:
+        activity (str): Activity name in English
+        weight (float): User weight in kg
+        duration (int): Activity duration in minutes
+
+    Returns:
+        float | None: Calories per kg per minute, or None if not found
+
+    Raises:
+        aiohttp.ClientError: On network errors and unexpected API statuses
+        asyncio.TimeoutError: On request timeout
+        CircuitOpenError: If the API circuit breaker is open
     """
     headers = {
         "X-Api-Key": CALORIES_API_TOKEN,
     }
     params = {
-        "activity": await translate_text(activity),
+        "activity": activity,
         "weight": weight * 2.20462,
         "duration": duration,
     }
 
-    async with aiohttp.ClientSession(
-        connector=aiohttp.TCPConnector(ssl=False)
-    ) as session:
-        try:
-            async with session.get(
-                CALORIES_API_URL, params=params, headers=headers, timeout=10
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data[0].get("total_calories", "Нет данных")
-                else:
-                    logger.error(
-                        f"Ошибка API: {response.status}, {await response.text()}"
-                    )
-        except aiohttp.ClientError as e:
-            logger.error(f"Ошибка клиента API: {e}")
-        except asyncio.TimeoutError:
-            logger.error("Ошибка: Таймаут при запросе к API")
+    try:
+        async with http_client.session.get(
+            CALORIES_API_URL,
+            params=params,
+            headers=headers,
+            timeout=http_client.timeout("calories"),
+        ) as response:
+            if response.status == 200:
+                data = await response.json()
+                if data and data[0].get("total_calories") is not None:
+                    return data[0]["total_calories"] / (weight * duration)
+            else:
+                logger.error(f"Ошибка API: {response.status}, {await response.text()}")
+                response.raise_for_status()
+    except aiohttp.ClientError as e:
+        logger.error(f"Ошибка клиента API: {e}")
+        raise
+    except asyncio.TimeoutError:
+        logger.error("Ошибка: Таймаут при запросе к API")
+        raise
     return None
 
 
+@timed()
 async def get_food_calories(food_name: str) -> float:
-    """Get calories for food item using Nutritionix API.
+    """Get calories for food item.
+
+    The offline food index (with typo-tolerant matching) is tried first;
+    on a miss the Nutritionix API is queried through the cache.
 
     Args:
         food_name (str): Name of the food item to look up
@@ -181,45 +434,290 @@ async def get_food_calories(food_name: str) -> float:
     Returns:
         float: Calories for the food item, or None if not found
     """
+    key = normalize_name(food_name)
+    calories = food_index.lookup(key)
+    if calories is not None:
+        food_calories_stats["local"] += 1
+        return calories
+
+    food_calories_stats["network"] += 1
+    # Перевод выполняется до вызова через автомат Nutritionix: его задержка и
+    # ошибки не должны учитываться в дедлайне, p95 и состоянии автомата
+    try:
+        query = await translate_text(key)
+    except Exception as e:
+        logger.error(f"Ошибка перевода '{key}': {e}")
+        return None
+    try:
+        return await food_calories_cache.get_or_load(
+            key, lambda: fetch_food_calories(query)
+        )
+    except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError):
+        # Временные ошибки не кэшируются; при разомкнутом автомате ответ
+        # приходит сразу, без ожидания таймаута
+        return None
+
+
+@timed()
+@resilient("nutritionix")
+async def fetch_food_calories(query: str) -> float:
+    """Get calories for food item using Nutritionix API.
+
+    Args:
+        query (str): Name of the food item in English
+
+    Returns:
+        float: Calories for the food item, or None if not found
+
+    Raises:
+        aiohttp.ClientError: On network errors and unexpected API statuses
+        asyncio.TimeoutError: On request timeout
+        CircuitOpenError: If the API circuit breaker is open
+    """
     headers = {
         "x-app-id": NUTRITIONIX_APP_ID,
         "x-app-key": NUTRITIONIX_API_TOKEN,
     }
 
     data = {
-        "query": await translate_text(food_name),
+        "query": query,
     }
 
-    async with aiohttp.ClientSession(
-        connector=aiohttp.TCPConnector(ssl=False)
-    ) as session:
-        try:
-            async with session.post(
-                NUTRITIONIX_API_URL, json=data, headers=headers, timeout=10
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    foods = data.get("foods", [])
-                    if foods:
-                        return foods[0].get("nf_calories", "Нет данных")
-                else:
-                    logger.error(
-                        f"Ошибка API: {response.status}, {await response.text()}"
-                    )
-        except aiohttp.ClientError as e:
-            logger.error(f"Ошибка клиента API: {e}")
-        except asyncio.TimeoutError:
-            logger.error("Ошибка: Таймаут при запросе к API")
+    try:
+        async with http_client.session.post(
+            NUTRITIONIX_API_URL,
+            json=data,
+            headers=headers,
+            timeout=http_client.timeout("nutritionix"),
+        ) as response:
+            if response.status == 200:
+                data = await response.json()
+                foods = data.get("foods", [])
+                if foods:
+                    return foods[0].get("nf_calories", "Нет данных")
+            elif response.status == 404:
+                # Nutritionix отвечает 404, если продукт не найден
+                return None
+            else:
+                logger.error(f"Ошибка API: {response.status}, {await response.text()}")
+                response.raise_for_status()
+    except aiohttp.ClientError as e:
+        logger.error(f"Ошибка клиента API: {e}")
+        raise
+    except asyncio.TimeoutError:
+        logger.error("Ошибка: Таймаут при запросе к API")
+        raise
     return None
 
 
+# Части сообщения о приеме пищи разделяются ";", переводом строки или запятой,
+# за которой не следует цифра (запятая в "150,5 г" — десятичный разделитель)
+MEAL_SEPARATOR = re.compile(r"[;\n]|,(?!\d)")
+_AMOUNT = (
+    r"(?P<amount>\d+(?:[.,]\d+)?)\s*"
+    r"(?P<unit>кг|kg|мл|ml|г|гр|грамм\w*|g)?\.?"
+)
+# Граммов в единице количества; миллилитр считается за грамм
+MEAL_UNIT_GRAMS = {"кг": 1000, "kg": 1000}
+MEAL_ITEM_PATTERNS = (
+    re.compile(rf"^(?P<name>.*?\D)\s*{_AMOUNT}$"),
+    re.compile(rf"^{_AMOUNT}\s+(?P<name>.+)$"),
+)
+
+
+def parse_meal(text: str, require_unit: bool = False) -> list[tuple[str, float]]:
+    """Parse a meal like "гречка 200г, курица 150 г, 100г салата".
+
+    Amounts are in grams unless a unit is given (кг, мл; a millilitre counts
+    as a gram).
+
+    Args:
+        text (str): Food items with amounts
+        require_unit (bool): Reject items whose amount has no unit, so that
+            names with numbers ("кофе 3в1", "яйцо 2") are not read as grams
+
+    Returns:
+        list[tuple[str, float]]: (food name, grams) pairs
+
+    Raises:
+        ValueError: If some item has no amount or nothing was given
+    """
+    items = []
+    for part in MEAL_SEPARATOR.split(text):
+        part = " ".join(part.split())
+        if not part:
+            continue
+        for pattern in MEAL_ITEM_PATTERNS:
+            match = pattern.match(part)
+            if match and (match["unit"] or not require_unit):
+                name = match["name"].strip(" -:")
+                grams = float(match["amount"].replace(",", "."))
+                grams *= MEAL_UNIT_GRAMS.get(match["unit"], 1)
+                if name and grams > 0:
+                    items.append((name, grams))
+                    break
+        else:
+            raise ValueError(part)
+    if not items:
+        raise ValueError(text)
+    return items
+
+
+@timed()
+async def get_meal_calories(items: list[tuple[str, float]]) -> list[float | None]:
+    """Get calories for several food items at once.
+
+    Items found in the offline index or the cache are resolved locally; the
+    rest are translated in one batch and sent to Nutritionix as a single
+    natural-language query.
+
+    Args:
+        items (list[tuple[str, float]]): (food name, grams) pairs
+
+    Returns:
+        list[float | None]: Calories for each item, None if not found
+    """
+    results: list[float | None] = [None] * len(items)
+    pending = []
+    for i, (name, grams) in enumerate(items):
+        key = normalize_name(name)
+        per_100g = food_index.lookup(key)
+        if per_100g is None:
+            per_100g = food_calories_cache.get(key)
+        if per_100g is not None:
+            food_calories_stats["local"] += 1
+            results[i] = per_100g * grams / 100
+        else:
+            pending.append((i, key, grams))
+    if not pending:
+        return results
+
+    food_calories_stats["network"] += len(pending)
+    # Одновременные переводы сервис объединяет в один запрос. Ошибка
+    # переводчика не должна оставить /log_meal без ответа
+    try:
+        translations = await asyncio.gather(
+            *(translate_text(key) for _, key, _ in pending)
+        )
+    except Exception as e:
+        logger.error(f"Ошибка перевода продуктов: {e}")
+        return results
+    try:
+        foods = await fetch_meal_calories(
+            [
+                f"{grams:g} g {translation}"
+                for (_, _, grams), translation in zip(pending, translations)
+            ]
+        )
+    except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError):
+        return results
+
+    if foods is None:
+        # Nutritionix разбил запрос иначе: определяем продукты по одному
+        per_100g = await asyncio.gather(
+            *(get_food_calories(key) for _, key, _ in pending)
+        )
+        for (i, _, grams), value in zip(pending, per_100g):
+            if value is not None:
+                results[i] = value * grams / 100
+        return results
+
+    for (i, key, grams), food in zip(pending, foods):
+        if food is None:
+            continue
+        calories, weight = food
+        results[i] = calories
+        if weight:
+            food_calories_cache.set(key, calories / weight * 100)
+    return results
+
+
+@timed()
+@resilient("nutritionix")
+async def fetch_meal_calories(
+    queries: list[str],
+) -> list[tuple[float, float] | None] | None:
+    """Get calories for several foods with one Nutritionix request.
+
+    Args:
+        queries (list[str]): Food items in English with amounts, e.g. "200 g rice"
+
+    Returns:
+        list: (calories, serving weight in grams) for each query, None for
+            queries Nutritionix did not recognize; None if the foods in the
+            response cannot be matched to the queries
+
+    Raises:
+        aiohttp.ClientError: On network errors and unexpected API statuses
+        asyncio.TimeoutError: On request timeout
+        CircuitOpenError: If the API circuit breaker is open
+    """
+    headers = {
+        "x-app-id": NUTRITIONIX_APP_ID,
+        "x-app-key": NUTRITIONIX_API_TOKEN,
+    }
+    data = {"query": "\n".join(queries)}
+
+    try:
+        async with http_client.session.post(
+            NUTRITIONIX_API_URL,
+            json=data,
+            headers=headers,
+            timeout=http_client.timeout("nutritionix"),
+        ) as response:
+            if response.status == 404:
+                return [None] * len(queries)
+            if response.status != 200:
+                logger.error(f"Ошибка API: {response.status}, {await response.text()}")
+                response.raise_for_status()
+            foods = (await response.json()).get("foods", [])
+    except aiohttp.ClientError as e:
+        logger.error(f"Ошибка клиента API: {e}")
+        raise
+    except asyncio.TimeoutError:
+        logger.error("Ошибка: Таймаут при запросе к API")
+        raise
+
+    if len(foods) != len(queries):
+        logger.warning(
+            f"Nutritionix вернул {len(foods)} продуктов на {len(queries)} запросов"
+        )
+        return None
+    return [
+        (food["nf_calories"], food.get("serving_weight_grams"))
+        if food.get("nf_calories") is not None
+        else None
+        for food in foods
+    ]
+
+
 def get_last_7_days():
     """Get list of last 7 days in YYYY-MM-DD format"""
     today = date.today()
     return [(today - timedelta(days=i)).isoformat() for i in range(6, -1, -1)]
 
 
-def create_water_progress_chart(daily_logs: dict, goal: float) -> io.BytesIO:
+def _log_values(daily_logs: Mapping, field: str, dates: list[str]) -> list[float]:
+    if isinstance(daily_logs, DailyHistory) and dates:
+        # Даты идут подряд: берем срез столбца вместо поиска по каждой дате
+        return daily_logs.window(field, dates[0], len(dates))
+    return [daily_logs.get(date, {}).get(field, 0) for date in dates]
+
+
+def get_water_values(daily_logs: Mapping, dates: list[str]) -> list[float]:
+    """Water intake for each of consecutive dates, 0 for dates without logs."""
+    return _log_values(daily_logs, "water", dates)
+
+
+def get_net_calories(daily_logs: Mapping, dates: list[str]) -> list[float]:
+    """Calories consumed minus calories burned for each of consecutive dates."""
+    calories_in = _log_values(daily_logs, "calories_in", dates)
+    calories_burned = _log_values(daily_logs, "calories_burned", dates)
+    return [in_cal - burned for in_cal, burned in zip(calories_in, calories_burned)]
+
+
+@timed()
+def create_water_progress_chart(daily_logs: Mapping, goal: float) -> io.BytesIO:
     """Create water progress chart for the last 7 days.
 
     Args:
@@ -229,54 +727,14 @@ def create_water_progress_chart(daily_logs: dict, goal: float) -> io.BytesIO:
     Returns:
         io.BytesIO: Buffer containing the chart image
     """
-    # Get data for last 7 days
     dates = get_last_7_days()
-    values = [daily_logs.get(date, {}).get("water", 0) for date in dates]
-
-    # Create figure and axis
-    fig, ax = plt.subplots(figsize=(10, 6))
-
-    # Create bar chart
-    bars = ax.bar(dates, values, color="#2ecc71", alpha=0.7)
-
-    # Add goal line
-    ax.axhline(y=goal, color="#e74c3c", linestyle="--", label="Цель")
-
-    # Customize chart
-    ax.set_title("Потребление воды за последние 7 дней")
-    ax.set_xlabel("Дата")
-    ax.set_ylabel("мл")
-
-    # Format x-axis
-    plt.xticks(rotation=45)
-
-    # Add value labels on bars
-    for bar in bars:
-        height = bar.get_height()
-        ax.text(
-            bar.get_x() + bar.get_width() / 2.0,
-            height,
-            f"{int(height)}",
-            ha="center",
-            va="bottom",
-        )
-
-    # Add legend
-    ax.legend()
-
-    # Adjust layout
-    plt.tight_layout()
-
-    # Save to buffer
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png")
-    buf.seek(0)
-    plt.close()
-
-    return buf
+    return io.BytesIO(
+        render_water_chart(dates, get_water_values(daily_logs, dates), goal)
+    )
 
 
-def create_calories_progress_chart(daily_logs: dict, goal: float) -> io.BytesIO:
+@timed()
+def create_calories_progress_chart(daily_logs: Mapping, goal: float) -> io.BytesIO:
     """Create calories progress chart for the last 7 days.
 
     Args:
@@ -286,59 +744,7 @@ def create_calories_progress_chart(daily_logs: dict, goal: float) -> io.BytesIO:
     Returns:
         io.BytesIO: Buffer containing the chart image
     """
-    # Get data for last 7 days
     dates = get_last_7_days()
-    calories_in = [daily_logs.get(date, {}).get("calories_in", 0) for date in dates]
-    calories_burned = [
-        daily_logs.get(date, {}).get("calories_burned", 0) for date in dates
-    ]
-    net_calories = [
-        in_cal - burned for in_cal, burned in zip(calories_in, calories_burned)
-    ]
-
-    # Create figure and axis
-    fig, ax = plt.subplots(figsize=(10, 6))
-
-    # Create bar chart
-    bars = ax.bar(
-        dates,
-        net_calories,
-        color=["#e74c3c" if cal > goal else "#2ecc71" for cal in net_calories],
-        alpha=0.7,
+    return io.BytesIO(
+        render_calories_chart(dates, get_net_calories(daily_logs, dates), goal)
     )
-
-    # Add goal line
-    ax.axhline(y=goal, color="#3498db", linestyle="--", label="Лимит калорий")
-
-    # Customize chart
-    ax.set_title("Баланс калорий за последние 7 дней")
-    ax.set_xlabel("Дата")
-    ax.set_ylabel("ккал")
-
-    # Format x-axis
-    plt.xticks(rotation=45)
-
-    # Add value labels on bars
-    for bar in bars:
-        height = bar.get_height()
-        ax.text(
-            bar.get_x() + bar.get_width() / 2.0,
-            height,
-            f"{int(height)}",
-            ha="center",
-            va="bottom",
-        )
-
-    # Add legend
-    ax.legend()
-
-    # Adjust layout
-    plt.tight_layout()
-
-    # Save to buffer
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png")
-    buf.seek(0)
-    plt.close()
-
-    return buf
\ No newline at end of file
@@ -0,0 +1,216 @@
+import asyncio
+import hmac
+import logging
+import os
+import signal
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+from config import (
+    SHARD_BASE_PORT,
+    SHARD_INDEX,
+    WEBHOOK_HOST,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+    WEBHOOK_WORKERS,
+)
+from sharding import BATCH_PATH, SECRET_HEADER, update_shard
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookServer:
+    """Прием обновлений Telegram через webhook на aiohttp.
+
+    Запрос с обновлением проверяется по секретному токену и ставится в
+    одну из workers ограниченных очередей, каждую из которых обрабатывает своя
+    задача. Очередь выбирается по отправителю, поэтому обновления одного
+    пользователя обрабатываются по порядку. Если очередь заполнена, ответ
+    Telegram задерживается, пока не освободится место. По пути BATCH_PATH
+    принимается пакет обновлений от фронта шардированного режима.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        path: str = WEBHOOK_PATH,
+        secret_token: str | None = WEBHOOK_SECRET,
+        workers: int = WEBHOOK_WORKERS,
+        queue_size: int = WEBHOOK_QUEUE_SIZE,
+    ):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.workers = workers
+        self._queues: list[asyncio.Queue[Update]] = [
+            asyncio.Queue(maxsize=max(1, queue_size // workers)) for _ in range(workers)
+        ]
+        self._worker_tasks: list[asyncio.Task] = []
+        self._runner: web.AppRunner | None = None
+        self._accepting = False
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self._handle)
+        app.router.add_post(self.path + BATCH_PATH, self._handle_batch)
+        app.router.add_get("/healthz", self._health)
+        return app
+
+    def _verify_secret(self, request: web.Request) -> bool:
+        if not self.secret_token:
+            return True
+        received = request.headers.get(SECRET_HEADER, "")
+        return hmac.compare_digest(received, self.secret_token)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        if not self._verify_secret(request):
+            return web.Response(status=401)
+        if not self._accepting:
+            return web.Response(status=503)
+        try:
+            await self._enqueue(await request.json())
+        except ValueError as e:
+            logger.error(f"Некорректное обновление: {e}")
+            return web.Response(status=400)
+        return web.Response()
+
+    async def _handle_batch(self, request: web.Request) -> web.Response:
+        if not self._verify_secret(request):
+            return web.Response(status=401)
+        if not self._accepting:
+            return web.Response(status=503)
+        try:
+            updates = await request.json()
+        except ValueError as e:
+            logger.error(f"Некорректный пакет обновлений: {e}")
+            return web.Response(status=400)
+        for data in updates:
+            try:
+                await self._enqueue(data)
+            except ValueError as e:
+                logger.error(f"Некорректное обновление: {e}")
+        return web.Response()
+
+    async def _enqueue(self, data: dict) -> None:
+        update = Update.model_validate(data, context={"bot": self.bot})
+        await self._queues[update_shard(data, len(self._queues))].put(update)
+
+    async def _health(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "accepting": self._accepting,
+                "queued": sum(queue.qsize() for queue in self._queues),
+            },
+            status=200 if self._accepting else 503,
+        )
+
+    async def _worker(self, queue: asyncio.Queue[Update]) -> None:
+        while True:
+            update = await queue.get()
+            try:
+                await self.dispatcher.feed_update(self.bot, update)
+            except Exception as e:
+                logger.exception(f"Ошибка обработки обновления {update.update_id}: {e}")
+            finally:
+                queue.task_done()
+
+    async def start(self, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT) -> None:
+        """Запустить обработчики и HTTP-сервер."""
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(queue)) for queue in self._queues
+        ]
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self._accepting = True
+        logger.info(f"Webhook-сервер слушает {host}:{port}{self.path}")
+
+    async def stop(self) -> None:
+        """Перестать принимать обновления, дообработать очередь и остановиться."""
+        self._accepting = False
+        for queue in self._queues:
+            await queue.join()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def run_webhook(
+    dispatcher: Dispatcher,
+    bot: Bot,
+    host: str = WEBHOOK_HOST,
+    port: int = WEBHOOK_PORT,
+    register: bool = True,
+) -> None:
+    """Работать в режиме webhook до получения SIGINT или SIGTERM.
+
+    Args:
+        dispatcher (Dispatcher): Диспетчер бота
+        bot (Bot): Бот
+        host (str): Адрес локального сервера
+        port (int): Порт локального сервера
+        register (bool): Зарегистрировать webhook в Telegram
+    """
+    server = WebhookServer(dispatcher, bot)
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    await dispatcher.emit_startup(bot=bot, dispatcher=dispatcher)
+    await server.start(host, port)
+    if register:
+        await bot.set_webhook(
+            url=f"{WEBHOOK_URL.rstrip('/')}{server.path}",
+            secret_token=server.secret_token,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+        )
+    try:
+        await stop_event.wait()
+    finally:
+        logger.info("Остановка webhook-сервера")
+        await server.stop()
+        await dispatcher.emit_shutdown(bot=bot, dispatcher=dispatcher)
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+
+
+async def _stop_with_parent(parent_pid: int) -> None:
+    """Остановить процесс (SIGTERM), если завершился родительский фронт."""
+    while os.getppid() == parent_pid:
+        await asyncio.sleep(1)
+    logger.error("Фронт завершился, остановка шарда")
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+async def run_shard_worker(dispatcher: Dispatcher, bot: Bot) -> None:
+    """Работать обработчиком шарда SHARD_INDEX за фронтом ShardRouter.
+
+    Обработчик принимает обновления только с локального адреса, не
+    регистрирует webhook и останавливается по SIGTERM от фронта или при его
+    завершении.
+    """
+    watcher = asyncio.create_task(_stop_with_parent(os.getppid()))
+    try:
+        await run_webhook(
+            dispatcher,
+            bot,
+            host="127.0.0.1",
+            port=SHARD_BASE_PORT + SHARD_INDEX,
+            register=False,
+        )
+    finally:
+        watcher.cancel()